@@ -0,0 +1,129 @@
+import asyncio
+import datetime
+from collections import defaultdict, deque
+from typing import Any, DefaultDict, Deque, Dict, List, Optional, Tuple
+
+import discord
+from red_commons.logging import getLogger
+
+logger = getLogger("red.trusty-cogs.ExtendedModLog")
+
+# How long to wait for an audit log entry to arrive before asking discord for it
+DEFAULT_AUDIT_LOG_WAIT = 5.0
+# Entries older than this when an event is logged are assumed to be about something else
+ENTRY_MAX_AGE = datetime.timedelta(seconds=30)
+MAX_ENTRIES_PER_GUILD = 100
+
+AuditKey = Tuple[discord.AuditLogAction, Any]
+
+
+def target_key(target: Any) -> Any:
+    """The value an audit log target is matched on, invites are matched on their code"""
+    if target is None or isinstance(target, (int, str)):
+        return target
+    if isinstance(target, discord.Invite):
+        return target.code
+    target_id = getattr(target, "id", None)
+    if target_id is None:
+        return getattr(target, "code", None)
+    return target_id
+
+
+def _has_extra(entry: discord.AuditLogEntry, extra: Optional[str]) -> bool:
+    return extra is None or getattr(entry.after, extra, None) is not None
+
+
+class AuditLogCache:
+    """
+    Recent audit log entries indexed by guild, action, and target.
+
+    Events usually arrive before the audit log entry describing who caused
+    them so lookups which miss register a future which is resolved as soon
+    as a matching entry is added instead of sleeping for a fixed time.
+    """
+
+    def __init__(self):
+        self._entries: DefaultDict[int, Dict[AuditKey, Deque[discord.AuditLogEntry]]] = (
+            defaultdict(dict)
+        )
+        # insertion order per guild used to drop the oldest entries
+        self._order: DefaultDict[int, Deque[AuditKey]] = defaultdict(deque)
+        self._waiters: Dict[Tuple[int, AuditKey], List[Tuple[Optional[str], asyncio.Future]]] = {}
+
+    def add(self, entry: discord.AuditLogEntry) -> None:
+        guild_id = entry.guild.id
+        key = (entry.action, target_key(entry.target))
+        self._entries[guild_id].setdefault(key, deque()).append(entry)
+        self._order[guild_id].append(key)
+        self._prune(guild_id)
+        for extra, future in self._waiters.get((guild_id, key), []):
+            if not future.done() and _has_extra(entry, extra):
+                future.set_result(entry)
+
+    def _prune(self, guild_id: int) -> None:
+        order = self._order[guild_id]
+        entries = self._entries[guild_id]
+        oldest = discord.utils.utcnow() - ENTRY_MAX_AGE
+        while order:
+            key = order[0]
+            if len(order) <= MAX_ENTRIES_PER_GUILD and entries[key][0].created_at >= oldest:
+                break
+            order.popleft()
+            entries[key].popleft()
+            if not entries[key]:
+                del entries[key]
+
+    def find(
+        self,
+        guild_id: int,
+        action: discord.AuditLogAction,
+        target: Any,
+        *,
+        extra: Optional[str] = None,
+    ) -> Optional[discord.AuditLogEntry]:
+        """The newest recent entry matching the action and target"""
+        entries = self._entries.get(guild_id, {}).get((action, target), ())
+        oldest = discord.utils.utcnow() - ENTRY_MAX_AGE
+        for entry in reversed(entries):
+            if entry.created_at < oldest:
+                break
+            if _has_extra(entry, extra):
+                return entry
+        return None
+
+    async def wait_for(
+        self,
+        guild_id: int,
+        action: discord.AuditLogAction,
+        target: Any,
+        *,
+        extra: Optional[str] = None,
+        timeout: float = DEFAULT_AUDIT_LOG_WAIT,
+    ) -> Optional[discord.AuditLogEntry]:
+        """Returns a matching entry as soon as one is available or `None` after `timeout`"""
+        entry = self.find(guild_id, action, target, extra=extra)
+        if entry is not None or timeout <= 0:
+            return entry
+        waiter_key = (guild_id, (action, target))
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._waiters.setdefault(waiter_key, [])
+        waiters.append((extra, future))
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters.remove((extra, future))
+            if not waiters:
+                del self._waiters[waiter_key]
+
+    def waiting(self) -> int:
+        return sum(len(w) for w in self._waiters.values())
+
+    def clear(self) -> None:
+        for waiters in self._waiters.values():
+            for _extra, future in waiters:
+                if not future.done():
+                    future.set_result(None)
+        self._entries.clear()
+        self._order.clear()
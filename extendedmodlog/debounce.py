@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# seconds to merge updates to the same member over, per event
+DEFAULT_WINDOWS = {"user_change": 2.0, "voice_change": 1.0}
+MAX_WINDOW = 30.0
+
+
+class UpdateDebouncer:
+    """
+    Folds bursts of update events about the same thing into a single change.
+
+    The first update for a key waits out the window while later updates only
+    replace the pending `after`. Once the window is over the first caller gets
+    the oldest `before` and the newest `after` so the net change is logged once
+    and its audit log entry is only looked up once.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Hashable, List[Any]] = {}
+        self.merged = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def wait(
+        self, key: Hashable, before: Any, after: Any, window: float
+    ) -> Optional[Tuple[Any, Any]]:
+        """
+        The net `(before, after)` for this burst of updates or `None` if this
+        update was merged into one which is already waiting.
+        """
+        if window <= 0:
+            return before, after
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending[1] = after
+            self.merged += 1
+            return None
+        pending = self._pending[key] = [before, after]
+        await asyncio.sleep(window)
+        if self._pending.get(key) is not pending:
+            # cleared while we were waiting
+            return None
+        del self._pending[key]
+        return pending[0], pending[1]
+
+    def close(self) -> None:
+        self._pending.clear()
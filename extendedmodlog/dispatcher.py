@@ -0,0 +1,190 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Union
+
+import discord
+from red_commons.logging import getLogger
+
+logger = getLogger("red.trusty-cogs.ExtendedModLog")
+
+# Messages to a channel are sent at most this often, anything logged in between
+# is merged into the next message. Discord allows 5 messages per 5 seconds per channel.
+COALESCE_WINDOW = 1.0
+# Listeners wait for room once a channel has this many events queued
+MAX_QUEUE_SIZE = 500
+MAX_EMBEDS = 10
+MAX_EMBED_CHARACTERS = 6000
+MAX_CONTENT = 2000
+# How long unloading waits for queued messages to be sent
+CLOSE_TIMEOUT = 10.0
+
+LogChannel = Union[discord.TextChannel, discord.VoiceChannel, discord.Thread]
+
+
+class LogItem(NamedTuple):
+    content: Optional[str]
+    embed: Optional[discord.Embed]
+
+
+class ChannelQueue:
+    def __init__(self, channel: LogChannel):
+        self.channel = channel
+        self.items: Deque[LogItem] = deque()
+        self.space = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+        self.last_send = 0.0
+
+
+class LogDispatcher:
+    """
+    Per channel outbound queues for modlog messages.
+
+    Each channel has a single worker so events are posted in the order they were
+    logged. When a channel is quiet an event is sent straight away, when it's busy
+    everything logged during the last `COALESCE_WINDOW` is merged into messages of
+    up to 10 embeds, or one digest message when embeds are disabled, so a raid or
+    mass role change doesn't fall minutes behind on rate limits.
+    """
+
+    def __init__(
+        self,
+        allowed_mentions: discord.AllowedMentions,
+        *,
+        window: float = COALESCE_WINDOW,
+        max_queue: int = MAX_QUEUE_SIZE,
+    ):
+        self.allowed_mentions = allowed_mentions
+        self.window = window
+        self.max_queue = max_queue
+        self.queues: Dict[int, ChannelQueue] = {}
+        self.events = 0
+        self.messages = 0
+        self.waiting = 0
+
+    async def send(
+        self,
+        channel: LogChannel,
+        content: Optional[str] = None,
+        *,
+        embed: Optional[discord.Embed] = None,
+    ) -> None:
+        """Queue a modlog message, this only waits if the channel's queue is full"""
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = ChannelQueue(channel)
+        if len(queue.items) >= self.max_queue:
+            self.waiting += 1
+            try:
+                async with queue.space:
+                    await queue.space.wait_for(lambda: len(queue.items) < self.max_queue)
+            finally:
+                self.waiting -= 1
+        queue.channel = channel
+        queue.items.append(LogItem(content, embed))
+        self.events += 1
+        if queue.task is None or queue.task.done():
+            queue.task = asyncio.create_task(self._worker(queue))
+
+    def _next_batch(self, queue: ChannelQueue) -> List[LogItem]:
+        """Remove the longest run of items from the front of the queue that fit in one message"""
+        first = queue.items.popleft()
+        batch = [first]
+        if first.embed is not None:
+            size = len(first.embed)
+            while queue.items and len(batch) < MAX_EMBEDS:
+                item = queue.items[0]
+                if item.embed is None or size + len(item.embed) > MAX_EMBED_CHARACTERS:
+                    break
+                size += len(item.embed)
+                batch.append(queue.items.popleft())
+            return batch
+        size = len(first.content or "")
+        # a block quote runs to the end of the message so nothing can follow it
+        while queue.items and ">>>" not in (batch[-1].content or ""):
+            item = queue.items[0]
+            if item.embed is not None or not item.content:
+                break
+            if size + len(item.content) + 1 > MAX_CONTENT:
+                break
+            size += len(item.content) + 1
+            batch.append(queue.items.popleft())
+        return batch
+
+    async def _send(self, queue: ChannelQueue, batch: List[LogItem]) -> None:
+        if batch[0].embed is not None:
+            content = None
+            embeds = [item.embed for item in batch]
+        else:
+            content = "\n".join(item.content or "" for item in batch)
+            embeds = []
+        await queue.channel.send(
+            content,
+            embeds=embeds or discord.utils.MISSING,
+            allowed_mentions=self.allowed_mentions,
+        )
+        self.messages += 1
+
+    async def _worker(self, queue: ChannelQueue) -> None:
+        # the worker exits once the queue is empty and `send` starts a new one
+        loop = asyncio.get_running_loop()
+        while queue.items:
+            wait = queue.last_send + self.window - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            batch = self._next_batch(queue)
+            async with queue.space:
+                queue.space.notify_all()
+            queue.last_send = loop.time()
+            try:
+                await self._send(queue, batch)
+            except discord.NotFound:
+                logger.info("Modlog channel %s no longer exists", queue.channel.id)
+                queue.items.clear()
+            except discord.Forbidden:
+                logger.info("Missing permission to send modlog messages to %s", queue.channel.id)
+            except discord.HTTPException:
+                if len(batch) == 1:
+                    logger.exception("Error sending modlog message to %s", queue.channel.id)
+                    continue
+                # one bad event shouldn't lose everything merged with it
+                logger.info("Sending modlog messages to %s one at a time", queue.channel.id)
+                for item in batch:
+                    try:
+                        await self._send(queue, [item])
+                    except discord.HTTPException:
+                        logger.exception("Error sending modlog message to %s", queue.channel.id)
+
+    def queue_lengths(self) -> Dict[int, int]:
+        return {channel_id: len(q.items) for channel_id, q in self.queues.items()}
+
+    def to_dict(self, channels: Optional[List[int]] = None) -> dict:
+        lengths = self.queue_lengths()
+        if channels is not None:
+            lengths = {k: v for k, v in lengths.items() if k in channels}
+        return {
+            "queued": sum(lengths.values()),
+            "channels": lengths,
+            "events": self.events,
+            "messages": self.messages,
+            "waiting": self.waiting,
+        }
+
+    async def close(self) -> None:
+        """Send everything still queued, waiting at most `CLOSE_TIMEOUT` seconds"""
+        self.window = 0
+        tasks = []
+        for queue in self.queues.values():
+            if queue.items and (queue.task is None or queue.task.done()):
+                queue.task = asyncio.create_task(self._worker(queue))
+            if queue.task is not None and not queue.task.done():
+                tasks.append(queue.task)
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=CLOSE_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(
+                    "Dropped %s queued modlog events while unloading",
+                    sum(len(q.items) for q in self.queues.values()),
+                )
+        self.queues.clear()
@@ -1,11 +1,9 @@
 import asyncio
 import datetime
-from collections import deque
 from enum import Enum
-from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple, Union, cast
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union, cast
 
 import discord
-from discord.ext import tasks
 from discord.ext.commands.converter import Converter
 from discord.ext.commands.errors import BadArgument
 from red_commons.logging import getLogger
@@ -20,6 +18,20 @@ from redbot.core.utils.chat_formatting import (
     pagify,
 )
 
+from .auditlog import AuditLogCache, target_key
+from .debounce import UpdateDebouncer
+from .dispatcher import LogDispatcher
+from .invites import InviteTracker
+from .journal import EventJournal, JournalRecord, summarise
+from .messagestore import MessageStore, StoredMessage
+from .permissions import (
+    diff_overwrites,
+    diff_permissions,
+    display_name,
+    overwrite_values,
+)
+from .snapshot import DEFAULT_COLOURS, GuildSnapshot
+
 _ = i18n.Translator("ExtendedModLog", __file__)
 logger = getLogger("red.trusty-cogs.ExtendedModLog")
 
@@ -111,6 +123,36 @@ class EventChooser(Converter):
         return result
 
 
+class JournalSearchFlags(commands.FlagConverter, case_insensitive=True):
+    user: Optional[discord.User] = commands.flag(
+        name="user",
+        aliases=["member"],
+        default=None,
+        description="Events done by or to this user.",
+    )
+    channel: Optional[Union[discord.abc.GuildChannel, discord.Thread]] = commands.flag(
+        name="channel",
+        default=None,
+        description="Events in or about this channel.",
+    )
+    role: Optional[discord.Role] = commands.flag(
+        name="role",
+        default=None,
+        description="Events about this role.",
+    )
+    event: Optional[str] = commands.flag(
+        name="event",
+        default=None,
+        converter=EventChooser,
+        description="Only this type of event.",
+    )
+    days: commands.Range[int, 1, 365] = commands.flag(
+        name="days",
+        default=7,
+        description="How many days back to search. Defaults to 7.",
+    )
+
+
 class EventMixin:
     """
     Handles all the on_event data
@@ -121,47 +163,69 @@ class EventMixin:
     settings: Dict[int, Any]
     _ban_cache: Dict[int, List[int]]
     allowed_mentions: discord.AllowedMentions
-    audit_log: Dict[int, Deque[discord.AuditLogEntry]]
+    audit_log: AuditLogCache
+    audit_log_wait: float
+    dispatcher: LogDispatcher
+    invite_tracker: InviteTracker
+    snapshots: Dict[int, GuildSnapshot]
+    message_store: MessageStore
+    journal: Optional[EventJournal]
+    debouncer: UpdateDebouncer
+
+    def event_enabled(self, guild_id: int, event: str) -> bool:
+        snapshot = self.snapshots.get(guild_id)
+        return snapshot is not None and snapshot.is_enabled(event)
+
+    def journal_event(
+        self,
+        guild: discord.Guild,
+        event: str,
+        *,
+        actor: Optional[Union[discord.abc.Snowflake, int]] = None,
+        target: Optional[Union[discord.abc.Snowflake, int]] = None,
+        channel: Optional[Union[discord.abc.Snowflake, int]] = None,
+        related: Iterable[Optional[Union[discord.abc.Snowflake, int]]] = (),
+        embed: Optional[discord.Embed] = None,
+        content: Optional[str] = None,
+    ) -> None:
+        """Record a logged event in the journal if it's enabled for the guild"""
+        if self.journal is None:
+            return
+        snapshot = self.snapshots.get(guild.id)
+        if snapshot is None or not snapshot.journal:
+            return
+        actor_id, target_id, channel_id = (getattr(o, "id", o) for o in (actor, target, channel))
+        ids = {actor_id, target_id, channel_id}
+        ids.update(getattr(o, "id", o) for o in related)
+        ids.discard(None)
+        record = JournalRecord(
+            event=event,
+            guild_id=guild.id,
+            timestamp=datetime.datetime.now(datetime.timezone.utc).timestamp(),
+            actor_id=actor_id,
+            target_id=target_id,
+            channel_id=channel_id,
+            ids=tuple(ids),
+            summary=summarise(content, embed),
+        )
+        self.journal.add(record)
 
     async def get_event_colour(
         self, guild: discord.Guild, event_type: str, changed_object: Optional[discord.Role] = None
     ) -> discord.Colour:
-        if guild.text_channels:
-            cmd_colour = await self.bot.get_embed_colour(guild.text_channels[0])
-        else:
-            cmd_colour = discord.Colour.red()
-        defaults = {
-            "message_edit": discord.Colour.orange(),
-            "message_delete": discord.Colour.dark_red(),
-            "user_change": discord.Colour.greyple(),
-            "role_change": changed_object.colour if changed_object else discord.Colour.blue(),
-            "role_create": discord.Colour.blue(),
-            "role_delete": discord.Colour.dark_blue(),
-            "voice_change": discord.Colour.magenta(),
-            "user_join": discord.Colour.green(),
-            "user_left": discord.Colour.dark_green(),
-            "channel_change": discord.Colour.teal(),
-            "channel_create": discord.Colour.teal(),
-            "channel_delete": discord.Colour.dark_teal(),
-            "guild_change": discord.Colour.blurple(),
-            "emoji_change": discord.Colour.gold(),
-            "stickers_change": discord.Colour.gold(),
-            "commands_used": cmd_colour,
-            "invite_created": discord.Colour.blurple(),
-            "invite_deleted": discord.Colour.blurple(),
-            "thread_change": discord.Colour.teal(),
-            "thread_create": discord.Colour.teal(),
-            "thread_delete": discord.Colour.dark_teal(),
-        }
-        colour = defaults[event_type]
-        if self.settings[guild.id][event_type]["colour"] is not None:
-            colour = discord.Colour(self.settings[guild.id][event_type]["colour"])
-        return colour
+        colour = self.snapshots[guild.id].custom_colour(event_type)
+        if colour is not None:
+            return colour
+        if event_type == "role_change" and changed_object:
+            return changed_object.colour
+        if event_type == "commands_used" and guild.text_channels:
+            return await self.bot.get_embed_colour(guild.text_channels[0])
+        return DEFAULT_COLOURS[event_type]
 
     async def is_ignored_channel(
         self, guild: discord.Guild, channel: Union[discord.abc.GuildChannel, discord.Thread, int]
     ) -> bool:
-        ignored_channels = self.settings[guild.id]["ignored_channels"]
+        ignored_channels = self.snapshots[guild.id].ignored_channels
         if isinstance(channel, int):
             # This is mainly here because you can have threads parent channel
             # deleted which would make the return of `thread.parent` be `None`.
@@ -182,9 +246,9 @@ class EventMixin:
 
     async def modlog_channel(self, guild: discord.Guild, event: str) -> discord.TextChannel:
         channel = None
-        settings = self.settings[guild.id].get(event)
-        if "channel" in settings and settings["channel"]:
-            channel = guild.get_channel(settings["channel"])
+        channel_id = self.snapshots[guild.id].channels.get(event)
+        if channel_id:
+            channel = guild.get_channel(channel_id)
         if channel is None:
             try:
                 channel = await modlog.get_modlog_channel(guild)
@@ -199,12 +263,10 @@ class EventMixin:
         guild = ctx.guild
         if guild is None:
             return
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "commands_used"):
             return
         if await self.bot.cog_disabled_in_guild(self, ctx.guild):
             return
-        if not self.settings[guild.id]["commands_used"]["enabled"]:
-            return
         if await self.is_ignored_channel(guild, ctx.channel):
             return
         if guild.me.is_timed_out():
@@ -323,6 +385,9 @@ class EventMixin:
         if my_perms:
             i_require = format_perms_list(my_perms)
 
+        self.journal_event(
+            guild, "commands_used", actor=message.author, channel=message.channel, content=com_str
+        )
         if embed_links:
             embed = discord.Embed(
                 description=f">>> {com_str}",
@@ -340,7 +405,7 @@ class EventMixin:
             )
             embed.set_author(name=author_title, icon_url=message.author.display_avatar)
             embed.add_field(name=_("Member ID"), value=box(str(message.author.id)))
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
             infomessage = _(
                 "{emoji} {time} {author}(`{a_id}`) used the following command in {channel}\n> {com}"
@@ -352,7 +417,23 @@ class EventMixin:
                 channel=message.channel.mention,
                 com=com_str,
             )
-            await channel.send(infomessage[:2000], allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, infomessage[:2000])
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message) -> None:
+        guild = message.guild
+        if guild is None:
+            return
+        snapshot = self.snapshots.get(guild.id)
+        if snapshot is None or not snapshot.store_messages:
+            return
+        if not message.content and not message.attachments:
+            return
+        if await self.is_ignored_channel(guild, message.channel):
+            return
+        if message.author.bot and not snapshot.store_bots:
+            return
+        self.message_store.add(StoredMessage.from_message(message))
 
     @commands.Cog.listener(name="on_raw_message_delete")
     async def on_raw_message_delete_listener(
@@ -365,15 +446,13 @@ class EventMixin:
         guild = self.bot.get_guild(guild_id)
         if guild is None:
             return
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "message_delete"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
         settings = self.settings[guild.id]["message_delete"]
-        if not settings["enabled"]:
-            return
         channel_id = payload.channel_id
         try:
             channel = await self.modlog_channel(guild, "message_delete")
@@ -391,9 +470,21 @@ class EventMixin:
         await i18n.set_contextual_locales_from_guild(self.bot, guild)
         # set guild level i18n
         message = payload.cached_message
+        stored = self.message_store.pop(payload.message_id)
+        if message is None and stored is not None:
+            await self._stored_message_delete(
+                stored, guild, settings, channel, message_channel, check_audit_log=check_audit_log
+            )
+            return
         if message is None:
             if settings["cached_only"]:
                 return
+            self.journal_event(
+                guild,
+                "message_delete",
+                channel=message_channel,
+                content=_("*Message's content unknown.*"),
+            )
             if embed_links:
                 embed = discord.Embed(
                     description=_("*Message's content unknown.*"),
@@ -402,7 +493,7 @@ class EventMixin:
                 embed.add_field(name=_("Channel"), value=message_channel.mention)
                 embed.set_author(name=_("Deleted Message"))
                 embed.add_field(name=_("Message ID"), value=box(str(payload.message_id)))
-                await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+                await self.dispatcher.send(channel, embed=embed)
             else:
                 infomessage = _(
                     "{emoji} {time} A message ({message_id}) was deleted in {channel}"
@@ -412,9 +503,8 @@ class EventMixin:
                     message_id=box(str(payload.message_id)),
                     channel=message_channel.mention,
                 )
-                await channel.send(
-                    f"{infomessage}\n> *Message's content unknown.*",
-                    allowed_mentions=self.allowed_mentions,
+                await self.dispatcher.send(
+                    channel, f"{infomessage}\n> *Message's content unknown.*"
                 )
             return
         await self._cached_message_delete(
@@ -488,6 +578,14 @@ class EventMixin:
                 a_id=author.id,
                 channel=message_channel.mention,
             )
+        self.journal_event(
+            guild,
+            "message_delete",
+            actor=perp,
+            target=author,
+            channel=message_channel,
+            content=message.content,
+        )
         if embed_links:
             content = f">>> {message.content}" if message.content else None
             embed = discord.Embed(
@@ -515,12 +613,98 @@ class EventMixin:
                 ),
                 icon_url=message.author.display_avatar,
             )
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
             clean_msg = message.clean_content[: (1990 - len(infomessage))]
-            await channel.send(
-                f"{infomessage}\n>>> {clean_msg}", allowed_mentions=self.allowed_mentions
+            await self.dispatcher.send(channel, f"{infomessage}\n>>> {clean_msg}")
+
+    async def _stored_message_delete(
+        self,
+        stored: StoredMessage,
+        guild: discord.Guild,
+        settings: dict,
+        channel: discord.TextChannel,
+        message_channel: Union[discord.abc.GuildChannel, discord.Thread],
+        *,
+        check_audit_log: bool = True,
+    ) -> None:
+        """Log the delete of a message that's only in the message store"""
+        if stored.bot and not settings["bots"]:
+            return
+        if not stored.content and not stored.attachments:
+            return
+        if settings["ignore_commands"] and stored.content:
+            prefixes = await self.bot.get_valid_prefixes(guild)
+            if stored.content.startswith(tuple(prefixes)):
+                logger.debug("Ignoring stored command message.")
+                return
+        embed_links = channel.permissions_for(guild.me).embed_links and settings["embed"]
+        time = datetime.datetime.fromtimestamp(stored.created_at, tz=datetime.timezone.utc)
+        author = guild.get_member(stored.author_id)
+        perp = None
+        reason = None
+        if channel.permissions_for(guild.me).view_audit_log and check_audit_log:
+            action = discord.AuditLogAction.message_delete
+            entry = await self.get_audit_log_entry(guild, author or stored.author_id, action)
+            perp = getattr(entry, "user", None)
+            reason = getattr(entry, "reason", None)
+        if perp is None:
+            infomessage = _(
+                "{emoji} {time} A message from **{author}** (`{a_id}`) was deleted in {channel}"
+            ).format(
+                emoji=settings["emoji"],
+                time=discord.utils.format_dt(time),
+                author=stored.author,
+                channel=message_channel.mention,
+                a_id=stored.author_id,
+            )
+        else:
+            infomessage = _(
+                "{emoji} {time} {perp} deleted a message from "
+                "**{author}** (`{a_id}`) in {channel}"
+            ).format(
+                emoji=settings["emoji"],
+                time=discord.utils.format_dt(time),
+                perp=perp,
+                author=stored.author,
+                a_id=stored.author_id,
+                channel=message_channel.mention,
+            )
+        self.journal_event(
+            guild,
+            "message_delete",
+            actor=perp,
+            target=stored.author_id,
+            channel=message_channel,
+            content=stored.content,
+        )
+        if embed_links:
+            content = f">>> {stored.content}" if stored.content else None
+            embed = discord.Embed(
+                description=content,
+                colour=await self.get_event_colour(guild, "message_delete"),
+                timestamp=time,
             )
+            embed.add_field(name=_("Channel"), value=message_channel.mention)
+            embed.add_field(name=_("Author"), value=f"<@{stored.author_id}>")
+            if perp:
+                embed.add_field(name=_("Deleted by"), value=perp.mention)
+            if reason:
+                embed.add_field(name=_("Reason"), value=reason)
+            if stored.attachments:
+                files = "\n".join(f"- {inline(a)}" for a in stored.attachments)
+                embed.add_field(name=_("Attachments"), value=files[:1024])
+            embed.add_field(name=_("Message ID"), value=box(str(stored.id)))
+            embed.set_author(
+                name=_("{member} ({m_id}) - Deleted Message").format(
+                    member=stored.author, m_id=stored.author_id
+                ),
+                icon_url=getattr(author, "display_avatar", None),
+            )
+            await self.dispatcher.send(channel, embed=embed)
+        else:
+            clean_msg = discord.utils.escape_mentions(stored.content)[: (1990 - len(infomessage))]
+            await self.dispatcher.send(channel, f"{infomessage}\n>>> {clean_msg}")
 
     @commands.Cog.listener()
     async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
@@ -530,14 +714,14 @@ class EventMixin:
         guild = self.bot.get_guild(guild_id)
         if guild is None:
             return
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "message_delete"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
         settings = self.settings[guild.id]["message_delete"]
-        if not settings["enabled"] or not settings["bulk_enabled"]:
+        if not settings["bulk_enabled"]:
             return
         channel_id = payload.channel_id
         message_channel = guild.get_channel_or_thread(channel_id)
@@ -556,6 +740,12 @@ class EventMixin:
         await i18n.set_contextual_locales_from_guild(self.bot, guild)
         # set guild level i18n
         message_amount = len(payload.message_ids)
+        self.journal_event(
+            guild,
+            "message_delete",
+            channel=message_channel,
+            content=_("Messages deleted") + f": {message_amount}",
+        )
         if embed_links:
             embed = discord.Embed(
                 description=message_channel.mention,
@@ -567,7 +757,7 @@ class EventMixin:
             )
             embed.add_field(name=_("Channel"), value=message_channel.mention)
             embed.add_field(name=_("Messages deleted"), value=str(message_amount))
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
             infomessage = _(
                 "{emoji} {time} Bulk message delete in {channel}, {amount} messages deleted."
@@ -577,7 +767,7 @@ class EventMixin:
                 amount=message_amount,
                 channel=message_channel.mention,
             )
-            await channel.send(infomessage, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, infomessage)
         if settings["bulk_individual"]:
             for message in payload.cached_messages:
                 new_payload = discord.RawMessageDeleteEvent(
@@ -588,56 +778,47 @@ class EventMixin:
                     await self.on_raw_message_delete_listener(new_payload, check_audit_log=False)
                 except Exception:
                     pass
+            cached = {message.id for message in payload.cached_messages}
+            for message_id in sorted(payload.message_ids - cached):
+                stored = self.message_store.pop(message_id)
+                if stored is None:
+                    continue
+                try:
+                    await self._stored_message_delete(
+                        stored, guild, settings, channel, message_channel, check_audit_log=False
+                    )
+                except Exception:
+                    pass
+        else:
+            for message_id in payload.message_ids:
+                self.message_store.pop(message_id)
 
-    @tasks.loop(seconds=300)
-    async def invite_links_loop(self) -> None:
-        """Check every 5 minutes for updates to the invite links"""
-        for guild_id in self.settings.keys():
+    async def sync_invite_links(self) -> None:
+        """Record the current invite uses once on startup, events keep them up to date after"""
+        await self.bot.wait_until_red_ready()
+        for guild_id in list(self.settings.keys()):
             guild = self.bot.get_guild(guild_id)
             if guild is None:
                 continue
             if self.settings[guild_id]["user_join"]["enabled"]:
                 await self.save_invite_links(guild)
 
-    @invite_links_loop.before_loop
-    async def before_invite_loop(self):
-        await self.bot.wait_until_red_ready()
-
     async def save_invite_links(self, guild: discord.Guild) -> bool:
-        invites = {}
         if not guild.me.guild_permissions.manage_guild:
             return False
         try:
-            for invite in await guild.invites():
-                created_at = getattr(
-                    invite, "created_at", datetime.datetime.now(datetime.timezone.utc)
-                )
-                channel = getattr(invite, "channel", discord.Object(id=0))
-                inviter = getattr(invite, "inviter", discord.Object(id=0))
-                invites[invite.code] = {
-                    "uses": getattr(invite, "uses", 0),
-                    "max_age": getattr(invite, "max_age", None),
-                    "created_at": created_at.timestamp(),
-                    "max_uses": getattr(invite, "max_uses", None),
-                    "temporary": getattr(invite, "temporary", False),
-                    "inviter": getattr(inviter, "id", "Unknown"),
-                    "channel": getattr(channel, "id", "Unknown"),
-                }
+            await self.invite_tracker.sync(guild)
         except discord.HTTPException:
             logger.error("Error saving invites for guild %s. Discord Server Error.", guild.id)
             return False
         except Exception:
             logger.exception("Error saving invites for guild %s.", guild.id)
             return False
-
-        self.settings[guild.id]["invite_links"] = invites
-        await self.save(guild)
         return True
 
     async def get_invite_link(self, member: discord.Member) -> str:
         guild = member.guild
         manage_guild = guild.me.guild_permissions.manage_guild
-        invites = self.settings[guild.id]["invite_links"]
         possible_link = ""
         check_logs = manage_guild and guild.me.guild_permissions.view_audit_log
         if member.bot:
@@ -653,50 +834,25 @@ class EventMixin:
             except (discord.errors.NotFound, discord.errors.HTTPException):
                 pass
 
-        if invites and manage_guild:
-            guild_invites = await guild.invites()
-            for invite in guild_invites:
-                if invite.code in invites:
-                    uses = invites[invite.code]["uses"]
-                    # we can't get accurate information if the uses is None
-                    if invite.uses is None or uses is None:
-                        continue
-                    if invite.uses > uses:
-                        possible_link = _(
-                            "https://discord.gg/{code}\nInvited by: {inviter}"
-                        ).format(
-                            code=invite.code,
-                            inviter=str(
-                                getattr(invite.inviter, "mention", _("Widget Integration"))
-                            ),
-                        )
-
-            if not possible_link:
-                for code, data in invites.items():
+        if manage_guild:
+            used = await self.invite_tracker.used_invite(guild)
+            if used is not None:
+                code, data = used
+                if not data["inviter"]:
+                    inviter = _("Widget Integration")
+                else:
                     try:
-                        invite = await self.bot.fetch_invite(code)
-                    except Exception:
-                        logger.error("Error getting invite {code}".format(code=code))
-                        invite = None
-                        pass
-                    if invite is None:
-                        if (data["max_uses"] - data["uses"]) == 1:
-                            # The invite link was on its last uses and subsequently
-                            # deleted so we're fairly sure this was the one used
-                            try:
-                                inviter = guild.get_member(data["inviter"])
-                                if inviter is None:
-                                    inviter = await self.bot.fetch_user(data["inviter"])
-                                if inviter is not None:
-                                    inviter = inviter.mention
-                            except (discord.errors.NotFound, discord.errors.Forbidden):
-                                inviter = _("Unknown or deleted user ({inviter})").format(
-                                    inviter=data["inviter"]
-                                )
-                            possible_link = _(
-                                "https://discord.gg/{code}\nInvited by: {inviter}"
-                            ).format(code=code, inviter=str(inviter))
-            await self.save_invite_links(guild)  # Save all the invites again since they've changed
+                        inviter = guild.get_member(data["inviter"])
+                        if inviter is None:
+                            inviter = await self.bot.fetch_user(data["inviter"])
+                        inviter = inviter.mention
+                    except (discord.errors.NotFound, discord.errors.HTTPException):
+                        inviter = _("Unknown or deleted user ({inviter})").format(
+                            inviter=data["inviter"]
+                        )
+                possible_link = _("https://discord.gg/{code}\nInvited by: {inviter}").format(
+                    code=code, inviter=str(inviter)
+                )
         if check_logs and not possible_link:
             action = discord.AuditLogAction.invite_create
             entry = await self.get_audit_log_entry(guild, None, action)
@@ -710,9 +866,7 @@ class EventMixin:
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
         guild = member.guild
-        if guild.id not in self.settings:
-            return
-        if not self.settings[guild.id]["user_join"]["enabled"]:
+        if not self.event_enabled(guild.id, "user_join"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
@@ -736,6 +890,7 @@ class EventMixin:
         created_on = "<t:{user_created}>\n(<t:{user_created}:R>)".format(user_created=user_created)
 
         possible_link = await self.get_invite_link(member)
+        self.journal_event(guild, "user_join", target=member, content=f"{member} {possible_link}")
         if embed_links:
             embed = discord.Embed(
                 description=member,
@@ -758,7 +913,7 @@ class EventMixin:
             if possible_link:
                 embed.add_field(name=_("Invite Link"), value=possible_link)
             embed.set_thumbnail(url=member.display_avatar)
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
             time = datetime.datetime.now(datetime.timezone.utc)
             msg = _(
@@ -770,7 +925,7 @@ class EventMixin:
                 m_id=member.id,
                 users=users,
             )
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_member_ban(self, guild: discord.Guild, member: discord.Member):
@@ -789,9 +944,7 @@ class EventMixin:
         if guild.id in self._ban_cache and member.id in self._ban_cache[guild.id]:
             # was a ban so we can leave early
             return
-        if guild.id not in self.settings:
-            return
-        if not self.settings[guild.id]["user_left"]["enabled"]:
+        if not self.event_enabled(guild.id, "user_left"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
@@ -818,6 +971,7 @@ class EventMixin:
 
         perp = getattr(entry, "user", None)
         reason = getattr(entry, "reason", None)
+        self.journal_event(guild, "user_left", actor=perp, target=member, content=str(member))
         if embed_links:
             embed = discord.Embed(
                 description=member,
@@ -842,7 +996,7 @@ class EventMixin:
                 icon_url=member.display_avatar,
             )
             embed.set_thumbnail(url=member.display_avatar)
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
             time = datetime.datetime.now(datetime.timezone.utc)
             msg = _(
@@ -866,92 +1020,59 @@ class EventMixin:
                     perp=perp,
                     users=len(guild.members),
                 )
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     async def get_permission_change(
         self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel, embed_links: bool
     ) -> str:
         p_msg = ""
-        before_perms = {}
-        after_perms = {}
         guild = before.guild
-        for o, p in before.overwrites.items():
-            before_perms[str(o.id)] = [i for i in p]
-        for o, p in after.overwrites.items():
-            after_perms[str(o.id)] = [i for i in p]
-        for entity in before_perms:
-            entity_obj = before.guild.get_role(int(entity))
-            if not entity_obj:
-                entity_obj = before.guild.get_member(int(entity))
+        changes = diff_overwrites(overwrite_values(before), overwrite_values(after))
+        if not changes:
+            return p_msg
+        # channels synced to their category don't get their own audit log entry
+        audit_target = before
+        if getattr(after, "permissions_synced", False) and after.category is not None:
+            audit_target = after.category
+        perps = {}
+        actions = {
+            "added": discord.AuditLogAction.overwrite_create,
+            "removed": discord.AuditLogAction.overwrite_delete,
+            "updated": discord.AuditLogAction.overwrite_update,
+        }
+        for kind in {change.kind for change in changes}:
+            entry = await self.get_audit_log_entry(guild, audit_target, actions[kind])
+            perps[kind] = getattr(entry, "user", None)
+        for change in changes:
+            entity_obj = guild.get_role(change.target_id) or guild.get_member(change.target_id)
             if entity_obj is not None:
                 name = entity_obj.mention
             else:
-                name = entity
-            if entity not in after_perms:
-                entry = await self.get_audit_log_entry(
-                    guild, before, discord.AuditLogAction.overwrite_delete
-                )
-                perp = getattr(entry, "user", None)
-                reason = getattr(entry, "reason", None)
+                name = str(change.target_id)
+            perp = perps[change.kind]
+            if change.kind == "removed":
                 if perp:
                     p_msg += _("{name} Removed overwrites:\n").format(name=perp.mention)
                 p_msg += _("{name} Overwrites removed:\n").format(name=name)
-
-                lost_perms = set(before_perms[entity])
-                for diff in lost_perms:
-                    if diff[1] is None:
-                        continue
-                    p_msg += _("{name} {perm} Reset.\n").format(name=name, perm=diff[0])
+                for perm, _value in change.changes:
+                    p_msg += _("{name} {perm} Reset.\n").format(name=name, perm=perm)
                 continue
-            if after_perms[entity] != before_perms[entity]:
-                entry = await self.get_audit_log_entry(
-                    guild, before, discord.AuditLogAction.overwrite_update
-                )
-                perp = getattr(entry, "user", None)
-                reason = getattr(entry, "reason", None)
-
-                if perp:
-                    p_msg += _("{name} Updated overwrites:\n").format(name=perp.mention)
-                a = set(after_perms[entity])
-                b = set(before_perms[entity])
-                a_perms = list(a - b)
-                for diff in a_perms:
-                    p_msg += _("- {name} {perm} Set to {value}.\n").format(
-                        name=name, perm=diff[0].replace("_", " ").title(), value=diff[1]
-                    )
-        for entity in after_perms:
-            entity_obj = after.guild.get_role(int(entity))
-            if not entity_obj:
-                entity_obj = after.guild.get_member(int(entity))
-            if entity_obj is not None:
-                name = entity_obj.mention
-            else:
-                name = entity
-            if entity not in before_perms:
-                entry = await self.get_audit_log_entry(
-                    guild, before, discord.AuditLogAction.overwrite_update
-                )
-                perp = getattr(entry, "user", None)
-                reason = getattr(entry, "reason", None)
+            if change.kind == "added":
                 if perp:
                     p_msg += _("{name} Added overwrites:\n").format(name=perp.mention)
                 p_msg += _("{name} Overwrites added.\n").format(name=name)
-                lost_perms = set(after_perms[entity])
-                for diff in lost_perms:
-                    if diff[1] is None:
-                        continue
-                    p_msg += _("- {name} {perm} Set to {value}.\n").format(
-                        name=name, perm=diff[0].replace("_", " ").title(), value=diff[1]
-                    )
-                continue
+            elif perp:
+                p_msg += _("{name} Updated overwrites:\n").format(name=perp.mention)
+            for perm, value in change.changes:
+                p_msg += _("- {name} {perm} Set to {value}.\n").format(
+                    name=name, perm=display_name(perm), value=value
+                )
         return p_msg
 
     @commands.Cog.listener()
     async def on_guild_channel_create(self, new_channel: discord.abc.GuildChannel) -> None:
         guild = new_channel.guild
-        if guild.id not in self.settings:
-            return
-        if not self.settings[guild.id]["channel_create"]["enabled"]:
+        if not self.event_enabled(guild.id, "channel_create"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
@@ -1005,17 +1126,16 @@ class EventMixin:
             perp_msg=perp_msg,
             channel=new_channel.mention,
         )
+        self.journal_event(guild, "channel_create", actor=perp, target=new_channel, embed=embed)
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, old_channel: discord.abc.GuildChannel):
         guild = old_channel.guild
-        if guild.id not in self.settings:
-            return
-        if not self.settings[guild.id]["channel_delete"]["enabled"]:
+        if not self.event_enabled(guild.id, "channel_delete"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
@@ -1069,16 +1189,15 @@ class EventMixin:
             perp_msg=perp_msg,
             channel=f"#{old_channel.name} ({old_channel.id})",
         )
+        self.journal_event(guild, "channel_delete", actor=perp, target=old_channel, embed=embed)
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_audit_log_entry_create(self, entry: discord.AuditLogEntry):
-        if entry.guild.id not in self.audit_log:
-            self.audit_log[entry.guild.id] = deque(maxlen=10)
-        self.audit_log[entry.guild.id].append(entry)
+        self.audit_log.add(entry)
 
     async def get_audit_log_entry(
         self,
@@ -1097,29 +1216,16 @@ class EventMixin:
         extra: Optional[str] = None,
     ) -> Optional[discord.AuditLogEntry]:
         entry = None
-        if isinstance(target, int) or target is None:
-            target_id = target
-        elif isinstance(target, discord.Invite):
-            target_id = target.code
-        else:
-            target_id = target.id
+        target_id = target_key(target)
 
         if guild.me.guild_permissions.view_audit_log:
-            await asyncio.sleep(5)
-            # wait 5 seconds incase the audit log entry is slow and we prioritize the cache
-            if guild.id in self.audit_log:
-                for log in self.audit_log[guild.id]:
-                    if log.action != action:
-                        continue
-                    if extra is not None:
-                        if getattr(log.after, extra, None) is None:
-                            continue
-                    if target_id == getattr(log.target, "id", None):
-                        logger.trace("Found entry through cache")
-                        entry = log
-                    if target_id == getattr(log.target, "code", None):
-                        logger.trace("Found invite code entry through cache")
-                        entry = log
+            # the entry usually arrives shortly after the event so wait for it
+            # and only ask discord if it doesn't show up in time
+            entry = await self.audit_log.wait_for(
+                guild.id, action, target_id, extra=extra, timeout=self.audit_log_wait
+            )
+            if entry is not None:
+                logger.trace("Found entry through cache")
 
             if entry is None:
                 async for log in guild.audit_logs(limit=5, action=action):
@@ -1140,14 +1246,12 @@ class EventMixin:
         self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
     ) -> None:
         guild = before.guild
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "channel_change"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
-        if not self.settings[guild.id]["channel_change"]["enabled"]:
-            return
         if await self.is_ignored_channel(guild, before):
             return
         try:
@@ -1245,32 +1349,29 @@ class EventMixin:
         embed.add_field(name=_("Channel ID"), value=box(str(after.id)))
         if not worth_updating:
             return
+        self.journal_event(guild, "channel_change", actor=perp, target=after, embed=embed)
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     async def get_role_permission_change(self, before: discord.Role, after: discord.Role) -> str:
         p_msg = ""
-        changed_perms = dict(after.permissions).items() - dict(before.permissions).items()
-
-        for p, change in changed_perms:
+        for p, change in diff_permissions(before.permissions, after.permissions):
             p_msg += _("- {permission} Set to **{change}**\n").format(
-                permission=p.replace("_", " ").title(), change=change
+                permission=display_name(p), change=change
             )
         return p_msg
 
     @commands.Cog.listener()
     async def on_guild_role_update(self, before: discord.Role, after: discord.Role) -> None:
         guild = before.guild
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "role_change"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
-        if not self.settings[guild.id]["role_change"]["enabled"]:
-            return
         try:
             channel = await self.modlog_channel(guild, "role_change")
         except RuntimeError:
@@ -1349,22 +1450,21 @@ class EventMixin:
         embed.add_field(name=_("Role ID"), value=box(str(after.id)))
         if not worth_updating:
             return
+        self.journal_event(guild, "role_change", actor=perp, target=after, embed=embed)
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_guild_role_create(self, role: discord.Role) -> None:
         guild = role.guild
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "role_create"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
-        if not self.settings[guild.id]["role_create"]["enabled"]:
-            return
         try:
             channel = await self.modlog_channel(guild, "role_create")
         except RuntimeError:
@@ -1398,22 +1498,21 @@ class EventMixin:
             msg += _("Reason ") + reason + "\n"
             embed.add_field(name=_("Reason "), value=reason, inline=False)
         embed.add_field(name=_("Role ID"), value=box(str(role.id)))
+        self.journal_event(guild, "role_create", actor=perp, target=role, embed=embed)
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_guild_role_delete(self, role: discord.Role) -> None:
         guild = role.guild
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "role_delete"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
-        if not self.settings[guild.id]["role_delete"]["enabled"]:
-            return
         try:
             channel = await self.modlog_channel(guild, "role_delete")
         except RuntimeError:
@@ -1447,25 +1546,24 @@ class EventMixin:
             msg += _("Reason ") + reason + "\n"
             embed.add_field(name=_("Reason "), value=reason, inline=False)
         embed.add_field(name=_("Role ID"), value=box(str(role.id)))
+        self.journal_event(guild, "role_delete", actor=perp, target=role, embed=embed)
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_message_edit(self, before: discord.Message, after: discord.Message) -> None:
         guild = before.guild
         if guild is None:
             return
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "message_edit"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
         settings = self.settings[guild.id]["message_edit"]
-        if not settings["enabled"]:
-            return
         if before.author.bot and not settings["bots"]:
             return
         if before.content == after.content:
@@ -1495,6 +1593,13 @@ class EventMixin:
                 ref_chan = before.reference.resolved.channel_id
                 ref_msg = before.reference.resolved.id
                 replying = f"https://discord.com/channels/{ref_guild}/{ref_chan}/{ref_msg}"
+        self.journal_event(
+            guild,
+            "message_edit",
+            target=before.author,
+            channel=before.channel,
+            content=before.content,
+        )
         if embed_links:
             embed = discord.Embed(
                 description=f">>> {before.content}",
@@ -1514,7 +1619,7 @@ class EventMixin:
                 icon_url=str(before.author.display_avatar),
             )
             embed.add_field(name=_("Message ID"), value=box(str(after.id)))
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
             msg = _(
                 "{emoji} {time} **{author}** (`{a_id}`) edited a message "
@@ -1528,19 +1633,95 @@ class EventMixin:
                 before=before.content,
                 after=after.jump_url,
             )
-            await channel.send(msg[:2000], allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg[:2000])
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent) -> None:
+        if payload.guild_id is None or "content" not in payload.data:
+            return
+        content = payload.data["content"]
+        stored = self.message_store.edit(payload.message_id, content)
+        if stored is None or payload.cached_message is not None:
+            # edits to cached messages are logged in on_message_edit
+            return
+        if stored.content == content:
+            return
+        guild = self.bot.get_guild(payload.guild_id)
+        if guild is None:
+            return
+        if not self.event_enabled(guild.id, "message_edit"):
+            return
+        if await self.bot.cog_disabled_in_guild(self, guild):
+            return
+        if guild.me.is_timed_out():
+            return
+        settings = self.settings[guild.id]["message_edit"]
+        if stored.bot and not settings["bots"]:
+            return
+        message_channel = guild.get_channel_or_thread(payload.channel_id)
+        if message_channel is None:
+            return
+        try:
+            channel = await self.modlog_channel(guild, "message_edit")
+        except RuntimeError:
+            return
+        if await self.is_ignored_channel(guild, message_channel):
+            return
+        embed_links = channel.permissions_for(guild.me).embed_links and settings["embed"]
+        await i18n.set_contextual_locales_from_guild(self.bot, guild)
+        # set guild level i18n
+        jump_url = f"https://discord.com/channels/{guild.id}/{payload.channel_id}/{stored.id}"
+        self.journal_event(
+            guild,
+            "message_edit",
+            target=stored.author_id,
+            channel=message_channel,
+            content=stored.content,
+        )
+        if embed_links:
+            embed = discord.Embed(
+                description=f">>> {stored.content}",
+                colour=await self.get_event_colour(guild, "message_edit"),
+                timestamp=datetime.datetime.fromtimestamp(
+                    stored.created_at, tz=datetime.timezone.utc
+                ),
+            )
+            embed.add_field(name=_("After Edit"), value=jump_url)
+            embed.add_field(name=_("Channel"), value=message_channel.jump_url)
+            embed.add_field(name=_("Author"), value=f"<@{stored.author_id}>")
+            author = guild.get_member(stored.author_id)
+            embed.set_author(
+                name=_("{member} ({m_id}) - Edited Message").format(
+                    member=stored.author, m_id=stored.author_id
+                ),
+                icon_url=getattr(author, "display_avatar", None),
+            )
+            embed.add_field(name=_("Message ID"), value=box(str(stored.id)))
+            await self.dispatcher.send(channel, embed=embed)
+        else:
+            msg = _(
+                "{emoji} {time} **{author}** (`{a_id}`) edited a message "
+                "in {channel}.\nBefore:\n> {before}\nAfter:\n> {after}"
+            ).format(
+                emoji=settings["emoji"],
+                time=datetime.datetime.now(datetime.timezone.utc).strftime("%H:%M:%S"),
+                author=stored.author,
+                a_id=stored.author_id,
+                channel=message_channel.mention,
+                before=stored.content,
+                after=jump_url,
+            )
+            await self.dispatcher.send(channel, msg[:2000])
 
     @commands.Cog.listener()
     async def on_guild_update(self, before: discord.Guild, after: discord.Guild) -> None:
         guild = after
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "guild_change"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
-        if not self.settings[guild.id]["guild_change"]["enabled"]:
-            return
         try:
             channel = await self.modlog_channel(guild, "guild_change")
         except RuntimeError:
@@ -1602,23 +1783,22 @@ class EventMixin:
             embed.add_field(name=_("Updated by"), value=perp)
         if reason:
             embed.add_field(name=_("Reasons "), value=reason, inline=False)
+        self.journal_event(guild, "guild_change", actor=perp, embed=embed)
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_guild_emojis_update(
         self, guild: discord.Guild, before: Sequence[discord.Emoji], after: Sequence[discord.Emoji]
     ) -> None:
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "emoji_change"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
-        if not self.settings[guild.id]["emoji_change"]["enabled"]:
-            return
         try:
             channel = await self.modlog_channel(guild, "emoji_change")
         except RuntimeError:
@@ -1747,25 +1927,33 @@ class EventMixin:
         if reason:
             msg += _("Reason ") + reason + "\n"
             embed.add_field(name=_("Reason "), value=reason, inline=False)
+        self.journal_event(guild, "emoji_change", actor=perp, embed=embed)
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_voice_state_update(
         self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState
     ) -> None:
         guild = member.guild
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "voice_change"):
             return
-        if await self.bot.cog_disabled_in_guild(self, guild):
+        if member.bot and not self.settings[guild.id]["voice_change"]["bots"]:
             return
-        if guild.me.is_timed_out():
+        merged = await self.debouncer.wait(
+            ("voice_change", guild.id, member.id),
+            before,
+            after,
+            self.snapshots[guild.id].debounce_window("voice_change"),
+        )
+        if merged is None:
             return
-        if not self.settings[guild.id]["voice_change"]["enabled"]:
+        before, after = merged
+        if await self.bot.cog_disabled_in_guild(self, guild):
             return
-        if member.bot and not self.settings[guild.id]["voice_change"]["bots"]:
+        if guild.me.is_timed_out():
             return
         try:
             channel = await self.modlog_channel(guild, "voice_change")
@@ -1869,23 +2057,39 @@ class EventMixin:
         if reason:
             msg += _("Reason ") + reason + "\n"
             embed.add_field(name=_("Reason "), value=reason, inline=False)
+        self.journal_event(
+            guild,
+            "voice_change",
+            actor=perp,
+            target=member,
+            channel=after.channel or before.channel,
+            related=[before.channel, after.channel],
+            embed=embed,
+        )
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
         guild = before.guild
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "user_change"):
             return
-        if await self.bot.cog_disabled_in_guild(self, guild):
+        if not self.settings[guild.id]["user_change"]["bots"] and after.bot:
             return
-        if guild.me.is_timed_out():
+        merged = await self.debouncer.wait(
+            ("user_change", guild.id, after.id),
+            before,
+            after,
+            self.snapshots[guild.id].debounce_window("user_change"),
+        )
+        if merged is None:
             return
-        if not self.settings[guild.id]["user_change"]["enabled"]:
+        before, after = merged
+        if await self.bot.cog_disabled_in_guild(self, guild):
             return
-        if not self.settings[guild.id]["user_change"]["bots"] and after.bot:
+        if guild.me.is_timed_out():
             return
         try:
             channel = await self.modlog_channel(guild, "user_change")
@@ -2012,10 +2216,18 @@ class EventMixin:
             msg += _("Reason: ") + f"{reason}\n"
             embed.add_field(name=_("Reason"), value=reason, inline=False)
         embed.add_field(name=_("Member ID"), value=box(str(after.id)))
+        self.journal_event(
+            guild,
+            "user_change",
+            actor=perp,
+            target=after,
+            related=set(before.roles) ^ set(after.roles),
+            embed=embed,
+        )
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_invite_create(self, invite: discord.Invite) -> None:
@@ -2029,28 +2241,13 @@ class EventMixin:
             return
         if guild.id not in self.settings:
             return
+        await self.invite_tracker.created(invite)
+        if not self.event_enabled(guild.id, "invite_created"):
+            return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
-        if invite.code not in self.settings[guild.id]["invite_links"]:
-            created_at = getattr(
-                invite, "created_at", datetime.datetime.now(datetime.timezone.utc)
-            )
-            inviter = getattr(invite, "inviter", discord.Object(id=0))
-            channel = getattr(invite, "channel", discord.Object(id=0))
-            self.settings[guild.id]["invite_links"][invite.code] = {
-                "uses": getattr(invite, "uses", 0),
-                "max_age": getattr(invite, "max_age", None),
-                "created_at": created_at.timestamp(),
-                "max_uses": getattr(invite, "max_uses", None),
-                "temporary": getattr(invite, "temporary", False),
-                "inviter": getattr(inviter, "id", "Unknown"),
-                "channel": channel.id,
-            }
-            await self.save(guild)
-        if not self.settings[guild.id]["invite_created"]["enabled"]:
-            return
         try:
             channel = await self.modlog_channel(guild, "invite_created")
         except RuntimeError:
@@ -2113,10 +2310,13 @@ class EventMixin:
                 embed.add_field(name=name, value=str(before_attr))
         if not worth_updating:
             return
+        self.journal_event(
+            guild, "invite_created", actor=invite.inviter, channel=invite.channel, embed=embed
+        )
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_invite_delete(self, invite: discord.Invite) -> None:
@@ -2130,12 +2330,13 @@ class EventMixin:
             return
         if guild.id not in self.settings:
             return
+        await self.invite_tracker.deleted(invite)
+        if not self.event_enabled(guild.id, "invite_deleted"):
+            return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
-        if not self.settings[guild.id]["invite_deleted"]["enabled"]:
-            return
         try:
             channel = await self.modlog_channel(guild, "invite_deleted")
         except RuntimeError:
@@ -2207,17 +2408,23 @@ class EventMixin:
             embed.add_field(name=_("Reason"), value=reason)
         if not worth_updating:
             return
+        self.journal_event(
+            guild,
+            "invite_deleted",
+            actor=perp,
+            target=invite.inviter,
+            channel=invite.channel,
+            embed=embed,
+        )
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_thread_create(self, thread: discord.Thread) -> None:
         guild = thread.guild
-        if guild.id not in self.settings:
-            return
-        if not self.settings[guild.id]["thread_create"]["enabled"]:
+        if not self.event_enabled(guild.id, "thread_create"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
@@ -2271,19 +2478,25 @@ class EventMixin:
             perp_msg=perp_msg,
             channel=thread.mention,
         )
+        self.journal_event(
+            guild,
+            "thread_create",
+            actor=perp,
+            target=thread,
+            channel=thread.parent_id,
+            embed=embed,
+        )
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_raw_thread_delete(self, payload: discord.RawThreadDeleteEvent):
         guild = self.bot.get_guild(payload.guild_id)
         if guild is None:
             return
-        if guild.id not in self.settings:
-            return
-        if not self.settings[guild.id]["thread_delete"]["enabled"]:
+        if not self.event_enabled(guild.id, "thread_delete"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
@@ -2344,22 +2557,28 @@ class EventMixin:
             perp_msg=perp_msg,
             channel=f"#{description} ({payload.thread_id})",
         )
+        self.journal_event(
+            guild,
+            "thread_delete",
+            actor=perp,
+            target=payload.thread_id,
+            channel=payload.parent_id,
+            embed=embed,
+        )
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_thread_update(self, before: discord.Thread, after: discord.Thread) -> None:
         guild = before.guild
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "thread_change"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
-        if not self.settings[guild.id]["thread_change"]["enabled"]:
-            return
         if await self.is_ignored_channel(guild, before):
             return
         try:
@@ -2442,23 +2661,24 @@ class EventMixin:
         embed.add_field(name=_("Thread ID"), value=box(str(after.id)))
         if not worth_updating:
             return
+        self.journal_event(
+            guild, "thread_change", actor=perp, target=after, channel=after.parent_id, embed=embed
+        )
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
 
     @commands.Cog.listener()
     async def on_guild_stickers_update(
         self, guild: discord.Guild, before: Sequence[discord.Emoji], after: Sequence[discord.Emoji]
     ) -> None:
-        if guild.id not in self.settings:
+        if not self.event_enabled(guild.id, "stickers_change"):
             return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
         if guild.me.is_timed_out():
             return
-        if not self.settings[guild.id]["stickers_change"]["enabled"]:
-            return
         try:
             channel = await self.modlog_channel(guild, "stickers_change")
         except RuntimeError:
@@ -2586,7 +2806,8 @@ class EventMixin:
         if reason:
             msg += _("Reason ") + reason + "\n"
             embed.add_field(name=_("Reason "), value=reason, inline=False)
+        self.journal_event(guild, "stickers_change", actor=perp, embed=embed)
         if embed_links:
-            await channel.send(embed=embed, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, embed=embed)
         else:
-            await channel.send(msg, allowed_mentions=self.allowed_mentions)
+            await self.dispatcher.send(channel, msg)
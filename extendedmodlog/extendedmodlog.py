@@ -1,14 +1,34 @@
-from collections import deque
-from typing import Deque, Dict, Union
+import asyncio
+from typing import Optional, Union
 
 import discord
 from red_commons.logging import getLogger
 from redbot.core import Config, checks, commands, modlog
+from redbot.core.data_manager import cog_data_path
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils.chat_formatting import humanize_list
-
-from .eventmixin import CommandPrivs, EventChooser, EventMixin, MemberUpdateEnum
+from redbot.core.utils.chat_formatting import humanize_list, humanize_number, pagify
+
+from .auditlog import DEFAULT_AUDIT_LOG_WAIT, AuditLogCache
+from .debounce import DEFAULT_WINDOWS, MAX_WINDOW, UpdateDebouncer
+from .dispatcher import LogDispatcher
+from .eventmixin import (
+    CommandPrivs,
+    EventChooser,
+    EventMixin,
+    JournalSearchFlags,
+    MemberUpdateEnum,
+)
+from .invites import InviteTracker
+from .journal import EventJournal
+from .messagestore import (
+    DEFAULT_MEMORY_MB,
+    DEFAULT_TTL_HOURS,
+    DISK_MULTIPLIER,
+    MessageStore,
+    RingFile,
+)
 from .settings import inv_settings
+from .snapshot import GuildSnapshot
 
 _ = Translator("ExtendedModLog", __file__)
 logger = getLogger("red.trusty-cogs.ExtendedModLog")
@@ -63,18 +83,35 @@ class ExtendedModLog(EventMixin, commands.Cog):
     """
 
     __author__ = ["RePulsar", "TrustyJAID"]
-    __version__ = "2.12.5"
+    __version__ = "2.21.0"
 
     def __init__(self, bot):
         self.bot = bot
         self.config = Config.get_conf(self, 154457677895, force_registration=True)
         self.config.register_guild(**inv_settings)
-        self.config.register_global(version="0.0.0")
+        self.config.register_global(
+            version="0.0.0",
+            audit_log_wait=DEFAULT_AUDIT_LOG_WAIT,
+            message_store_mb=DEFAULT_MEMORY_MB,
+            message_store_hours=DEFAULT_TTL_HOURS,
+            message_store_disk=False,
+            journal_days=0,
+        )
         self.settings = {}
+        self.snapshots = {}
         self._ban_cache = {}
-        self.invite_links_loop.start()
         self.allowed_mentions = discord.AllowedMentions(users=False, roles=False, everyone=False)
-        self.audit_log: Dict[int, Deque[discord.AuditLogEntry]] = {}
+        self.dispatcher = LogDispatcher(self.allowed_mentions)
+        self.audit_log = AuditLogCache()
+        self.audit_log_wait = DEFAULT_AUDIT_LOG_WAIT
+        InviteTracker.register(self.config)
+        self.invite_tracker = InviteTracker(self.config)
+        self._invite_sync: Optional[asyncio.Task] = None
+        self.message_store = MessageStore(
+            DEFAULT_MEMORY_MB * 1024 * 1024, DEFAULT_TTL_HOURS * 3600
+        )
+        self.journal: Optional[EventJournal] = None
+        self.debouncer = UpdateDebouncer()
 
     def format_help_for_context(self, ctx: commands.Context):
         """
@@ -84,19 +121,55 @@ class ExtendedModLog(EventMixin, commands.Cog):
         return f"{pre_processed}\n\nCog Version: {self.__version__}"
 
     async def cog_unload(self):
-        self.invite_links_loop.stop()
-
-    async def red_delete_data_for_user(self, **kwargs):
-        """
-        Nothing to delete
-        """
-        return
+        if self._invite_sync is not None:
+            self._invite_sync.cancel()
+        self.invite_tracker.close()
+        self.audit_log.clear()
+        self.debouncer.close()
+        await self.dispatcher.close()
+        self.message_store.close()
+        if self.journal is not None:
+            await self.journal.close()
+
+    async def red_delete_data_for_user(self, *, requester, user_id: int):
+        """
+        Remove the user's messages from the message store and their events from the journal.
+        """
+        self.message_store.forget_user(user_id)
+        if self.journal is not None:
+            await self.journal.forget_user(user_id)
+
+    async def load_message_store(self) -> None:
+        megabytes = await self.config.message_store_mb()
+        spill = None
+        if await self.config.message_store_disk():
+            path = cog_data_path(self) / "message_store.bin"
+            spill = RingFile(path, megabytes * DISK_MULTIPLIER * 1024 * 1024)
+        self.message_store.close()
+        self.message_store = MessageStore(
+            megabytes * 1024 * 1024, await self.config.message_store_hours() * 3600, spill
+        )
 
     async def cog_load(self) -> None:
         if await self.config.version() < "2.8.5":
             await self.migrate_2_8_5_settings()
+        self.audit_log_wait = await self.config.audit_log_wait()
+        await self.load_message_store()
+        if days := await self.config.journal_days():
+            self.journal = EventJournal(cog_data_path(self) / "journal", days)
+        await self.invite_tracker.load()
         for guild_id in await self.config.all_guilds():
-            self.settings[int(guild_id)] = await self.config.guild_from_id(guild_id).all()
+            guild_config = self.config.guild_from_id(guild_id)
+            settings = await guild_config.all()
+            invite_links = settings.pop("invite_links", None)
+            if invite_links is not None:
+                # older versions saved invites with the guild settings
+                if invite_links:
+                    await self.invite_tracker.import_links(int(guild_id), invite_links)
+                await guild_config.clear_raw("invite_links")
+            self.settings[int(guild_id)] = settings
+            self.snapshots[int(guild_id)] = GuildSnapshot.from_settings(settings)
+        self._invite_sync = asyncio.create_task(self.sync_invite_links())
 
     async def migrate_2_8_5_settings(self):
         all_data = await self.config.all_guilds()
@@ -189,7 +262,7 @@ class ExtendedModLog(EventMixin, commands.Cog):
         if ignored_channels:
             chans = ", ".join(c.mention for c in ignored_channels)
             msg += _("Ignored Channels") + ": " + chans
-        await self.config.guild(ctx.guild).set(data)
+        await self.save(ctx.guild)
         # save the data back to config incase we had some deleted channels
         await ctx.maybe_send_embed(msg)
 
@@ -206,9 +279,12 @@ class ExtendedModLog(EventMixin, commands.Cog):
         pass
 
     async def save(self, guild: discord.Guild):
-        async with self.config.guild(guild).all() as all_settings:
-            for key, value in self.settings[guild.id].items():
-                all_settings[key] = value
+        guild_config = self.config.guild(guild)
+        saved = await guild_config.all()
+        for key, value in self.settings[guild.id].items():
+            if saved.get(key) != value:
+                await guild_config.set_raw(key, value=value)
+        self.snapshots[guild.id] = GuildSnapshot.from_settings(self.settings[guild.id])
 
     @_modlog.command(name="settings")
     async def _show_modlog_settings(self, ctx: commands.Context):
@@ -477,6 +553,29 @@ class ExtendedModLog(EventMixin, commands.Cog):
         await self.save(ctx.guild)
         await ctx.send(msg.format(enabled_or_disabled=verb))
 
+    @_delete.command(name="storecontent")
+    async def _delete_store_content(self, ctx: commands.Context) -> None:
+        """
+        Toggle keeping recent message content for delete and edit logs.
+
+        The bot only remembers a limited number of messages so deletes and edits of
+        older messages are logged without their content. When this is enabled the
+        content, author, and attachment names of messages in channels that aren't
+        ignored are kept for a limited time so they can be logged.
+        """
+        if ctx.guild.id not in self.settings:
+            self.settings[ctx.guild.id] = await self.config.guild(ctx.guild).all()
+        guild = ctx.message.guild
+        msg = _("Storing message content for delete and edit logs {enabled_or_disabled}.")
+        if not await self.config.guild(guild).message_delete.store_content():
+            self.settings[ctx.guild.id]["message_delete"]["store_content"] = True
+            verb = _("enabled")
+        else:
+            self.settings[ctx.guild.id]["message_delete"]["store_content"] = False
+            verb = _("disabled")
+        await self.save(ctx.guild)
+        await ctx.send(msg.format(enabled_or_disabled=verb))
+
     @_modlog.group(name="member", aliases=["members", "memberchanges"])
     async def _members(self, ctx: commands.Context) -> None:
         """
@@ -637,6 +736,221 @@ class ExtendedModLog(EventMixin, commands.Cog):
         # user_change[update_type.name] = set_to
         await self._members_settings(ctx)
 
+    @_modlog.command(name="queue")
+    async def _show_queue(self, ctx: commands.Context) -> None:
+        """
+        Show how many log messages are waiting to be sent in this server.
+
+        Events logged while a channel is busy are combined into fewer messages
+        so a raid or mass role change doesn't fall behind Discord's rate limits.
+        """
+        channels = [c.id for c in ctx.guild.channels] + [t.id for t in ctx.guild.threads]
+        stats = self.dispatcher.to_dict(channels)
+        msg = _("Queued events: {queued}\n").format(queued=stats["queued"])
+        for channel_id, length in stats["channels"].items():
+            msg += _("- <#{channel_id}>: {length}\n").format(channel_id=channel_id, length=length)
+        if await self.bot.is_owner(ctx.author):
+            msg += _(
+                "All servers: {events} events sent in {messages} messages, "
+                "{waiting} events waiting for room in a full queue."
+            ).format(**stats)
+            msg += _(
+                "\n{pending} member updates waiting to be merged, {merged} merged so far."
+            ).format(pending=len(self.debouncer), merged=self.debouncer.merged)
+        await ctx.send(msg)
+
+    @_modlog.command(name="debounce")
+    async def _set_debounce(
+        self,
+        ctx: commands.Context,
+        seconds: commands.Range[float, 0, MAX_WINDOW],
+        *events: EventChooser,
+    ) -> None:
+        """
+        Set how long to merge rapid member and voice updates for.
+
+        - `<seconds>` between 0 and 30, 0 logs every update on its own.
+        - `<events>` `member_change` (defaults to 2 seconds) and/or `voice_change`
+        (defaults to 1 second).
+
+        Updates to the same member within this time, like several roles being added
+        by a bot or someone being muted and deafened, are logged as one change.
+        """
+        if len(events) == 0:
+            return await ctx.send(_("You must provide which events should be included."))
+        unsupported = [e for e in events if e not in DEFAULT_WINDOWS]
+        if unsupported:
+            return await ctx.send(
+                _("Only member and voice changes can be merged, not {events}.").format(
+                    events=humanize_list([e.replace("user_", "member_") for e in unsupported])
+                )
+            )
+        if ctx.guild.id not in self.settings:
+            self.settings[ctx.guild.id] = await self.config.guild(ctx.guild).all()
+        for event in events:
+            self.settings[ctx.guild.id][event]["debounce"] = seconds
+        await self.save(ctx.guild)
+        await ctx.send(
+            _("{event} updates will be merged over {seconds} seconds.").format(
+                event=humanize_list([e.replace("user_", "member_") for e in events]),
+                seconds=seconds,
+            )
+        )
+
+    @_modlog.command(name="auditlogwait", hidden=True)
+    @checks.is_owner()
+    async def _audit_log_wait(
+        self, ctx: commands.Context, seconds: commands.Range[float, 0, 30]
+    ) -> None:
+        """
+        Set how long to wait for an audit log entry before fetching the audit log.
+
+        - `<seconds>` between 0 and 30, defaults to 5.
+
+        Entries are used as soon as they arrive so this only matters when
+        an event has no audit log entry or the entry is very slow.
+        """
+        await self.config.audit_log_wait.set(seconds)
+        self.audit_log_wait = seconds
+        await ctx.send(
+            _("Waiting up to {seconds} seconds for audit log entries.").format(seconds=seconds)
+        )
+
+    @_modlog.command(name="messagestore", hidden=True)
+    @checks.is_owner()
+    async def _message_store(
+        self,
+        ctx: commands.Context,
+        megabytes: commands.Range[int, 1, 1024],
+        hours: commands.Range[int, 1, 168],
+        disk: bool = False,
+    ) -> None:
+        """
+        Set the size of the message store used by `[p]modlog delete storecontent`.
+
+        - `<megabytes>` how much memory stored messages can use, defaults to 16.
+        - `<hours>` how long messages are kept, defaults to 24.
+        - `[disk]` keep messages which don't fit in memory in a file
+        4 times the size of `<megabytes>` in the cog's data folder.
+
+        Changing this clears the messages currently stored.
+        """
+        await self.config.message_store_mb.set(megabytes)
+        await self.config.message_store_hours.set(hours)
+        await self.config.message_store_disk.set(disk)
+        await self.load_message_store()
+        await ctx.send(
+            _("Storing up to {megabytes} MB of messages for {hours} hours{disk}.").format(
+                megabytes=megabytes,
+                hours=hours,
+                disk=_(" with overflow saved to disk") if disk else "",
+            )
+        )
+
+    @_modlog.command(name="journal", hidden=True)
+    @checks.is_owner()
+    async def _journal(self, ctx: commands.Context, days: commands.Range[int, 0, 365]) -> None:
+        """
+        Keep a local journal of logged events for `[p]modlog search`.
+
+        - `<days>` how many days of events to keep, `0` turns the journal off.
+
+        Events are saved in the cog's data folder, one file per server per day.
+        Only servers which turn it on with `[p]modlog usejournal` are recorded.
+        Turning the journal off doesn't delete events already saved.
+        """
+        await self.config.journal_days.set(days)
+        if self.journal is not None:
+            await self.journal.close()
+            self.journal = None
+        if not days:
+            await ctx.send(_("The event journal has been turned off."))
+            return
+        self.journal = EventJournal(cog_data_path(self) / "journal", days)
+        files, size = self.journal.stats()
+        await ctx.send(
+            _(
+                "Keeping {days} days of events in the journal. "
+                "It currently has {files} files using {size} KB."
+            ).format(days=days, files=files, size=humanize_number(size // 1024))
+        )
+
+    @_modlog.command(name="usejournal")
+    async def _use_journal(self, ctx: commands.Context) -> None:
+        """
+        Toggle recording this server's logged events in the event journal.
+
+        The journal has to be enabled by the bot owner as well. Recorded events
+        can be searched with `[p]modlog search`.
+        """
+        if ctx.guild.id not in self.settings:
+            self.settings[ctx.guild.id] = await self.config.guild(ctx.guild).all()
+        msg = _("Recording logged events in the event journal {enabled_or_disabled}.")
+        if not await self.config.guild(ctx.guild).journal():
+            self.settings[ctx.guild.id]["journal"] = True
+            verb = _("enabled")
+        else:
+            self.settings[ctx.guild.id]["journal"] = False
+            verb = _("disabled")
+        await self.save(ctx.guild)
+        if self.journal is None:
+            msg += " " + _("The bot owner has not enabled the event journal on this bot.")
+        await ctx.send(msg.format(enabled_or_disabled=verb))
+
+    def _can_read_record(self, author: discord.Member, channel_id: Optional[int]) -> bool:
+        """Whether a journal record is about a channel the member can read"""
+        if channel_id is None:
+            return True
+        channel = author.guild.get_channel_or_thread(channel_id)
+        if channel is None:
+            # nothing to check against once the channel is gone
+            return author.guild_permissions.administrator
+        return channel.permissions_for(author).read_messages
+
+    @_modlog.command(name="search")
+    async def _journal_search(self, ctx: commands.Context, *, search: JournalSearchFlags) -> None:
+        """
+        Search the event journal for logged events.
+
+        Only events from channels you can read are shown.
+
+        Usage:
+        - `user:` Events done by or to this user.
+        - `channel:` Events in or about this channel.
+        - `role:` Events about this role.
+        - `event:` Only this type of event, see `[p]help modlog toggle` for the names.
+        - `days:` How many days back to search. Defaults to 7.
+        Example:
+            `[p]modlog search user: @TrustyJAID event: message_delete days: 30`
+        """
+        if self.journal is None:
+            await ctx.send(_("The event journal is not enabled on this bot."))
+            return
+        if not self.settings.get(ctx.guild.id, {}).get("journal"):
+            await ctx.send(
+                _(
+                    "The event journal is not enabled on this server, "
+                    "see `{prefix}modlog usejournal`."
+                ).format(prefix=ctx.clean_prefix)
+            )
+            return
+        ids = [o.id for o in (search.user, search.channel, search.role) if o is not None]
+        since = ctx.message.created_at.timestamp() - search.days * 86400
+        events = {search.event} if search.event else None
+        async with ctx.typing():
+            records = await self.journal.search(ctx.guild.id, ids, events=events, since=since)
+        records = [r for r in records if self._can_read_record(ctx.author, r.channel_id)]
+        if not records:
+            await ctx.send(_("No events found."))
+            return
+        msg = ""
+        for record in records:
+            actor = f" <@{record.actor_id}>" if record.actor_id else ""
+            summary = record.summary.replace("\n", " ")[:200]
+            msg += f"<t:{int(record.timestamp)}:f> `{record.event}`{actor}: {summary}\n"
+        for page in pagify(msg, delims=["\n"]):
+            await ctx.send(page, allowed_mentions=self.allowed_mentions)
+
     @_modlog.command(name="commandlevel", aliases=["commandslevel"])
     async def _command_level(self, ctx: commands.Context, *level: CommandPrivs) -> None:
         """
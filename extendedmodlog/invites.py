@@ -0,0 +1,180 @@
+import asyncio
+import datetime
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import discord
+from red_commons.logging import getLogger
+from redbot.core import Config
+
+logger = getLogger("red.trusty-cogs.ExtendedModLog")
+
+# Joins arriving this close together share a single `guild.invites()` call
+JOIN_COALESCE_DELAY = 1.0
+# How long a deleted invite can still be credited with a join, invites which
+# reach their max uses are deleted by discord as the member joins
+DELETED_INVITE_TTL = 60
+# Config custom group the invites are stored in, kept apart from the guild settings
+# so invite changes never rewrite them
+INVITE_GROUP = "INVITE_LINKS"
+
+InviteData = Dict[str, Any]
+
+
+def invite_data(invite: discord.Invite) -> InviteData:
+    """The stored form of an invite"""
+    created_at = getattr(invite, "created_at", None) or datetime.datetime.now(
+        datetime.timezone.utc
+    )
+    channel = getattr(invite, "channel", None) or discord.Object(id=0)
+    inviter = getattr(invite, "inviter", None) or discord.Object(id=0)
+    return {
+        "uses": getattr(invite, "uses", 0),
+        "max_age": getattr(invite, "max_age", None),
+        "created_at": created_at.timestamp(),
+        "max_uses": getattr(invite, "max_uses", None),
+        "temporary": getattr(invite, "temporary", False),
+        "inviter": getattr(inviter, "id", "Unknown"),
+        "channel": getattr(channel, "id", "Unknown"),
+    }
+
+
+def _on_last_use(data: InviteData) -> bool:
+    uses, max_uses = data.get("uses"), data.get("max_uses")
+    return bool(max_uses) and uses is not None and max_uses - uses == 1
+
+
+class InviteTracker:
+    """
+    Tracks invite uses from gateway events to work out which invite a member joined with.
+
+    Invites are added and removed from `on_invite_create` and `on_invite_delete`
+    so the only REST call needed is one `guild.invites()` to see which uses went
+    up. Joins that arrive together wait for the same call and the increments are
+    handed out in join order. Only invites which changed are written to config.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self._invites: Dict[int, Dict[str, InviteData]] = {}
+        self._waiters: Dict[int, List[asyncio.Future]] = {}
+        self._syncing: Dict[int, asyncio.Task] = {}
+        # recently deleted invites which may have been deleted by being used
+        self._deleted: Dict[int, Deque[Tuple[float, str, InviteData]]] = {}
+
+    @staticmethod
+    def register(config: Config) -> None:
+        config.init_custom(INVITE_GROUP, 1)
+        config.register_custom(INVITE_GROUP, links={})
+
+    def _store(self, guild_id: int):
+        return self.config.custom(INVITE_GROUP, str(guild_id)).links
+
+    async def load(self) -> None:
+        for guild_id, data in (await self.config.custom(INVITE_GROUP).all()).items():
+            self._invites[int(guild_id)] = data.get("links", {})
+
+    async def import_links(self, guild_id: int, links: Dict[str, InviteData]) -> None:
+        """Move invites saved with the guild settings by older versions into the invite store"""
+        invites = self.invites(guild_id)
+        for code, data in links.items():
+            invites.setdefault(code, data)
+        await self._store(guild_id).set(invites)
+
+    def invites(self, guild_id: int) -> Dict[str, InviteData]:
+        return self._invites.setdefault(guild_id, {})
+
+    async def created(self, invite: discord.Invite) -> None:
+        guild_id = invite.guild.id
+        if invite.code in self.invites(guild_id):
+            return
+        data = invite_data(invite)
+        self.invites(guild_id)[invite.code] = data
+        await self._store(guild_id).set_raw(invite.code, value=data)
+
+    async def deleted(self, invite: discord.Invite) -> None:
+        guild_id = invite.guild.id
+        data = self.invites(guild_id).pop(invite.code, None)
+        if data is None:
+            return
+        self._deleted.setdefault(guild_id, deque()).append((time.monotonic(), invite.code, data))
+        await self._store(guild_id).clear_raw(invite.code)
+
+    def _recently_deleted(self, guild_id: int) -> Deque[Tuple[float, str, InviteData]]:
+        deleted = self._deleted.get(guild_id, deque())
+        oldest = time.monotonic() - DELETED_INVITE_TTL
+        while deleted and deleted[0][0] < oldest:
+            deleted.popleft()
+        return deleted
+
+    async def used_invite(self, guild: discord.Guild) -> Optional[Tuple[str, InviteData]]:
+        """
+        The invite a member who just joined used.
+
+        Returns `(code, data)` or `None` if it couldn't be worked out.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(guild.id, []).append(future)
+        task = self._syncing.get(guild.id)
+        if task is None or task.done():
+            self._syncing[guild.id] = asyncio.create_task(self._sync_joins(guild))
+        return await future
+
+    async def _sync_joins(self, guild: discord.Guild) -> None:
+        while self._waiters.get(guild.id):
+            await asyncio.sleep(JOIN_COALESCE_DELAY)
+            waiters = self._waiters.pop(guild.id, [])
+            try:
+                used = await self.sync(guild)
+            except Exception:
+                logger.exception("Error checking invite uses in %s", guild.id)
+                used = []
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(used.pop(0) if used else None)
+
+    async def sync(self, guild: discord.Guild) -> List[Tuple[str, InviteData]]:
+        """
+        Fetch the guild's invites, save anything that changed,
+        and return one `(code, data)` for every use since the last sync.
+        """
+        known = self.invites(guild.id)
+        current = {invite.code: invite_data(invite) for invite in await guild.invites()}
+        used: List[Tuple[str, InviteData]] = []
+        changed: Dict[str, InviteData] = {}
+        for code, data in current.items():
+            old = known.get(code)
+            if old == data:
+                continue
+            changed[code] = data
+            if old is None or old.get("uses") is None or data["uses"] is None:
+                # we can't get accurate information if the uses is None
+                continue
+            used.extend((code, data) for _ in range(data["uses"] - old["uses"]))
+        removed = [code for code in known if code not in current]
+        for code in removed:
+            data = known[code]
+            if _on_last_use(data):
+                # deleted as it reached max uses
+                used.append((code, {**data, "uses": data["max_uses"]}))
+        for _deleted_at, code, data in self._recently_deleted(guild.id):
+            if _on_last_use(data):
+                used.append((code, {**data, "uses": data["max_uses"]}))
+        self._deleted.pop(guild.id, None)
+        store = self._store(guild.id)
+        for code in removed:
+            del known[code]
+            await store.clear_raw(code)
+        for code, data in changed.items():
+            known[code] = data
+            await store.set_raw(code, value=data)
+        return used
+
+    def close(self) -> None:
+        for task in self._syncing.values():
+            task.cancel()
+        for waiters in self._waiters.values():
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
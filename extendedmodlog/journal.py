@@ -0,0 +1,313 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from red_commons.logging import getLogger
+
+logger = getLogger("red.trusty-cogs.ExtendedModLog")
+
+# each guild's journal is split into one file per day so old days can be deleted whole
+SEGMENT_SECONDS = 86400
+FLUSH_INTERVAL = 1.0
+# segments whose index is kept in memory, the rest are read from their index file
+MAX_OPEN_SEGMENTS = 64
+MAX_SUMMARY = 1000
+MAX_SEARCH_RESULTS = 50
+
+
+class JournalRecord(NamedTuple):
+    event: str
+    guild_id: int
+    timestamp: float
+    actor_id: Optional[int]
+    target_id: Optional[int]
+    channel_id: Optional[int]
+    # every user, channel, and role id the event is about, these are what's indexed
+    ids: Tuple[int, ...]
+    summary: str
+
+    def to_line(self) -> bytes:
+        return json.dumps(self, separators=(",", ":")).encode("utf-8") + b"\n"
+
+    @classmethod
+    def from_line(cls, line: bytes) -> "JournalRecord":
+        *fields, ids, summary = json.loads(line)
+        return cls(*fields, tuple(ids), summary)
+
+
+def summarise(content: Optional[str] = None, embed: Optional[Any] = None) -> str:
+    """A plain text version of a log message to store with its record"""
+    parts = []
+    if content:
+        parts.append(content)
+    elif embed is not None:
+        if embed.description:
+            parts.append(str(embed.description))
+        parts.extend(f"{field.name}: {field.value}" for field in embed.fields)
+    return "\n".join(parts)[:MAX_SUMMARY]
+
+
+class Segment:
+    """
+    One guild's events for one day.
+
+    Records are appended to `<day>.jsonl` and an inverted index of
+    id -> line offsets is saved beside it in `<day>.idx`.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.index_path = path.with_suffix(".idx")
+        self.index: Dict[int, List[int]] = {}
+        self.offsets: List[int] = []
+        self.size = 0
+        self.dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        size = self.path.stat().st_size
+        try:
+            with self.index_path.open("r") as infile:
+                data = json.load(infile)
+            if data["size"] == size:
+                self.index = {int(k): v for k, v in data["index"].items()}
+                self.offsets = data["offsets"]
+                self.size = size
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        # the index is missing or was written before the last records so rebuild it
+        with self.path.open("rb") as infile:
+            offset = 0
+            for line in infile:
+                if line.endswith(b"\n"):
+                    try:
+                        self._index(JournalRecord.from_line(line), offset)
+                    except (ValueError, TypeError):
+                        pass
+                offset += len(line)
+        self.size = offset
+        self.dirty = True
+
+    def _index(self, record: JournalRecord, offset: int) -> None:
+        self.offsets.append(offset)
+        for _id in set(record.ids):
+            self.index.setdefault(_id, []).append(offset)
+
+    def append(self, records: List[JournalRecord]) -> None:
+        with self.path.open("ab") as outfile:
+            outfile.seek(0, 2)
+            offset = outfile.tell()
+            for record in records:
+                line = record.to_line()
+                outfile.write(line)
+                self._index(record, offset)
+                offset += len(line)
+        self.size = offset
+        self.dirty = True
+
+    def save_index(self) -> None:
+        if not self.dirty:
+            return
+        data = {"size": self.size, "offsets": self.offsets, "index": self.index}
+        with self.index_path.open("w") as outfile:
+            json.dump(data, outfile, separators=(",", ":"))
+        self.dirty = False
+
+    def find(self, ids: Iterable[int]) -> List[int]:
+        """Offsets of records mentioning every id, newest first"""
+        offsets: Optional[Set[int]] = None
+        for _id in ids:
+            found = set(self.index.get(_id, ()))
+            offsets = found if offsets is None else offsets & found
+        if offsets is None:
+            return self.offsets[::-1]
+        return sorted(offsets, reverse=True)
+
+    def read(self, offsets: List[int]) -> Iterable[JournalRecord]:
+        with self.path.open("rb") as infile:
+            for offset in offsets:
+                infile.seek(offset)
+                try:
+                    yield JournalRecord.from_line(infile.readline())
+                except (ValueError, TypeError):
+                    continue
+
+
+class EventJournal:
+    """
+    An append only local journal of logged events which can be searched by
+    the users, channels, and roles involved without reading back the log channel.
+
+    Records are buffered and written once a second in a thread. Segments
+    older than `retention_days` are deleted.
+    """
+
+    def __init__(self, root: Path, retention_days: int):
+        self.root = root
+        self.retention_days = retention_days
+        self._pending: List[JournalRecord] = []
+        self._segments: "OrderedDict[Tuple[int, int], Segment]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+        self.written = 0
+
+    def add(self, record: JournalRecord) -> None:
+        self._pending.append(record)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self) -> None:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        await self.flush()
+
+    async def flush(self) -> None:
+        records, self._pending = self._pending, []
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._write, records)
+            except Exception:
+                logger.exception("Error writing %s events to the journal", len(records))
+
+    def _segment(self, guild_id: int, day: int) -> Segment:
+        key = (guild_id, day)
+        segment = self._segments.get(key)
+        if segment is None:
+            folder = self.root / str(guild_id)
+            folder.mkdir(parents=True, exist_ok=True)
+            segment = self._segments[key] = Segment(folder / f"{day}.jsonl")
+        self._segments.move_to_end(key)
+        while len(self._segments) > MAX_OPEN_SEGMENTS:
+            _key, oldest = self._segments.popitem(last=False)
+            oldest.save_index()
+        return segment
+
+    def _write(self, records: List[JournalRecord]) -> None:
+        batches: Dict[Tuple[int, int], List[JournalRecord]] = {}
+        for record in records:
+            day = int(record.timestamp // SEGMENT_SECONDS)
+            batches.setdefault((record.guild_id, day), []).append(record)
+        for (guild_id, day), batch in batches.items():
+            self._segment(guild_id, day).append(batch)
+            self.written += len(batch)
+        for (guild_id, day), segment in self._segments.items():
+            if day < int(time.time() // SEGMENT_SECONDS):
+                # days which are over won't change again
+                segment.save_index()
+        if time.time() - self._last_prune > 3600:
+            self._prune()
+
+    def _prune(self) -> None:
+        self._last_prune = time.time()
+        if not self.root.exists():
+            return
+        oldest = int((time.time() - self.retention_days * 86400) // SEGMENT_SECONDS)
+        for guild_folder in self.root.iterdir():
+            for path in guild_folder.glob("*.jsonl"):
+                try:
+                    day = int(path.stem)
+                except ValueError:
+                    continue
+                if day >= oldest:
+                    continue
+                self._segments.pop((int(guild_folder.name), day), None)
+                path.unlink()
+                path.with_suffix(".idx").unlink(missing_ok=True)
+
+    async def search(
+        self,
+        guild_id: int,
+        ids: Iterable[int] = (),
+        *,
+        events: Optional[Set[str]] = None,
+        since: Optional[float] = None,
+        limit: int = MAX_SEARCH_RESULTS,
+    ) -> List[JournalRecord]:
+        """The newest records in a guild mentioning all of `ids`"""
+        await self.flush()
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, self._search, guild_id, list(ids), events, since, limit
+            )
+
+    def _search(
+        self,
+        guild_id: int,
+        ids: List[int],
+        events: Optional[Set[str]],
+        since: Optional[float],
+        limit: int,
+    ) -> List[JournalRecord]:
+        folder = self.root / str(guild_id)
+        if not folder.exists():
+            return []
+        first_day = int(since // SEGMENT_SECONDS) if since is not None else None
+        days = []
+        for path in folder.glob("*.jsonl"):
+            try:
+                days.append(int(path.stem))
+            except ValueError:
+                continue
+        results: List[JournalRecord] = []
+        for day in sorted(days, reverse=True):
+            if first_day is not None and day < first_day:
+                break
+            segment = self._segment(guild_id, day)
+            for record in segment.read(segment.find(ids)):
+                if since is not None and record.timestamp < since:
+                    continue
+                if events and record.event not in events:
+                    continue
+                results.append(record)
+                if len(results) >= limit:
+                    return results
+        return results
+
+    async def forget_user(self, user_id: int) -> None:
+        """Rewrite every segment mentioning the user without their records"""
+        await self.flush()
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._forget_user, user_id)
+
+    def _forget_user(self, user_id: int) -> None:
+        if not self.root.exists():
+            return
+        for path in self.root.glob("*/*.jsonl"):
+            try:
+                key = (int(path.parent.name), int(path.stem))
+            except ValueError:
+                continue
+            segment = self._segments.pop(key, None) or Segment(path)
+            if user_id not in segment.index:
+                segment.save_index()
+                continue
+            records = [r for r in segment.read(segment.offsets) if user_id not in r.ids]
+            path.unlink()
+            segment.index_path.unlink(missing_ok=True)
+            if records:
+                Segment(path).append(records)
+
+    def stats(self) -> Tuple[int, int]:
+        """The number of segment files and their total size in bytes"""
+        if not self.root.exists():
+            return 0, 0
+        files = list(self.root.glob("*/*.jsonl"))
+        return len(files), sum(f.stat().st_size for f in files)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        await self.flush()
+        async with self._lock:
+            for segment in self._segments.values():
+                segment.save_index()
+            self._segments.clear()
@@ -0,0 +1,201 @@
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Dict, NamedTuple, Optional, Tuple
+
+import discord
+from red_commons.logging import getLogger
+
+logger = getLogger("red.trusty-cogs.ExtendedModLog")
+
+DEFAULT_MEMORY_MB = 16
+DEFAULT_TTL_HOURS = 24
+# the on-disk ring buffer holds this many times the memory budget
+DISK_MULTIPLIER = 4
+# rough cost of a record in memory on top of its content
+RECORD_OVERHEAD = 200
+
+
+class StoredMessage(NamedTuple):
+    id: int
+    channel_id: int
+    author_id: int
+    author: str
+    bot: bool
+    created_at: float
+    content: str
+    attachments: Tuple[str, ...]
+
+    @classmethod
+    def from_message(cls, message: discord.Message) -> "StoredMessage":
+        return cls(
+            id=message.id,
+            channel_id=message.channel.id,
+            author_id=message.author.id,
+            author=str(message.author),
+            bot=message.author.bot,
+            created_at=message.created_at.timestamp(),
+            content=message.content,
+            attachments=tuple(a.filename for a in message.attachments),
+        )
+
+    @property
+    def size(self) -> int:
+        return (
+            RECORD_OVERHEAD
+            + len(self.content.encode("utf-8"))
+            + sum(len(a) for a in self.attachments)
+        )
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(self, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "StoredMessage":
+        *fields, attachments = json.loads(data)
+        return cls(*fields, tuple(attachments))
+
+
+class RingFile:
+    """
+    A fixed size file records are written into back to back, wrapping to the
+    start when full and overwriting the oldest records.
+
+    The index only lives in memory so the file's contents are discarded on reload.
+    """
+
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        self.size = size
+        self.position = 0
+        # message id -> (offset, length, author id) in the order they were written
+        self.index: "OrderedDict[int, Tuple[int, int, int]]" = OrderedDict()
+        self.file: BinaryIO = open(path, "w+b")
+        self.file.truncate(size)
+
+    def write(self, record: StoredMessage) -> None:
+        data = record.to_bytes()
+        if len(data) > self.size:
+            return
+        if self.position + len(data) > self.size:
+            # everything past the write position is older than what's at the start
+            while self.index and self._oldest()[0] >= self.position:
+                self.index.popitem(last=False)
+            self.position = 0
+        end = self.position + len(data)
+        while self.index:
+            offset, length, _author = self._oldest()
+            if offset >= end or offset + length <= self.position:
+                break
+            self.index.popitem(last=False)
+        self.file.seek(self.position)
+        self.file.write(data)
+        self.index.pop(record.id, None)
+        self.index[record.id] = (self.position, len(data), record.author_id)
+        self.position = end
+
+    def _oldest(self) -> Tuple[int, int, int]:
+        return next(iter(self.index.values()))
+
+    def pop(self, message_id: int) -> Optional[StoredMessage]:
+        location = self.index.pop(message_id, None)
+        if location is None:
+            return None
+        offset, length, _author = location
+        self.file.seek(offset)
+        try:
+            return StoredMessage.from_bytes(self.file.read(length))
+        except (ValueError, TypeError):
+            logger.error("Could not read stored message %s", message_id)
+            return None
+
+    def forget_user(self, user_id: int) -> None:
+        for message_id, (_offset, _length, author_id) in list(self.index.items()):
+            if author_id == user_id:
+                del self.index[message_id]
+
+    def close(self) -> None:
+        self.index.clear()
+        self.file.close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+class MessageStore:
+    """
+    Recent message content for servers that opt in so deletes and edits of
+    messages which have fallen out of the bot's message cache can still be logged.
+
+    Records are kept in memory up to `max_bytes` and dropped after `ttl` seconds.
+    If a `RingFile` is given records pushed out of memory are kept there instead.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, spill: Optional[RingFile] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill = spill
+        self.bytes = 0
+        self._messages: "OrderedDict[int, StoredMessage]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._messages) + (len(self.spill.index) if self.spill else 0)
+
+    def _expired(self, record: StoredMessage) -> bool:
+        return record.created_at < time.time() - self.ttl
+
+    def add(self, record: StoredMessage) -> None:
+        self._remove(record.id)
+        self._messages[record.id] = record
+        self.bytes += record.size
+        while self._messages:
+            oldest = next(iter(self._messages.values()))
+            expired = self._expired(oldest)
+            if self.bytes <= self.max_bytes and not expired:
+                break
+            self._remove(oldest.id)
+            if self.spill is not None and not expired:
+                self.spill.write(oldest)
+
+    def _remove(self, message_id: int) -> Optional[StoredMessage]:
+        record = self._messages.pop(message_id, None)
+        if record is not None:
+            self.bytes -= record.size
+        return record
+
+    def pop(self, message_id: int) -> Optional[StoredMessage]:
+        record = self._remove(message_id)
+        if record is None and self.spill is not None:
+            record = self.spill.pop(message_id)
+        if record is None or self._expired(record):
+            return None
+        return record
+
+    def edit(self, message_id: int, content: str) -> Optional[StoredMessage]:
+        """Update a stored message's content returning the record from before the edit"""
+        record = self.pop(message_id)
+        if record is not None:
+            self.add(record._replace(content=content))
+        return record
+
+    def forget_user(self, user_id: int) -> None:
+        for message_id, record in list(self._messages.items()):
+            if record.author_id == user_id:
+                self._remove(message_id)
+        if self.spill is not None:
+            self.spill.forget_user(user_id)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "messages": len(self._messages),
+            "bytes": self.bytes,
+            "on_disk": len(self.spill.index) if self.spill else 0,
+        }
+
+    def close(self) -> None:
+        self._messages.clear()
+        self.bytes = 0
+        if self.spill is not None:
+            self.spill.close()
@@ -0,0 +1,97 @@
+from functools import lru_cache
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import discord
+
+# target id -> (allow, deny)
+OverwriteValues = Dict[int, Tuple[int, int]]
+
+
+@lru_cache(maxsize=None)
+def flag_names() -> Dict[int, str]:
+    """Permission bit -> flag name, skipping aliases like `manage_permissions`"""
+    names = {}
+    for name, value in discord.Permissions.VALID_FLAGS.items():
+        if isinstance(getattr(discord.Permissions, name), discord.flags.alias_flag_value):
+            continue
+        names[value] = name
+    return names
+
+
+@lru_cache(maxsize=None)
+def display_name(flag: str) -> str:
+    return flag.replace("_", " ").title()
+
+
+def changed_bits(before: int, after: int) -> Iterator[int]:
+    """Each single bit which differs between two bitfields, lowest first"""
+    changed = before ^ after
+    while changed:
+        bit = changed & -changed
+        yield bit
+        changed ^= bit
+
+
+def overwrite_values(channel: Union[discord.abc.GuildChannel, discord.Thread]) -> OverwriteValues:
+    """The raw allow and deny bitfields of a channel's overwrites"""
+    raw = getattr(channel, "_overwrites", None)
+    if raw is not None:
+        return {o.id: (o.allow, o.deny) for o in raw}
+    values = {}
+    for target, overwrite in getattr(channel, "overwrites", {}).items():
+        allow, deny = overwrite.pair()
+        values[target.id] = (allow.value, deny.value)
+    return values
+
+
+class OverwriteChange(NamedTuple):
+    target_id: int
+    # "added", "removed", or "updated"
+    kind: str
+    # (flag, new value) where the value is True for allow, False for deny, None for unset
+    changes: List[Tuple[str, Optional[bool]]]
+
+
+def diff_overwrites(before: OverwriteValues, after: OverwriteValues) -> List[OverwriteChange]:
+    """
+    Compare two channels' overwrites by XORing each target's allow and deny
+    bitfields so only the permissions which changed are decoded.
+    """
+    if before == after:
+        return []
+    names = flag_names()
+    results = []
+    for target_id in before.keys() | after.keys():
+        old = before.get(target_id)
+        new = after.get(target_id)
+        if old == new:
+            continue
+        old_allow, old_deny = old or (0, 0)
+        new_allow, new_deny = new or (0, 0)
+        changed = (old_allow ^ new_allow) | (old_deny ^ new_deny)
+        changes: List[Tuple[str, Optional[bool]]] = []
+        for bit in changed_bits(0, changed):
+            if bit not in names:
+                continue
+            value = True if new_allow & bit else False if new_deny & bit else None
+            changes.append((names[bit], value))
+        if old is None:
+            kind = "added"
+        elif new is None:
+            kind = "removed"
+        else:
+            kind = "updated"
+        results.append(OverwriteChange(target_id, kind, changes))
+    return results
+
+
+def diff_permissions(
+    before: discord.Permissions, after: discord.Permissions
+) -> List[Tuple[str, bool]]:
+    """The flags which changed between two permission sets and their new values"""
+    names = flag_names()
+    return [
+        (names[bit], bool(after.value & bit))
+        for bit in changed_bits(before.value, after.value)
+        if bit in names
+    ]
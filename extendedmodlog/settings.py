@@ -15,6 +15,7 @@ inv_settings = {
         "bulk_enabled": False,
         "bulk_individual": False,
         "cached_only": True,
+        "store_content": False,
         "colour": None,
         "emoji": "\N{WASTEBASKET}\N{VARIATION SELECTOR-16}",
         "embed": True,
@@ -32,6 +33,7 @@ inv_settings = {
         "flags": True,
         "emoji": "\N{MAN}\N{ZERO WIDTH JOINER}\N{WRENCH}",
         "embed": True,
+        "debounce": 2.0,
     },
     "role_change": {
         "enabled": False,
@@ -61,6 +63,7 @@ inv_settings = {
         "emoji": "\N{MICROPHONE}",
         "embed": True,
         "bots": False,
+        "debounce": 1.0,
     },
     "user_join": {
         "enabled": False,
@@ -161,6 +164,6 @@ inv_settings = {
         "emoji": "",
         "embed": True,
     },
+    "journal": False,
     "ignored_channels": [],
-    "invite_links": {},
 }
@@ -0,0 +1,100 @@
+from enum import IntFlag
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, NamedTuple, Optional
+
+import discord
+
+from .debounce import DEFAULT_WINDOWS
+from .settings import inv_settings
+
+LOG_EVENTS = tuple(
+    event
+    for event, default in inv_settings.items()
+    if isinstance(default, dict) and "enabled" in default
+)
+LogEvent = IntFlag("LogEvent", LOG_EVENTS)
+
+DEFAULT_COLOURS: Mapping[str, discord.Colour] = MappingProxyType(
+    {
+        "message_edit": discord.Colour.orange(),
+        "message_delete": discord.Colour.dark_red(),
+        "user_change": discord.Colour.greyple(),
+        "role_change": discord.Colour.blue(),
+        "role_create": discord.Colour.blue(),
+        "role_delete": discord.Colour.dark_blue(),
+        "voice_change": discord.Colour.magenta(),
+        "user_join": discord.Colour.green(),
+        "user_left": discord.Colour.dark_green(),
+        "channel_change": discord.Colour.teal(),
+        "channel_create": discord.Colour.teal(),
+        "channel_delete": discord.Colour.dark_teal(),
+        "guild_change": discord.Colour.blurple(),
+        "emoji_change": discord.Colour.gold(),
+        "stickers_change": discord.Colour.gold(),
+        "commands_used": discord.Colour.red(),
+        "invite_created": discord.Colour.blurple(),
+        "invite_deleted": discord.Colour.blurple(),
+        "thread_change": discord.Colour.teal(),
+        "thread_create": discord.Colour.teal(),
+        "thread_delete": discord.Colour.dark_teal(),
+    }
+)
+
+
+class GuildSnapshot(NamedTuple):
+    """
+    A read only copy of a guild's settings compiled for the event listeners.
+
+    Rebuilt whenever the guild's settings are saved so listeners can reject
+    disabled events and ignored channels without awaiting anything.
+    """
+
+    enabled: LogEvent
+    ignored_channels: FrozenSet[int]
+    channels: Mapping[str, int]
+    colours: Mapping[str, discord.Colour]
+    store_messages: bool
+    store_bots: bool
+    journal: bool
+    debounce: Mapping[str, float]
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "GuildSnapshot":
+        enabled = LogEvent(0)
+        channels = {}
+        colours = {}
+        for event in LOG_EVENTS:
+            data = settings.get(event) or {}
+            if data.get("enabled"):
+                enabled |= LogEvent[event]
+            if data.get("channel"):
+                channels[event] = data["channel"]
+            if data.get("colour") is not None:
+                colours[event] = discord.Colour(data["colour"])
+        delete = settings.get("message_delete") or {}
+        edit = settings.get("message_edit") or {}
+        logs_messages = bool(enabled & (LogEvent.message_delete | LogEvent.message_edit))
+        return cls(
+            enabled=enabled,
+            ignored_channels=frozenset(settings.get("ignored_channels", [])),
+            channels=MappingProxyType(channels),
+            colours=MappingProxyType(colours),
+            store_messages=logs_messages and bool(delete.get("store_content")),
+            store_bots=bool(delete.get("bots") or edit.get("bots")),
+            journal=bool(settings.get("journal")),
+            debounce=MappingProxyType(
+                {
+                    event: (settings.get(event) or {}).get("debounce", default)
+                    for event, default in DEFAULT_WINDOWS.items()
+                }
+            ),
+        )
+
+    def is_enabled(self, event: str) -> bool:
+        return bool(self.enabled & LogEvent[event])
+
+    def custom_colour(self, event: str) -> Optional[discord.Colour]:
+        return self.colours.get(event)
+
+    def debounce_window(self, event: str) -> float:
+        return self.debounce.get(event, 0.0)
@@ -1,15 +1,21 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Tuple, Union
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Set, Tuple, Union
 
 import discord
 
 if TYPE_CHECKING:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    import aiohttp
     from redbot.core import Config, commands
     from redbot.core.bot import Red
     from redbot.core.commands import TimedeltaConverter
 
+    from .bwlist import BWListIndex
+    from .complexity import RegexAnalysis
     from .converters import (
         ChannelUserRole,
         MentionStyle,
@@ -19,6 +25,13 @@ if TYPE_CHECKING:
         ValidEmoji,
         ValidRegex,
     )
+    from .edits import EditCache
+    from .ocr import OCRCache
+    from .pool import RegexPool
+    from .prefilter import TriggerPrefilter
+    from .prefixes import PrefixMatcher
+    from .resize import ResizeCache
+    from .stats import ReTriggerStats
 
 
 class ReTriggerMixin(ABC):
@@ -27,6 +40,17 @@ class ReTriggerMixin(ABC):
         self.config: Config
         self.bot: Red
         self.triggers: Dict[int, Dict[str, Trigger]]
+        self.prefilters: Dict[int, TriggerPrefilter]
+        self.bw_indexes: Dict[int, BWListIndex]
+        self.prefix_matchers: Dict[int, PrefixMatcher]
+        self.edit_cache: EditCache
+        self.session: aiohttp.ClientSession
+        self.ocr_cache: OCRCache
+        self.ocr_executor: ThreadPoolExecutor
+        self.resize_cache: ResizeCache
+        self.prewarm_tasks: Set[asyncio.Task]
+        self.stats: ReTriggerStats
+        self.re_pool: RegexPool
 
     #############################################################################
     # triggerhandler.py                                                         #
@@ -36,6 +60,14 @@ class ReTriggerMixin(ABC):
     async def remove_trigger_from_cache(self, guild_id: int, trigger: Trigger) -> None:
         raise NotImplementedError()
 
+    @abstractmethod
+    def get_prefilter(self, guild_id: int) -> TriggerPrefilter:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_bw_index(self, guild_id: int) -> BWListIndex:
+        raise NotImplementedError()
+
     @abstractmethod
     async def can_edit(self, author: discord.Member, trigger: Trigger) -> bool:
         raise NotImplementedError()
@@ -82,10 +114,22 @@ class ReTriggerMixin(ABC):
     def resize_gif(self, size: int, image: str) -> discord.File:
         raise NotImplementedError()
 
+    @abstractmethod
+    async def prewarm_resize(self, guild_id: int, image: str) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_prefix_matcher(self, guild: discord.Guild) -> PrefixMatcher:
+        raise NotImplementedError()
+
     @abstractmethod
     async def check_is_command(self, message: discord.Message) -> bool:
         raise NotImplementedError()
 
+    @abstractmethod
+    async def on_command_completion(self, ctx: commands.Context) -> None:
+        raise NotImplementedError()
+
     @abstractmethod
     async def on_message(self, message: discord.Message) -> None:
         raise NotImplementedError()
@@ -102,6 +146,10 @@ class ReTriggerMixin(ABC):
     async def get_image_text(self, message: discord.Message) -> str:
         raise NotImplementedError()
 
+    @abstractmethod
+    async def get_cached_image_text(self, data: bytes) -> str:
+        raise NotImplementedError()
+
     @staticmethod
     @abstractmethod
     def convert_embed_to_string(embed: discord.Embed, embed_index: int = 0) -> str:
@@ -113,6 +161,16 @@ class ReTriggerMixin(ABC):
     ) -> Tuple[bool, list]:
         raise NotImplementedError()
 
+    @abstractmethod
+    async def safe_regex_search_batch(
+        self, guild: discord.Guild, searches: List[Tuple[Trigger, str]]
+    ) -> List[Optional[Tuple[bool, list]]]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def measure_patterns(self, patterns: List[str]) -> List[RegexAnalysis]:
+        raise NotImplementedError()
+
     @abstractmethod
     async def perform_trigger(
         self, message: discord.Message, trigger: Trigger, find: List[str]
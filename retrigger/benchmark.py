@@ -0,0 +1,489 @@
+"""
+Offline benchmark for ReTrigger.
+
+Replays a corpus of messages through `TriggerHandler.check_triggers` with
+stubbed discord objects so trigger setups, regex engines, pool sizes and the
+prefilter can be compared before rolling changes out. This needs discord.py
+and Red installed but never connects to Discord. Engine switching relies on
+the process pool forking so this is intended to be run on Linux.
+
+Examples:
+    python -m retrigger.benchmark --triggers settings.json --guild 1234 --corpus messages.jsonl
+    python -m retrigger.benchmark --synthetic-triggers 300 --synthetic-messages 5000 \
+        --modes bypass,pool --pool-sizes 1,4 --engines re,regex --compare-prefilter
+
+`--triggers` accepts either a guild's `trigger_list` mapping, a dict containing
+a `trigger_list` key, a full Red config `settings.json` for the cog, or a JSONL
+file with one trigger per line such as `[p]retrigger export` creates. `--corpus`
+is JSONL where each line is either a string of message content or an object with
+`content` and optionally `attachments` (a list of filenames) and `embeds` (a list
+of embed dicts).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import string
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import discord
+
+from . import converters, prefilter, worker
+from .converters import Trigger, TriggerResponse
+from .edits import EditCache
+from .pool import RegexPool
+from .stats import ReTriggerStats
+from .transfer import read_export
+from .triggerhandler import TriggerHandler
+
+GUILD_ID = 1
+CHANNEL_ID = 2
+AUTHOR_ID = 3
+PREFIXES = ["[p]"]
+
+
+class _Value:
+    def __init__(self, value: Any):
+        self.value = value
+
+    async def __call__(self) -> Any:
+        return self.value
+
+
+class _GuildConfig:
+    def __init__(self, **settings: Any):
+        for key, value in settings.items():
+            setattr(self, key, _Value(value))
+
+
+class BenchConfig:
+    """Just enough of `Config` for the guild settings read while checking triggers"""
+
+    def __init__(self, bypass: bool):
+        self._guild = _GuildConfig(
+            bypass=bypass,
+            filter_logs=False,
+            ban_logs=False,
+            kick_logs=False,
+            add_role_logs=False,
+            remove_role_logs=False,
+            modlog="default",
+        )
+
+    def guild(self, guild: Any) -> _GuildConfig:
+        return self._guild
+
+    def guild_from_id(self, guild_id: int) -> _GuildConfig:
+        return self._guild
+
+
+class BenchBot:
+    """Bot stub where nobody is privileged and nothing is a command"""
+
+    async def allowed_by_whitelist_blacklist(self, *args: Any, **kwargs: Any) -> bool:
+        return True
+
+    async def get_valid_prefixes(self, guild: Any = None) -> List[str]:
+        return list(PREFIXES)
+
+    async def get_prefix(self, channel: Any) -> List[str]:
+        return list(PREFIXES)
+
+    def get_command(self, name: str) -> None:
+        return None
+
+    async def is_owner(self, user: Any) -> bool:
+        return False
+
+    async def is_admin(self, member: Any) -> bool:
+        return False
+
+    async def is_mod(self, member: Any) -> bool:
+        return False
+
+    async def is_automod_immune(self, to_check: Any) -> bool:
+        return False
+
+    async def cog_disabled_in_guild(self, cog: Any, guild: Any) -> bool:
+        return False
+
+
+class StubMember:
+    def __init__(self, guild: StubGuild):
+        self.id = AUTHOR_ID
+        self.bot = False
+        self.roles: List[Any] = []
+        self.guild = guild
+
+    def __repr__(self) -> str:
+        return f"<StubMember id={self.id}>"
+
+
+class StubChannel:
+    def __init__(self, guild: StubGuild):
+        self.id = CHANNEL_ID
+        self.category_id = None
+        self.guild = guild
+
+    def permissions_for(self, member: Any) -> discord.Permissions:
+        return discord.Permissions.none()
+
+    def is_nsfw(self) -> bool:
+        return False
+
+
+class StubGuild:
+    def __init__(self):
+        self.id = GUILD_ID
+        self.name = "ReTrigger Benchmark"
+        self.owner = None
+        self.author = StubMember(self)
+        self.channel = StubChannel(self)
+
+    def get_member(self, member_id: int) -> Optional[StubMember]:
+        return self.author if member_id == self.author.id else None
+
+    def __repr__(self) -> str:
+        return f"<StubGuild id={self.id}>"
+
+
+@dataclass
+class StubAttachment:
+    filename: str
+    content_type: Optional[str] = None
+    size: int = 0
+
+
+@dataclass
+class StubMessage:
+    id: int
+    guild: StubGuild
+    content: str
+    created_at: datetime
+    attachments: List[StubAttachment] = field(default_factory=list)
+    embeds: List[discord.Embed] = field(default_factory=list)
+
+    @property
+    def channel(self) -> StubChannel:
+        return self.guild.channel
+
+    @property
+    def author(self) -> StubMember:
+        return self.guild.author
+
+
+class _NoPrefilter:
+    def might_match(self, *args: Any) -> bool:
+        return True
+
+
+class BenchmarkHandler(TriggerHandler):
+    """
+    `TriggerHandler` with the bot, config and responses stubbed out.
+
+    Responses are counted instead of performed so only the cost of
+    deciding which trigger fires is measured.
+    """
+
+    def __init__(
+        self,
+        triggers: Dict[str, Trigger],
+        *,
+        bypass: bool,
+        pool_size: int,
+        use_prefilter: bool,
+        timeout: int,
+    ):
+        self.bot = BenchBot()
+        self.config = BenchConfig(bypass)
+        self.triggers = {GUILD_ID: triggers}
+        self.prefilters = {}
+        self.bw_indexes = {}
+        self.prefix_matchers = {}
+        self.edit_cache = EditCache()
+        self.stats = ReTriggerStats()
+        self.trigger_timeout = timeout
+        self.re_pool = None if bypass else RegexPool(pool_size, guild_limit=pool_size)
+        self.use_prefilter = use_prefilter
+        self.performed = 0
+
+    def get_prefilter(self, guild_id: int):
+        if not self.use_prefilter:
+            return _NoPrefilter()
+        return super().get_prefilter(guild_id)
+
+    async def perform_trigger(self, message: Any, trigger: Trigger, find: List[str]) -> None:
+        self.performed += 1
+
+    async def get_image_text(self, message: Any) -> str:
+        # stub attachments have no image data to read
+        return ""
+
+    def close(self) -> None:
+        if self.re_pool is not None:
+            self.re_pool.close()
+
+
+# The command methods declared on the mixin aren't needed to check triggers
+BenchmarkHandler.__abstractmethods__ = frozenset()
+
+
+def use_engine(name: str) -> None:
+    """Swap the regex module used to compile and search triggers"""
+    if name == "regex":
+        import regex as engine
+
+        worker.HAS_TIMEOUT = True
+    elif name == "re":
+        import re as engine
+
+        worker.HAS_TIMEOUT = False
+    else:
+        raise ValueError(f"Unknown regex engine {name}")
+    converters.re = engine
+    prefilter.re = engine
+    worker.re = engine
+    worker._pattern_cache.clear()
+
+
+def load_trigger_data(path: Path, guild_id: Optional[int] = None) -> List[dict]:
+    if path.name.endswith((".jsonl", ".jsonl.gz")):
+        # `[p]retrigger export` output
+        data = path.read_bytes()
+        return [
+            t for _line, t in read_export(data, path.name, max_bytes=None) if isinstance(t, dict)
+        ]
+    with path.open(encoding="utf8") as infile:
+        data = json.load(infile)
+    if "trigger_list" in data:
+        return list(data["trigger_list"].values())
+    for value in data.values():
+        # full Red config export, {identifier: {"GUILD": {guild_id: {...}}}}
+        if isinstance(value, dict) and "GUILD" in value:
+            guilds = value["GUILD"]
+            key = str(guild_id) if guild_id is not None else next(iter(guilds))
+            return list(guilds[key].get("trigger_list", {}).values())
+    return list(data.values())
+
+
+def synthetic_words(count: int, rng: random.Random) -> List[str]:
+    return [
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+        for _ in range(count)
+    ]
+
+
+def synthetic_trigger_data(count: int, words: List[str], rng: random.Random) -> List[dict]:
+    templates = [
+        r"\b{0}\b",
+        r"(?i){0}",
+        r"{0}|{1}",
+        r"^{0} .+",
+        r"(?i)\b({0}|{1}) {2}\b",
+        r"(?:https?://)?\S+\.{0}",
+        r"{0}\s*{1}",
+        r"\d{{4,}}-{0}",
+        r"([a-z]+) {0}",
+    ]
+    ret = []
+    for i in range(count):
+        pattern = rng.choice(templates).format(*rng.sample(words, 3))
+        ret.append(
+            {
+                "name": f"synthetic-{i}",
+                "regex": pattern,
+                "response_type": [TriggerResponse.text.value],
+                "author": AUTHOR_ID,
+                "text": "benchmark",
+            }
+        )
+    return ret
+
+
+def synthetic_corpus(
+    count: int, words: List[str], rng: random.Random, hit_rate: float = 0.05
+) -> List[dict]:
+    filler = synthetic_words(500, rng)
+    ret = []
+    for _ in range(count):
+        sentence = rng.choices(filler, k=rng.randint(3, 40))
+        if rng.random() < hit_rate:
+            sentence.insert(rng.randint(0, len(sentence)), rng.choice(words))
+        ret.append({"content": " ".join(sentence)})
+    return ret
+
+
+def load_corpus(path: Path) -> List[dict]:
+    ret = []
+    with path.open(encoding="utf8") as infile:
+        for line in infile:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            ret.append({"content": data} if isinstance(data, str) else data)
+    return ret
+
+
+def build_messages(guild: StubGuild, corpus: Iterable[dict]) -> List[StubMessage]:
+    start = datetime.now(tz=timezone.utc)
+    messages = []
+    for index, data in enumerate(corpus):
+        messages.append(
+            StubMessage(
+                id=index,
+                guild=guild,
+                content=data.get("content", ""),
+                created_at=start + timedelta(seconds=index),
+                attachments=[StubAttachment(f) for f in data.get("attachments", [])],
+                embeds=[discord.Embed.from_dict(e) for e in data.get("embeds", [])],
+            )
+        )
+    return messages
+
+
+async def build_triggers(trigger_data: List[dict]) -> Dict[str, Trigger]:
+    triggers = {}
+    for data in trigger_data:
+        trigger = await Trigger.from_json(dict(data))
+        try:
+            trigger.compile()
+        except Exception:
+            trigger.disable()
+        triggers[trigger.name] = trigger
+    return triggers
+
+
+async def replay(
+    handler: BenchmarkHandler, messages: List[StubMessage], concurrency: int
+) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(message: StubMessage) -> None:
+        async with semaphore:
+            await handler.check_triggers(message, False)
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for message in messages:
+            await handler.check_triggers(message, False)
+    else:
+        await asyncio.gather(*(check(m) for m in messages))
+    return time.perf_counter() - start
+
+
+def print_trigger_costs(handler: BenchmarkHandler, top: int) -> None:
+    costs = sorted(
+        handler.stats.guild_stats(GUILD_ID),
+        key=lambda i: i[1].regex_time.sum,
+        reverse=True,
+    )[:top]
+    if not costs:
+        return
+    print(
+        "  {:<24} {:>8} {:>8} {:>10} {:>9} {:>9} {:>9}".format(
+            "trigger", "evals", "matches", "total ms", "p50 ms", "p95 ms", "skipped"
+        )
+    )
+    for name, stats in costs:
+        p50, p95 = stats.regex_time.percentiles(50, 95)
+        print(
+            "  {:<24} {:>8} {:>8} {:>10.2f} {:>9.4f} {:>9.4f} {:>9}".format(
+                name[:24],
+                stats.evaluations,
+                stats.matches,
+                stats.regex_time.sum * 1000,
+                p50 * 1000,
+                p95 * 1000,
+                stats.prefiltered,
+            )
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    words = synthetic_words(max(args.synthetic_triggers, 50), rng)
+    if args.triggers:
+        trigger_data = load_trigger_data(Path(args.triggers), args.guild)
+    else:
+        trigger_data = synthetic_trigger_data(args.synthetic_triggers, words, rng)
+    if args.corpus:
+        corpus = load_corpus(Path(args.corpus))
+    else:
+        corpus = synthetic_corpus(args.synthetic_messages, words, rng)
+
+    guild = StubGuild()
+    messages = build_messages(guild, corpus)
+    modes = [m.strip() for m in args.modes.split(",")]
+    pool_sizes = [int(i) for i in args.pool_sizes.split(",")]
+    prefilter_options = [True, False] if args.compare_prefilter else [not args.no_prefilter]
+    print(f"{len(trigger_data)} triggers, {len(messages)} messages")
+
+    for engine in args.engines.split(","):
+        use_engine(engine.strip())
+        for mode in modes:
+            sizes = pool_sizes if mode == "pool" else [0]
+            for size in sizes:
+                for use_prefilter in prefilter_options:
+                    triggers = await build_triggers(trigger_data)
+                    handler = BenchmarkHandler(
+                        triggers,
+                        bypass=mode == "bypass",
+                        pool_size=size,
+                        use_prefilter=use_prefilter,
+                        timeout=args.timeout,
+                    )
+                    try:
+                        elapsed = await replay(handler, messages, args.concurrency)
+                    finally:
+                        handler.close()
+                    all_stats = [s for _, s in handler.stats.guild_stats(GUILD_ID)]
+                    label = f"engine={engine} mode={mode}"
+                    if mode == "pool":
+                        label += f" pool={size}"
+                    label += f" prefilter={'on' if use_prefilter else 'off'}"
+                    print(f"\n{label}")
+                    print(
+                        "  {:.1f} messages/sec ({:.3f}s), {} evaluations, {} skipped by "
+                        "prefilter, {} responses, {} timeouts".format(
+                            len(messages) / elapsed if elapsed else 0.0,
+                            elapsed,
+                            sum(s.evaluations for s in all_stats),
+                            sum(s.prefiltered for s in all_stats),
+                            handler.performed,
+                            sum(s.timeouts for s in all_stats),
+                        )
+                    )
+                    print_trigger_costs(handler, args.top)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m retrigger.benchmark",
+        description="Replay messages through ReTrigger without connecting to Discord.",
+    )
+    parser.add_argument("--triggers", help="Path to a trigger export.")
+    parser.add_argument("--guild", type=int, help="Guild ID to use from a full config export.")
+    parser.add_argument("--corpus", help="Path to a JSONL corpus of messages.")
+    parser.add_argument("--synthetic-triggers", type=int, default=300)
+    parser.add_argument("--synthetic-messages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", default="bypass,pool", help="Any of bypass,pool.")
+    parser.add_argument("--pool-sizes", default="4", help="Comma separated pool sizes.")
+    parser.add_argument("--engines", default="re", help="Any of re,regex.")
+    parser.add_argument("--no-prefilter", action="store_true")
+    parser.add_argument("--compare-prefilter", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--timeout", type=int, default=1)
+    parser.add_argument("--top", type=int, default=10, help="Number of triggers to show.")
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
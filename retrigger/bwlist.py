@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import DefaultDict, Dict, FrozenSet, Iterable, Mapping, Optional, Set, Tuple
+
+import discord
+from red_commons.logging import getLogger
+
+from .converters import Trigger
+
+log = getLogger("red.trusty-cogs.ReTrigger")
+
+_EMPTY: FrozenSet[str] = frozenset()
+
+
+class BWListIndex:
+    """
+    Inverted index of the allowlists and blocklists for all of a guilds triggers.
+
+    Maps each channel, category, user, and role ID to the triggers that
+    list it so every trigger a message is excluded from can be found with
+    a few set operations instead of checking each trigger individually.
+    """
+
+    def __init__(self, triggers: Mapping[str, Trigger]):
+        self._lists: Dict[str, Tuple[FrozenSet[int], FrozenSet[int], bool]] = {}
+        self._allowlisted: Set[str] = set()
+        self._allow: DefaultDict[int, Set[str]] = defaultdict(set)
+        self._block: DefaultDict[int, Set[str]] = defaultdict(set)
+        # thread parents only count for triggers including threads unless it's a forum
+        self._allow_threads: DefaultDict[int, Set[str]] = defaultdict(set)
+        self._block_threads: DefaultDict[int, Set[str]] = defaultdict(set)
+        for name, trigger in triggers.items():
+            self._lists[name] = (trigger.whitelist, trigger.blacklist, trigger.include_threads)
+            if trigger.whitelist:
+                # the blocklist is ignored when an allowlist is present
+                self._allowlisted.add(name)
+                index, thread_index = self._allow, self._allow_threads
+                ids = trigger.whitelist
+            else:
+                index, thread_index = self._block, self._block_threads
+                ids = trigger.blacklist
+            for obj_id in ids:
+                index[obj_id].add(name)
+                if trigger.include_threads:
+                    thread_index[obj_id].add(name)
+        self._allow.default_factory = None
+        self._block.default_factory = None
+        self._allow_threads.default_factory = None
+        self._block_threads.default_factory = None
+        log.trace(
+            "Built allowlist/blocklist index for %s triggers, %s IDs",
+            len(self._lists),
+            len(self._allow) + len(self._block),
+        )
+
+    def is_stale(self, triggers: Mapping[str, Trigger]) -> bool:
+        """Check whether any trigger was added, removed, or had its lists changed"""
+        if len(triggers) != len(self._lists):
+            return True
+        for name, trigger in triggers.items():
+            lists = self._lists.get(name)
+            if (
+                lists is None
+                or lists[0] is not trigger.whitelist
+                or lists[1] is not trigger.blacklist
+                or lists[2] != trigger.include_threads
+            ):
+                return True
+        return False
+
+    @staticmethod
+    def _union(index: Mapping[int, Set[str]], ids: Iterable[int]) -> Set[str]:
+        found: Set[str] = set()
+        for obj_id in ids:
+            found |= index.get(obj_id, _EMPTY)
+        return found
+
+    def excluded(
+        self, author: Optional[discord.Member], channel: discord.abc.GuildChannel
+    ) -> Set[str]:
+        """
+        Returns the names of every trigger which `Trigger.check_bw_list`
+        would not allow to run for this author in this channel.
+        """
+        if not self._allowlisted and not self._block:
+            return set()
+        ids = [channel.id]
+        if channel.category_id:
+            ids.append(channel.category_id)
+        if author is not None:
+            ids.append(author.id)
+            ids.extend(role.id for role in author.roles if not role.is_default())
+        allowed = self._union(self._allow, ids)
+        blocked = self._union(self._block, ids)
+        if isinstance(channel, discord.Thread) and channel.parent_id:
+            if isinstance(channel.parent, discord.ForumChannel):
+                allowed |= self._allow.get(channel.parent_id, _EMPTY)
+                blocked |= self._block.get(channel.parent_id, _EMPTY)
+            else:
+                allowed |= self._allow_threads.get(channel.parent_id, _EMPTY)
+                blocked |= self._block_threads.get(channel.parent_id, _EMPTY)
+        return (self._allowlisted - allowed) | blocked
@@ -0,0 +1,332 @@
+"""
+Static and empirical cost analysis for trigger regex patterns.
+
+The static pass looks for the shapes that cause catastrophic backtracking,
+nested quantifiers and ambiguous alternations inside repeats, and the
+empirical pass times the pattern against inputs generated to exploit them
+in a throwaway process which is killed if it runs too long.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import string
+import warnings
+from dataclasses import dataclass, field
+from enum import IntEnum
+from multiprocessing import TimeoutError as PoolTimeoutError
+from multiprocessing.pool import Pool
+from typing import FrozenSet, List, Optional, Set, Tuple
+
+from red_commons.logging import getLogger
+
+from .worker import measure_pattern
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+log = getLogger("red.trusty-cogs.ReTrigger")
+
+_REPEATS = tuple(
+    getattr(sre_constants, op)
+    for op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_constants, op)
+)
+_POSSESSIVE = getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+_MAXREPEAT = sre_constants.MAXREPEAT
+
+# Representative characters used to decide whether two pieces of a pattern overlap
+_ALPHABET = frozenset(string.printable + "é あ")
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: str.isdigit,
+    sre_constants.CATEGORY_NOT_DIGIT: lambda c: not c.isdigit(),
+    sre_constants.CATEGORY_SPACE: str.isspace,
+    sre_constants.CATEGORY_NOT_SPACE: lambda c: not c.isspace(),
+    sre_constants.CATEGORY_WORD: lambda c: c.isalnum() or c == "_",
+    sre_constants.CATEGORY_NOT_WORD: lambda c: not (c.isalnum() or c == "_"),
+}
+
+# Suffixes which stop a near match from matching and force the engine to backtrack
+_SUFFIXES = ("!", "\x00", "\n", " ")
+_PUMP_LENGTHS = (16, 64, 1024)
+_SAMPLE_LIMIT = 24
+
+
+class RegexCost(IntEnum):
+    cheap = 0
+    moderate = 1
+    expensive = 2
+    catastrophic = 3
+
+    def __str__(self) -> str:
+        return self.name
+
+
+@dataclass
+class RegexAnalysis:
+    pattern: str
+    cost: RegexCost
+    warnings: List[str] = field(default_factory=list)
+    worst_time: Optional[float] = None
+    timed_out: bool = False
+
+
+def _chars(op, av) -> FrozenSet[str]:
+    """The characters from `_ALPHABET` a single character item can match"""
+    if op is sre_constants.LITERAL:
+        return frozenset([chr(av)])
+    if op is sre_constants.NOT_LITERAL:
+        return _ALPHABET - {chr(av)}
+    if op is sre_constants.ANY:
+        return _ALPHABET - {"\n"}
+    if op is sre_constants.IN:
+        found: Set[str] = set()
+        negate = False
+        for sub_op, sub_av in av:
+            if sub_op is sre_constants.NEGATE:
+                negate = True
+            elif sub_op is sre_constants.LITERAL:
+                found.add(chr(sub_av))
+            elif sub_op is sre_constants.RANGE:
+                low, high = sub_av
+                found.update(c for c in _ALPHABET if low <= ord(c) <= high)
+                found.update(chr(i) for i in (low, high))
+            elif sub_op is sre_constants.CATEGORY and sub_av in _CATEGORIES:
+                found.update(filter(_CATEGORIES[sub_av], _ALPHABET))
+            else:
+                return _ALPHABET
+        return _ALPHABET - found if negate else frozenset(found)
+    return _ALPHABET
+
+
+def _nullable(item) -> bool:
+    op, av = item
+    if op in _REPEATS:
+        return av[0] == 0 or _seq_nullable(av[2])
+    if op is sre_constants.SUBPATTERN:
+        return _seq_nullable(av[3])
+    if op is sre_constants.BRANCH:
+        return any(_seq_nullable(b) for b in av[1])
+    if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return True
+    return False
+
+
+def _seq_nullable(data) -> bool:
+    return all(_nullable(item) for item in data)
+
+
+def _first(data) -> FrozenSet[str]:
+    """Characters which could start a match of a sequence"""
+    found: Set[str] = set()
+    for item in data:
+        op, av = item
+        if op in _REPEATS:
+            found |= _first(av[2])
+        elif op is sre_constants.SUBPATTERN:
+            found |= _first(av[3])
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            found |= _first(av)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                found |= _first(branch)
+        elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            pass
+        elif op in (sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.ANY):
+            found |= _chars(op, av)
+        elif op is sre_constants.IN:
+            found |= _chars(op, av)
+        else:
+            return _ALPHABET
+        if not _nullable(item):
+            break
+    return frozenset(found)
+
+
+def _is_unbounded(item) -> bool:
+    op, av = item
+    return op in _REPEATS and op is not _POSSESSIVE and av[1] == _MAXREPEAT
+
+
+def _check(data, findings: Set[str], in_repeat: bool = False) -> None:
+    items = list(data)
+    for index, item in enumerate(items):
+        op, av = item
+        if op in _REPEATS:
+            body = av[2]
+            if _is_unbounded(item):
+                _check_nested(body, findings)
+            _check(body, findings, in_repeat or _is_unbounded(item))
+        elif op is sre_constants.SUBPATTERN:
+            _check(av[3], findings, in_repeat)
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            # atomic groups never backtrack into themselves
+            continue
+        elif op is sre_constants.BRANCH:
+            if in_repeat:
+                firsts = [_first(b) for b in av[1]]
+                for i, a in enumerate(firsts):
+                    if any(not a.isdisjoint(b) for b in firsts[i + 1 :]):
+                        findings.add("ambiguous alternation inside a repeat")
+                        break
+            for branch in av[1]:
+                _check(branch, findings, in_repeat)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _check(av[1], findings, in_repeat)
+        if not _is_unbounded(item):
+            continue
+        chars = _first(av[2])
+        for following in items[index + 1 :]:
+            if _is_unbounded(following) and not chars.isdisjoint(_first(following[1][2])):
+                findings.add("overlapping adjacent quantifiers")
+                break
+            if not _nullable(following):
+                break
+
+
+def _check_nested(body, findings: Set[str]) -> None:
+    """An unbounded repeat inside another which can give up characters to what follows"""
+    items = list(body)
+    while len(items) == 1 and items[0][0] is sre_constants.SUBPATTERN:
+        items = list(items[0][1][3])
+    outer_first = _first(items)
+    for index, item in enumerate(items):
+        if not _is_unbounded(item):
+            continue
+        tail = items[index + 1 :]
+        # whatever can come after the inner repeat, including the next outer repetition
+        follow = _first(tail)
+        if _seq_nullable(tail):
+            follow |= outer_first
+        if not _first(item[1][2]).isdisjoint(follow):
+            findings.add("nested quantifiers")
+            return
+
+
+def _parse(pattern: str) -> Optional[sre_parse.SubPattern]:
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return sre_parse.parse(pattern)
+    except Exception:
+        return None
+
+
+def static_analysis(pattern: str) -> Tuple[RegexCost, List[str]]:
+    """Estimate a patterns cost from its structure alone"""
+    parsed = _parse(pattern)
+    if parsed is None:
+        # probably syntax only the regex module understands
+        return RegexCost.moderate, []
+    findings: Set[str] = set()
+    _check(parsed, findings)
+    if "nested quantifiers" in findings or "ambiguous alternation inside a repeat" in findings:
+        return RegexCost.expensive, sorted(findings)
+    if findings:
+        return RegexCost.moderate, sorted(findings)
+    return RegexCost.cheap, []
+
+
+def _sample(chars: FrozenSet[str], exclude: str = "") -> str:
+    for preferred in "a0 _.":
+        if preferred in chars and preferred not in exclude:
+            return preferred
+    for c in sorted(chars):
+        if c not in exclude and c.isprintable():
+            return c
+    return "a"
+
+
+def _generate(data, length: int, variant: int) -> str:
+    """Build a string which walks through the pattern pumping every repeat"""
+    ret = ""
+    for op, av in data:
+        if op is sre_constants.LITERAL:
+            ret += chr(av)
+        elif op in (sre_constants.NOT_LITERAL, sre_constants.ANY, sre_constants.IN):
+            ret += _sample(_chars(op, av))
+        elif op in _REPEATS:
+            low, high, body = av
+            count = length if high == _MAXREPEAT else min(max(low, 1), high, length)
+            ret += _generate(body, length, variant) * max(count, low)
+        elif op is sre_constants.SUBPATTERN:
+            ret += _generate(av[3], length, variant)
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            ret += _generate(av, length, variant)
+        elif op is sre_constants.BRANCH:
+            branches = av[1]
+            ret += _generate(branches[variant % len(branches)], length, variant)
+        if len(ret) > length * 8:
+            break
+    return ret[: length * 8]
+
+
+def adversarial_inputs(pattern: str) -> List[str]:
+    """Inputs which nearly match `pattern` to encourage worst case backtracking"""
+    inputs: Set[str] = set()
+    for c in "a0 _.":
+        inputs.add(c * 4096)
+    parsed = _parse(pattern)
+    if parsed is not None:
+        for length in _PUMP_LENGTHS:
+            for variant in range(3):
+                pumped = _generate(parsed, length, variant)
+                for suffix in _SUFFIXES:
+                    inputs.add(pumped + suffix)
+                    inputs.add(pumped[:-1] + suffix)
+    return sorted(inputs, key=len)[:_SAMPLE_LIMIT]
+
+
+def measure(pattern: str, inputs: List[str], timeout: float) -> Tuple[float, bool]:
+    """
+    Time the worst input in a single use process so a pattern
+    that never finishes can be killed rather than hanging a shared worker.
+    """
+    with Pool(1) as pool:
+        result = pool.apply_async(measure_pattern, (pattern, inputs, timeout))
+        try:
+            return result.get(timeout=timeout + 1)
+        except PoolTimeoutError:
+            return timeout, True
+        # leaving the context manager terminates the worker
+
+
+def _empirical_cost(worst: float, timed_out: bool, timeout: float) -> RegexCost:
+    if timed_out or worst >= timeout / 2:
+        return RegexCost.catastrophic
+    if worst >= 0.05:
+        return RegexCost.expensive
+    if worst >= 0.005:
+        return RegexCost.moderate
+    return RegexCost.cheap
+
+
+def classify(pattern: str, worst: float, timed_out: bool, timeout: float) -> RegexAnalysis:
+    """
+    Combine the static analysis of a pattern with its measured worst case.
+
+    Static findings on a pattern that measures cheap bump it up one
+    cost class since the generated inputs are a best effort.
+    """
+    static_cost, findings = static_analysis(pattern)
+    cost = _empirical_cost(worst, timed_out, timeout)
+    if findings and cost < RegexCost.expensive:
+        cost = max(RegexCost(cost + 1), static_cost)
+    return RegexAnalysis(pattern, cost, findings, worst, timed_out)
+
+
+async def analyse(pattern: str, timeout: float) -> RegexAnalysis:
+    """Measure a pattern in a throwaway process and classify its cost"""
+    inputs = adversarial_inputs(pattern)
+    loop = asyncio.get_running_loop()
+    try:
+        worst, timed_out = await loop.run_in_executor(None, measure, pattern, inputs, timeout)
+    except Exception:
+        log.exception("Error measuring regex pattern %s", pattern)
+        return RegexAnalysis(pattern, *static_analysis(pattern))
+    return classify(pattern, worst, timed_out, timeout)
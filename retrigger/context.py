@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import discord
+from red_commons.logging import getLogger
+
+from .converters import Trigger
+from .edits import CONTENT, EMBEDS, FILENAMES
+
+if TYPE_CHECKING:
+    from .triggerhandler import TriggerHandler
+
+log = getLogger("red.trusty-cogs.ReTrigger")
+
+
+class MessageContext:
+    """
+    Everything about a message that triggers search, built lazily and at most once.
+
+    A single instance is shared by every trigger checked against a message
+    so attachments are only OCR'd once and embeds only flattened once no
+    matter how many triggers want them.
+    """
+
+    def __init__(self, cog: TriggerHandler, message: discord.Message, *, allow_ocr: bool):
+        self.cog = cog
+        self.message = message
+        self.allow_ocr = allow_ocr
+        self._is_command: Optional[bool] = None
+        self._filenames: Optional[str] = None
+        self._embeds: Optional[str] = None
+        self._image_text: Optional[asyncio.Task] = None
+        # (read_filenames, ocr_search, read_embeds) -> content
+        self._contents: Dict[Tuple[bool, bool, bool], str] = {}
+
+    async def is_command(self) -> bool:
+        """Whether the message starts with a prefix followed by a command name"""
+        if self._is_command is None:
+            self._is_command = await self.cog.check_is_command(self.message)
+        return self._is_command
+
+    @property
+    def filenames(self) -> str:
+        if self._filenames is None:
+            self._filenames = " " + " ".join(f.filename for f in self.message.attachments)
+        return self._filenames
+
+    @property
+    def embeds(self) -> str:
+        if self._embeds is None:
+            self._embeds = "\n".join(
+                self.cog.convert_embed_to_string(embed, index)
+                for index, embed in enumerate(self.message.embeds)
+            )
+        return self._embeds
+
+    def input_hashes(self) -> Dict[str, int]:
+        """Hashes of each part of the message a trigger can read for the edit cache"""
+        return {
+            CONTENT: hash(self.message.content),
+            FILENAMES: hash(self.filenames),
+            EMBEDS: hash(self.embeds),
+        }
+
+    async def _get_image_text(self) -> str:
+        try:
+            return await self.cog.get_image_text(self.message)
+        except Exception:
+            log.exception(
+                "Error extracting text from image in channel: %s, message: %s",
+                self.message.channel.id,
+                self.message.id,
+            )
+            return ""
+
+    async def image_text(self) -> str:
+        if self._image_text is None:
+            # a task so concurrent callers wait on the same OCR run
+            self._image_text = asyncio.create_task(self._get_image_text())
+        return await asyncio.shield(self._image_text)
+
+    async def content_for(self, trigger: Trigger) -> str:
+        """The content a trigger should search based on its settings"""
+        key = (
+            trigger.read_filenames and bool(self.message.attachments),
+            trigger.ocr_search and self.allow_ocr,
+            trigger.read_embeds and bool(self.message.embeds),
+        )
+        if key in self._contents:
+            return self._contents[key]
+        read_filenames, ocr_search, read_embeds = key
+        content = self.message.content
+        if read_filenames:
+            content += self.filenames
+        if ocr_search:
+            content += await self.image_text()
+        if read_embeds:
+            content += self.embeds
+        self._contents[key] = content
+        return content
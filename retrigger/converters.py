@@ -1,15 +1,20 @@
 from __future__ import annotations
 
+import heapq
+import time
 from dataclasses import dataclass
 from enum import Enum
 from typing import (
     TYPE_CHECKING,
     Any,
     Dict,
+    FrozenSet,
+    Iterable,
     List,
     NamedTuple,
     Optional,
     Pattern,
+    Set,
     Tuple,
     Union,
 )
@@ -22,6 +27,8 @@ from redbot.core import commands
 from redbot.core.i18n import Translator
 from redbot.core.utils.chat_formatting import humanize_list
 
+from .complexity import RegexCost, analyse, static_analysis
+
 log = getLogger("red.trusty-cogs.ReTrigger")
 _ = Translator("ReTrigger", __file__)
 
@@ -42,6 +49,9 @@ CHANNEL_RE = re.compile(
 # General purpose regex for parsing mentions and links of channels from an argument
 # Includes support for pulling message ID from a message link
 
+# Fields which change on nearly every match and are saved in their own compact store
+HOT_FIELDS = frozenset({"count", "cooldown"})
+
 
 class MentionStyle(Enum):
     everyone = 0
@@ -264,6 +274,58 @@ class TriggerThread:
         }
 
 
+class CooldownMap:
+    """
+    The last time each entity triggered, forgetting entries once their cooldown has passed.
+
+    Entries are kept in a dict for lookups and a heap ordered by time so
+    expired entries can be dropped without scanning everything.
+    """
+
+    __slots__ = ("_last", "_heap")
+
+    def __init__(self):
+        self._last: Dict[int, float] = {}
+        self._heap: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+    def expire(self, now: float, period: float):
+        heap = self._heap
+        while heap and now - heap[0][0] > period:
+            last, entity_id = heapq.heappop(heap)
+            if self._last.get(entity_id) == last:
+                del self._last[entity_id]
+
+    def check(self, entity_id: int, now: float, period: float) -> bool:
+        """Returns True if `entity_id` is still on cooldown otherwise records `now`"""
+        self.expire(now, period)
+        last = self._last.get(entity_id)
+        if last is not None and (now - last) <= period:
+            return True
+        self._last[entity_id] = now
+        heapq.heappush(self._heap, (now, entity_id))
+        return False
+
+    def load(self, entries: List[Dict[str, Any]]):
+        """Load the stored `[{"id": int, "last": float}]` format"""
+        for entry in entries:
+            entity_id, last = entry["id"], entry["last"]
+            if last > self._last.get(entity_id, float("-inf")):
+                self._last[entity_id] = last
+        self._heap = [(last, entity_id) for entity_id, last in self._last.items()]
+        heapq.heapify(self._heap)
+
+    def to_json(self, now: float, period: float) -> List[Dict[str, Any]]:
+        """Only entries still on cooldown are worth saving"""
+        return [
+            {"id": entity_id, "last": last}
+            for entity_id, last in self._last.items()
+            if (now - last) <= period
+        ]
+
+
 class Trigger:
     """
     Trigger class to handle trigger objects
@@ -279,9 +341,10 @@ class Trigger:
         "text",
         "count",
         "image",
-        "whitelist",
-        "blacklist",
-        "cooldown",
+        "_whitelist",
+        "_blacklist",
+        "_cooldown",
+        "_cooldown_map",
         "multi_payload",
         "ignore_commands",
         "check_edits",
@@ -307,6 +370,8 @@ class Trigger:
         "_last_modified_at",
         "_last_modified",
         "suppress",
+        "_dirty",
+        "cost",
     )
 
     def __init__(
@@ -324,15 +389,18 @@ class Trigger:
         except Exception:
             self.regex: Optional[Pattern] = None
             pass
+        # the cost class from `complexity.analyse` used to order searches cheapest first
+        cost = kwargs.get("cost", getattr(regex, "cost", None))
+        self.cost: RegexCost = RegexCost(cost) if cost is not None else static_analysis(regex)[0]
         self.response_type: List[TriggerResponse] = response_type
         self.author: int = author
         self.enabled: bool = kwargs.get("enabled", True)
         self.count: int = kwargs.get("count", 0)
         self.image: Union[List[Union[int, str]], str, None] = kwargs.get("image", None)
         self.text: Optional[str] = kwargs.get("text", None)
-        self.whitelist: List[int] = kwargs.get("whitelist", [])
-        self.blacklist: List[int] = kwargs.get("blacklist", [])
-        self.cooldown: Dict[str, int] = kwargs.get("cooldown", {})
+        self.whitelist = kwargs.get("whitelist", [])
+        self.blacklist = kwargs.get("blacklist", [])
+        self.cooldown = kwargs.get("cooldown", {})
         self.multi_payload: List[MultiResponse] = kwargs.get("multi_payload", [])
         self._created_at: int = kwargs.get("created_at", 0)
         self.ignore_commands: bool = kwargs.get("ignore_commands", False)
@@ -358,20 +426,78 @@ class Trigger:
         self._last_modified_at: Optional[int] = kwargs.get("_last_modified_at", None)
         self._last_modified: Optional[str] = kwargs.get("_last_modified", None)
         self.suppress: bool = kwargs.get("suppress", False)
+        self._dirty: Set[str] = set()
 
     def enable(self):
         """Explicitly enable this trigger"""
         self.enabled = True
+        self.mark_dirty("enabled")
 
     def disable(self):
         """Explicitly disables this trigger"""
         self.enabled = False
+        self.mark_dirty("enabled")
 
     def toggle(self):
         """Toggle whether or not this trigger is enabled."""
         self.enabled = not self.enabled
+        self.mark_dirty("enabled")
+
+    def mark_dirty(self, *fields: str):
+        """Flag fields from `to_json` that changed outside of a command and need saving"""
+        self._dirty.update(fields)
+
+    def pop_dirty(self) -> Set[str]:
+        """Returns the fields changed since the last save and resets them"""
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self._dirty)
+
+    def counters_json(self) -> dict:
+        """The frequently changing state which is saved separately from the trigger"""
+        return {"count": self.count, "cooldown_last": self.cooldown_json().get("last")}
+
+    def load_counters(self, data: dict):
+        """Apply state saved by `counters_json` on top of the stored trigger"""
+        # a command may have saved the whole trigger after the last counter save
+        self.count = max(data.get("count", 0), self.count)
+        if self._cooldown and data.get("cooldown_last") is not None:
+            if isinstance(data["cooldown_last"], list):
+                self._cooldown_map.load(data["cooldown_last"])
+            else:
+                self._cooldown["last"] = data["cooldown_last"]
+
+    @property
+    def cooldown(self) -> Dict[str, Any]:
+        """The cooldown settings, per entity times are kept separately in a `CooldownMap`"""
+        return self._cooldown
+
+    @cooldown.setter
+    def cooldown(self, value: Dict[str, Any]):
+        self._cooldown: Dict[str, Any] = dict(value) if value else {}
+        self._cooldown_map = CooldownMap()
+        last = self._cooldown.get("last")
+        if isinstance(last, list):
+            # older versions stored every entity forever as a list
+            del self._cooldown["last"]
+            self._cooldown_map.load(last)
+
+    def cooldown_json(self) -> Dict[str, Any]:
+        if not self._cooldown:
+            return {}
+        data = dict(self._cooldown)
+        if "last" not in data:
+            data["last"] = self._cooldown_map.to_json(time.time(), data["time"])
+        return data
 
     def compile(self):
+        if self.regex is None or self.regex.pattern != self._raw_regex:
+            # keep a measured cost for an unchanged pattern otherwise use the best we know
+            cost = getattr(self._raw_regex, "cost", None)
+            self.cost = cost if cost is not None else static_analysis(self._raw_regex)[0]
         self.regex: Pattern = re.compile(self._raw_regex)
 
     def get_permissions(self):
@@ -427,84 +553,61 @@ class Trigger:
 
     async def check_cooldown(self, message: discord.Message) -> bool:
         now = message.created_at.timestamp()
-        if self.cooldown:
-            if self.cooldown["style"] in ["guild", "server"]:
-                last = self.cooldown["last"]
-                time = self.cooldown["time"]
-                if (now - last) > time:
-                    self.cooldown["last"] = now
+        if self._cooldown:
+            period = self._cooldown["time"]
+            if self._cooldown["style"] in ["guild", "server"]:
+                last = self._cooldown["last"]
+                if (now - last) > period:
+                    self._cooldown["last"] = now
+                    self.mark_dirty("cooldown")
                     return False
                 else:
                     return True
             else:
-                style: str = self.cooldown["style"]
+                style: str = self._cooldown["style"]
                 snowflake = getattr(message, style)
-                if snowflake.id not in [x["id"] for x in self.cooldown["last"]]:
-                    self.cooldown["last"].append({"id": snowflake.id, "last": now})
-                    return False
-                else:
-                    entity_list = self.cooldown["last"]
-                    for entity in entity_list:
-                        if entity["id"] == snowflake.id:
-                            last = entity["last"]
-                            time = self.cooldown["time"]
-                            if (now - last) > time:
-                                self.cooldown["last"].remove({"id": snowflake.id, "last": last})
-                                self.cooldown["last"].append({"id": snowflake.id, "last": now})
-                                return False
-                            else:
-                                return True
+                if self._cooldown_map.check(snowflake.id, now, period):
+                    return True
+                self.mark_dirty("cooldown")
+                return False
         return False
 
+    @property
+    def whitelist(self) -> FrozenSet[int]:
+        return self._whitelist
+
+    @whitelist.setter
+    def whitelist(self, value: Iterable[int]):
+        # always replaced rather than mutated so cached indexes can tell it changed
+        self._whitelist: FrozenSet[int] = frozenset(value)
+
+    @property
+    def blacklist(self) -> FrozenSet[int]:
+        return self._blacklist
+
+    @blacklist.setter
+    def blacklist(self, value: Iterable[int]):
+        self._blacklist: FrozenSet[int] = frozenset(value)
+
     async def check_bw_list(
         self, author: Optional[discord.Member], channel: discord.abc.GuildChannel
     ) -> bool:
-        can_run = True
-        # author: discord.Member = message.author
-        # channel: discord.abc.GuildChannel = message.channel
-        if self.whitelist:
-            can_run = False
-            if channel.id in self.whitelist:
-                can_run = True
-            if channel.category_id and channel.category_id in self.whitelist:
-                can_run = True
-            if isinstance(channel, discord.Thread):
-                include_threads = self.include_threads or isinstance(
-                    channel.parent, discord.ForumChannel
-                )
-                if channel.parent.id in self.whitelist and include_threads:
-                    # this is a thread
-                    can_run = True
-            if author is not None:
-                if author.id in self.whitelist:
-                    can_run = True
-                for role in author.roles:
-                    if role.is_default():
-                        continue
-                    if role.id in self.whitelist:
-                        can_run = True
-            return can_run
-        else:
-            if channel.id in self.blacklist:
-                can_run = False
-            if channel.category_id and channel.category_id in self.blacklist:
-                can_run = False
-            if isinstance(channel, discord.Thread):
-                include_threads = self.include_threads or isinstance(
-                    channel.parent, discord.ForumChannel
-                )
-                if channel.parent.id in self.blacklist and include_threads:
-                    # this is a thread
-                    can_run = False
-            if author is not None:
-                if author.id in self.blacklist:
-                    can_run = False
-                for role in author.roles:
-                    if role.is_default():
-                        continue
-                    if role.id in self.blacklist:
-                        can_run = False
-        return can_run
+        ids = {channel.id}
+        if channel.category_id:
+            ids.add(channel.category_id)
+        if isinstance(channel, discord.Thread):
+            include_threads = self.include_threads or isinstance(
+                channel.parent, discord.ForumChannel
+            )
+            if include_threads:
+                # this is a thread
+                ids.add(channel.parent_id)
+        if author is not None:
+            ids.add(author.id)
+            ids.update(role.id for role in author.roles if not role.is_default())
+        if self._whitelist:
+            return not self._whitelist.isdisjoint(ids)
+        return self._blacklist.isdisjoint(ids)
 
     @property
     def created_at(self):
@@ -555,9 +658,9 @@ class Trigger:
             "count": self.count,
             "image": self.image,
             "text": self.text,
-            "whitelist": self.whitelist,
-            "blacklist": self.blacklist,
-            "cooldown": self.cooldown,
+            "whitelist": list(self.whitelist),
+            "blacklist": list(self.blacklist),
+            "cooldown": self.cooldown_json(),
             "multi_payload": [i.to_json() for i in self.multi_payload],
             "created_at": self._created_at,
             "ignore_commands": self.ignore_commands,
@@ -583,6 +686,7 @@ class Trigger:
             "_last_modified_at": self._last_modified_at,
             "_last_modified": self._last_modified,
             "suppress": self.suppress,
+            "cost": self.cost.value,
         }
 
     @classmethod
@@ -716,6 +820,12 @@ class TriggerStarExists(Converter[Trigger]):
             )
 
 
+class RegexPattern(str):
+    """A validated regex pattern carrying the cost measured by `ValidRegex`"""
+
+    cost: Optional[RegexCost] = None
+
+
 class ValidRegex(Converter):
     """
     This will check to see if the provided regex pattern is valid
@@ -723,19 +833,61 @@ class ValidRegex(Converter):
     Guidance code on how to do this from:
     https://github.com/Rapptz/discord.py/blob/rewrite/discord/ext/commands/converter.py#L85
     https://github.com/Cog-Creators/Red-DiscordBot/blob/V3/develop/redbot/cogs/mod/mod.py#L24
+
+    Patterns are also analysed for catastrophic backtracking. Anything which
+    could not finish inside the search timeout is rejected and expensive
+    patterns are allowed with a warning.
     """
 
     async def convert(self, ctx: commands.Context, argument: str) -> str:
-        try:
-            re.compile(argument)
-            result = argument
-        except Exception as e:
-            err_msg = _("`{arg}` is not a valid regex pattern: {e}").format(arg=argument, e=e)
-            log.error("Retrigger invalid regex error: Pattern %s Reason %s", argument, e)
-            raise BadArgument(err_msg)
+        timeout = getattr(ctx.cog, "trigger_timeout", 1)
+        result, warning = await validate_regex(argument, timeout)
+        if warning:
+            await ctx.send(warning)
         return result
 
 
+async def validate_regex(pattern: str, timeout: float) -> Tuple[RegexPattern, Optional[str]]:
+    """
+    Check a new regex pattern is valid and can finish searching inside `timeout`.
+
+    Returns the pattern with its measured cost and a warning to show
+    if the pattern is expensive. Raises `BadArgument` with the reason
+    if the pattern is invalid or catastrophic.
+    """
+    try:
+        re.compile(pattern)
+        result = RegexPattern(pattern)
+    except Exception as e:
+        err_msg = _("`{arg}` is not a valid regex pattern: {e}").format(arg=pattern, e=e)
+        log.error("Retrigger invalid regex error: Pattern %s Reason %s", pattern, e)
+        raise BadArgument(err_msg)
+    analysis = await analyse(pattern, timeout)
+    result.cost = analysis.cost
+    reasons = humanize_list(analysis.warnings) if analysis.warnings else ""
+    if analysis.cost is RegexCost.catastrophic:
+        log.info("Retrigger rejected expensive regex: Pattern %s %s", pattern, reasons)
+        err_msg = _(
+            "`{arg}` could take longer than {timeout} seconds to search some messages "
+            "and would be disabled. {reasons}"
+        ).format(
+            arg=pattern,
+            timeout=timeout,
+            reasons=_("Problems found: {reasons}.").format(reasons=reasons) if reasons else "",
+        )
+        raise BadArgument(err_msg)
+    warning = None
+    if analysis.cost is RegexCost.expensive:
+        warning = _(
+            "`{arg}` is an expensive pattern and may slow down "
+            "triggers in this server. {reasons}"
+        ).format(
+            arg=pattern,
+            reasons=_("Problems found: {reasons}.").format(reasons=reasons) if reasons else "",
+        )
+    return result, warning
+
+
 class ValidEmoji(IDConverter):
     """
     This is from discord.py rewrite, first we'll match the actual emoji
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, FrozenSet, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from .converters import Trigger
+
+EDIT_CACHE_SIZE = 2048
+
+CONTENT = "content"
+FILENAMES = "filenames"
+EMBEDS = "embeds"
+
+
+def trigger_inputs(trigger: Trigger) -> FrozenSet[str]:
+    """The parts of a message a triggers result depends on"""
+    inputs = {CONTENT}
+    if trigger.read_filenames or trigger.ocr_search:
+        # attachments only change by being removed which also changes the filenames
+        inputs.add(FILENAMES)
+    if trigger.read_embeds:
+        inputs.add(EMBEDS)
+    return frozenset(inputs)
+
+
+def _signature(trigger: Trigger) -> Tuple[FrozenSet[str], Optional[str]]:
+    return trigger_inputs(trigger), trigger.regex.pattern if trigger.regex else None
+
+
+class EditRecord:
+    """What a message looked like when it was last checked and what each trigger found"""
+
+    __slots__ = ("hashes", "results")
+
+    def __init__(self, hashes: Dict[str, int]):
+        self.hashes = hashes
+        # trigger name -> (inputs the result depends on, pattern, whether it matched)
+        self.results: Dict[str, Tuple[FrozenSet[str], Optional[str], bool]] = {}
+
+    def changed(self, hashes: Dict[str, int]) -> Set[str]:
+        return {k for k, v in hashes.items() if self.hashes.get(k) != v}
+
+    def result(self, trigger: Trigger) -> Optional[bool]:
+        """The triggers previous result for this content or `None` if it needs checking"""
+        if trigger.name not in self.results:
+            return None
+        inputs, pattern, matched = self.results[trigger.name]
+        if (inputs, pattern) != _signature(trigger):
+            # the trigger was edited since this message was checked
+            return None
+        return matched
+
+    def set_result(self, trigger: Trigger, matched: bool) -> None:
+        self.results[trigger.name] = (*_signature(trigger), matched)
+
+
+class EditCache:
+    """
+    Bounded LRU of recently checked messages so edits only re-run the
+    triggers whose inputs actually changed.
+
+    Embeds unfurling on a link is an edit which leaves the content alone
+    so most triggers can reuse the result from the original message.
+    """
+
+    def __init__(self, max_size: int = EDIT_CACHE_SIZE):
+        self.max_size = max_size
+        self._records: OrderedDict[int, EditRecord] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, message_id: int) -> Optional[EditRecord]:
+        record = self._records.get(message_id)
+        if record is not None:
+            self._records.move_to_end(message_id)
+        return record
+
+    def update(self, message_id: int, hashes: Dict[str, int]) -> EditRecord:
+        """
+        Store the messages current hashes and return its record.
+
+        Results for triggers whose inputs changed are dropped since
+        they no longer describe the message.
+        """
+        old = self._records.pop(message_id, None)
+        record = EditRecord(hashes)
+        if old is not None:
+            changed = old.changed(hashes)
+            record.results = {
+                name: result
+                for name, result in old.results.items()
+                if result[0].isdisjoint(changed)
+            }
+        self._records[message_id] = record
+        while len(self._records) > self.max_size:
+            self._records.popitem(last=False)
+        return record
+
+    def forget(self, message_id: int) -> None:
+        self._records.pop(message_id, None)
+
+    def clear(self) -> None:
+        self._records.clear()
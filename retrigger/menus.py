@@ -11,12 +11,13 @@ from redbot.core.utils.chat_formatting import box, humanize_list, pagify
 from redbot.vendored.discord.ext import menus
 
 from .abc import ReTriggerMixin
-from .converters import ChannelUserRole, MultiResponse, Trigger, TriggerResponse
-
-try:
-    import regex as re
-except ImportError:
-    import re
+from .converters import (
+    ChannelUserRole,
+    MultiResponse,
+    Trigger,
+    TriggerResponse,
+    validate_regex,
+)
 
 log = getLogger("red.Trusty-cogs.retrigger")
 _ = Translator("ReTrigger", __file__)
@@ -471,6 +472,12 @@ class ReTriggerEditModal(discord.ui.Modal):
         self.og_button = button
         self.trigger = trigger
 
+    async def _respond(self, interaction: discord.Interaction, content: str) -> None:
+        if interaction.response.is_done():
+            await interaction.followup.send(content)
+        else:
+            await interaction.response.send_message(content)
+
     async def handle_multi(self, interaction: discord.Interaction):
         log.debug(self.multi_inputs)
         msg = _("Editing Trigger {trigger}:\n").format(trigger=self.trigger.name)
@@ -478,18 +485,21 @@ class ReTriggerEditModal(discord.ui.Modal):
         any_edits = False
         changed_values = []
         if self.trigger._raw_regex != self.regex.value:
+            timeout = getattr(self.og_button.view.cog, "trigger_timeout", 1)
+            # measuring the pattern can take longer than discord waits for a response
+            await interaction.response.defer()
             try:
-                re.compile(self.regex.value)
-            except Exception as e:
-                await interaction.response.send_message(
-                    _("The provided regex pattern is not valid: {e}").format(e=e), ephemeral=True
-                )
+                pattern, warning = await validate_regex(self.regex.value, timeout)
+            except BadArgument as e:
+                await interaction.followup.send(str(e), ephemeral=True)
                 return
-            self.trigger._raw_regex = self.regex.value
+            self.trigger._raw_regex = pattern
             self.trigger.compile()
             # we've already checked if the regex was valid
             any_edits = True
             msg += _("- Regex\n")
+            if warning:
+                msg += warning + "\n"
             changed_values.append("regex")
         for response_type, ti in self.multi_inputs.items():
             old = [i for i in self.trigger.multi_payload if i.action is response_type]
@@ -514,14 +524,14 @@ class ReTriggerEditModal(discord.ui.Modal):
                 changed_values.append(response_type.name)
                 msg += _("- {response_type}").format(response_type=response_type.name)
         if any_edits:
-            await interaction.response.send_message(msg)
+            await self._respond(interaction, msg)
             self.trigger._last_modified_by = interaction.user.id
             self.trigger._last_modified_at = interaction.id
             self.trigger._last_modified = humanize_list(changed_values)
             async with self.og_button.view.cog.config.guild(guild).trigger_list() as trigger_list:
                 trigger_list[self.trigger.name] = await self.trigger.to_json()
         else:
-            await interaction.response.send_message(_("None of the values have changed."))
+            await self._respond(interaction, _("None of the values have changed."))
         await self.og_button.view.show_checked_page(self.og_button.view.current_page, interaction)
 
     async def on_submit(self, interaction: discord.Interaction):
@@ -539,19 +549,22 @@ class ReTriggerEditModal(discord.ui.Modal):
             changed_values.append("text")
             msg += _("Text: `{text}`\n").format(text=self.text.value)
         if self.trigger._raw_regex != self.regex.value:
+            timeout = getattr(self.og_button.view.cog, "trigger_timeout", 1)
+            # measuring the pattern can take longer than discord waits for a response
+            await interaction.response.defer()
             try:
-                re.compile(self.regex.value)
-            except Exception as e:
-                await interaction.response.send_message(
-                    _("The provided regex pattern is not valid: {e}").format(e=e), ephemeral=True
-                )
+                pattern, warning = await validate_regex(self.regex.value, timeout)
+            except BadArgument as e:
+                await interaction.followup.send(str(e), ephemeral=True)
                 return
-            self.trigger._raw_regex = self.regex.value
+            self.trigger._raw_regex = pattern
             self.trigger.compile()
             # we've already checked if the regex was valid
             edited_regex = True
             changed_values.append("regex")
             msg += _("Regex: `{regex}`\n").format(regex=self.regex.value)
+            if warning:
+                msg += warning + "\n"
         if self.replies.values:
             if self.replies.values[0] == "True":
                 self.trigger.reply = True
@@ -563,14 +576,14 @@ class ReTriggerEditModal(discord.ui.Modal):
             changed_values.append("replies")
             msg += _("Replies: `{replies}`\n").format(replies=self.replies.values[0])
         if edited_text or edited_regex or edited_replies:
-            await interaction.response.send_message(msg)
+            await self._respond(interaction, msg)
             self.trigger._last_modified_by = interaction.user.id
             self.trigger._last_modified_at = interaction.id
             self.trigger._last_modified = humanize_list(changed_values)
             async with self.og_button.view.cog.config.guild(guild).trigger_list() as trigger_list:
                 trigger_list[self.trigger.name] = await self.trigger.to_json()
         else:
-            await interaction.response.send_message(_("None of the values have changed."))
+            await self._respond(interaction, _("None of the values have changed."))
         await self.og_button.view.show_checked_page(self.og_button.view.current_page, interaction)
 
     async def interaction_check(self, interaction: discord.Interaction):
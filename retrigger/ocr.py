@@ -0,0 +1,104 @@
+"""
+Helpers for reading text out of images.
+
+The cache is keyed by a hash of the image bytes so the same image
+reposted or re-edited into a message is only ever OCR'd once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from io import BytesIO
+from typing import Optional, Tuple
+
+try:
+    import pytesseract
+    from PIL import Image
+
+    ALLOW_OCR = True
+except (ImportError, ValueError):
+    ALLOW_OCR = False
+
+OCR_WORKERS = 2
+OCR_TIMEOUT = 5
+# Images larger than this are scaled down before OCR, 4 megapixels is plenty for memes
+MAX_OCR_PIXELS = 4_000_000
+OCR_CACHE_BYTES = 4 * 1024 * 1024
+OCR_CACHE_TTL = 6 * 60 * 60
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def ocr_image(data: bytes, max_pixels: int = MAX_OCR_PIXELS) -> str:
+    """
+    Decode, downscale if needed, and OCR an image.
+
+    This is blocking and intended to be run in the OCR executor.
+    """
+    with Image.open(BytesIO(data)) as image:
+        width, height = image.size
+        if width * height > max_pixels:
+            scale = math.sqrt(max_pixels / (width * height))
+            size = (max(int(width * scale), 1), max(int(height * scale), 1))
+            image.draft("RGB", size)
+            resized = image.resize(size)
+            return pytesseract.image_to_string(resized)
+        return pytesseract.image_to_string(image)
+
+
+class OCRCache:
+    """
+    LRU cache of OCR results with a time to live and a cap on the total text size.
+    """
+
+    def __init__(self, max_bytes: int = OCR_CACHE_BYTES, ttl: float = OCR_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        # content hash -> (expires at, text, size)
+        self._data: OrderedDict[str, Tuple[float, str, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            expires, text, size = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        if expires < time.monotonic():
+            del self._data[key]
+            self._size -= size
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def set(self, key: str, text: str) -> None:
+        size = len(key) + len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._size -= self._data.pop(key)[2]
+        self._data[key] = (time.monotonic() + self.ttl, text, size)
+        self._size += size
+        while self._size > self.max_bytes:
+            _key, (_expires, _text, old_size) = self._data.popitem(last=False)
+            self._size -= old_size
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._size = 0
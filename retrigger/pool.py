@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing as mp
+from collections import defaultdict
+from multiprocessing.pool import Pool
+from typing import Any, Callable, DefaultDict, Dict, List, Optional, Set
+
+from red_commons.logging import getLogger
+
+log = getLogger("red.trusty-cogs.ReTrigger")
+
+DEFAULT_GUILD_LIMIT = 2
+DEFAULT_MAX_TASKS = 1000
+
+
+class PoolBusy(Exception):
+    """Raised when a guild has used all of its slots in the pool for too long"""
+
+
+class _Limiter:
+    """A semaphore for one guild whose size can change while jobs hold it"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._waiters: List[asyncio.Future] = []
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self.in_use >= self.limit:
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                self._waiters.remove(waiter)
+        self.in_use += 1
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._wake()
+
+    def resize(self, limit: int) -> None:
+        self.limit = limit
+        self._wake()
+
+    def _wake(self) -> None:
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class _PoolJobs:
+    """
+    Works out when each job in a pool starts running.
+
+    Workers take jobs in the order they were submitted so job `n` starts
+    as soon as `n - processes + 1` earlier jobs have finished. This lets the
+    time a job spends queued behind others not count towards its timeout.
+    """
+
+    def __init__(self, pool: Pool, processes: int):
+        self.pool = pool
+        self.processes = processes
+        self.submitted = 0
+        self.finished = 0
+        self.terminated = False
+        self._waiting: Set[int] = set()
+        self._started: Dict[int, float] = {}
+
+    def submit(self, now: float) -> int:
+        job = self.submitted
+        self.submitted += 1
+        self._waiting.add(job)
+        if self.finished >= job - self.processes + 1:
+            self._started[job] = now
+        return job
+
+    def finish(self, now: float) -> None:
+        self.finished += 1
+        job = self.finished + self.processes - 1
+        if job in self._waiting:
+            self._started[job] = now
+
+    def started(self, job: int) -> Optional[float]:
+        return self._started.get(job)
+
+    def forget(self, job: int) -> None:
+        self._waiting.discard(job)
+        self._started.pop(job, None)
+
+
+class RegexPool:
+    """
+    Process pool shared by every guild with limits so one guild can't starve the rest.
+
+    - Each guild can only have `guild_limit` jobs in the pool at once.
+    - Workers are replaced after `max_tasks` jobs to bound their memory.
+    - A job still running `timeout` seconds after it started means a worker
+      is stuck so the whole pool is swapped for a fresh one and the old one
+      is terminated once everything else running in it has had a chance to
+      finish. Time spent queued behind other jobs doesn't count.
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        guild_limit: int = DEFAULT_GUILD_LIMIT,
+        max_tasks: Optional[int] = DEFAULT_MAX_TASKS,
+    ):
+        self.processes = processes or mp.cpu_count()
+        self.guild_limit = guild_limit
+        self.max_tasks = max_tasks
+        self.respawns = 0
+        self.waiting = 0
+        self.in_flight = 0
+        self._guild_in_flight: DefaultDict[int, int] = defaultdict(int)
+        self._limiters: Dict[int, _Limiter] = {}
+        self._jobs = self._new_pool()
+
+    def _new_pool(self) -> _PoolJobs:
+        pool = Pool(self.processes, maxtasksperchild=self.max_tasks or None)
+        return _PoolJobs(pool, self.processes)
+
+    def configure(
+        self,
+        processes: Optional[int] = None,
+        guild_limit: int = DEFAULT_GUILD_LIMIT,
+        max_tasks: Optional[int] = DEFAULT_MAX_TASKS,
+    ) -> None:
+        """Apply new settings, jobs already running finish in the old pool"""
+        processes = processes or mp.cpu_count()
+        if guild_limit != self.guild_limit:
+            self.guild_limit = guild_limit
+            # jobs holding the old limits still count against the new ones
+            for limiter in self._limiters.values():
+                limiter.resize(guild_limit)
+        if processes == self.processes and max_tasks == self.max_tasks:
+            return
+        self.processes = processes
+        self.max_tasks = max_tasks
+        self._retire(self._jobs, grace=30)
+
+    def _retire(self, jobs: _PoolJobs, grace: float) -> bool:
+        if jobs is not self._jobs:
+            # another timed out job already replaced it
+            return False
+        self._jobs = self._new_pool()
+        jobs.pool.close()
+        loop = asyncio.get_running_loop()
+
+        def terminate() -> None:
+            jobs.terminated = True
+            loop.run_in_executor(None, jobs.pool.terminate)
+
+        loop.call_later(grace, terminate)
+        return True
+
+    @staticmethod
+    def _settle(
+        jobs: _PoolJobs, future: asyncio.Future, result: Any, error: Optional[BaseException]
+    ) -> None:
+        loop = future.get_loop()
+        jobs.finish(loop.time())
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def guild_in_flight(self, guild_id: int) -> int:
+        return self._guild_in_flight.get(guild_id, 0)
+
+    async def apply(
+        self, guild_id: int, func: Callable[..., Any], args: tuple, timeout: float
+    ) -> Any:
+        """
+        Run `func(*args)` in the pool and return its result.
+
+        Raises `PoolBusy` if the guild couldn't get a slot or the job couldn't
+        start within `timeout` and `multiprocessing.TimeoutError` only if the
+        job was still running `timeout` seconds after it started.
+        """
+        limiter = self._limiters.get(guild_id)
+        if limiter is None:
+            limiter = self._limiters[guild_id] = _Limiter(self.guild_limit)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(limiter.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise PoolBusy()
+        finally:
+            self.waiting -= 1
+        jobs = self._jobs
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def callback(result: Any = None, error: Optional[BaseException] = None) -> None:
+            # called from the pools result thread
+            try:
+                loop.call_soon_threadsafe(self._settle, jobs, future, result, error)
+            except RuntimeError:
+                # the loop has already closed
+                pass
+
+        self.in_flight += 1
+        self._guild_in_flight[guild_id] += 1
+        job = jobs.submit(loop.time())
+        queued_until = loop.time() + timeout
+        try:
+            jobs.pool.apply_async(
+                func, args, callback=callback, error_callback=lambda e: callback(error=e)
+            )
+            while True:
+                started = jobs.started(job)
+                if started is None:
+                    if jobs.terminated or loop.time() >= queued_until:
+                        # the job will still run but nobody is waiting for it
+                        raise PoolBusy()
+                    wait = queued_until - loop.time()
+                else:
+                    wait = started + timeout - loop.time()
+                    if wait <= 0:
+                        break
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), timeout=wait)
+                except asyncio.TimeoutError:
+                    continue
+            log.warning(
+                "ReTrigger: a regex job in guild %s exceeded %ss, replacing the process pool.",
+                guild_id,
+                timeout,
+            )
+            if self._retire(jobs, grace=timeout):
+                self.respawns += 1
+            raise mp.TimeoutError()
+        finally:
+            jobs.forget(job)
+            self.in_flight -= 1
+            self._guild_in_flight[guild_id] -= 1
+            if not self._guild_in_flight[guild_id]:
+                del self._guild_in_flight[guild_id]
+            limiter.release()
+
+    def to_dict(self) -> dict:
+        return {
+            "processes": self.processes,
+            "guild_limit": self.guild_limit,
+            "max_tasks": self.max_tasks,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "queue_depth": max(self.in_flight - self.processes, 0),
+            "respawns": self.respawns,
+        }
+
+    def close(self) -> None:
+        """Stop accepting jobs and wait for the workers to exit, this blocks"""
+        self._jobs.pool.close()
+        self._jobs.pool.join()
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import warnings
+from typing import Dict, FrozenSet, List, Mapping, Optional, Pattern, Set, Tuple
+
+from red_commons.logging import getLogger
+
+try:
+    import regex as re
+except ImportError:
+    import re
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+from .converters import Trigger
+
+log = getLogger("red.trusty-cogs.ReTrigger")
+
+_REPEATS = tuple(
+    getattr(sre_constants, op)
+    for op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_constants, op)
+)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+# fuzzy constraints from the regex module like `{e<=1}` or `{i<=1,d<=1}` anywhere
+# in a pattern, the stdlib parser reads these as literals so they can't be filtered
+_FUZZY = re.compile(r"\{[^{}]*[eids][^{}]*\}")
+
+# (literals, ignorecase) where at least one literal must be present for a match
+Requirement = Tuple[FrozenSet[str], bool]
+
+
+def _pick_best(options: List[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """Prefer the set whose shortest literal is longest, then the smallest set"""
+    if not options:
+        return None
+    return max(options, key=lambda s: (min(len(i) for i in s), -len(s)))
+
+
+def _required_literals(data: sre_parse.SubPattern) -> Optional[FrozenSet[str]]:
+    """
+    Walk a parsed pattern and return a set of literals where any match
+    must contain at least one of them.
+
+    `None` means we couldn't prove anything and the pattern must always be checked.
+    """
+    options: List[FrozenSet[str]] = []
+    run: List[str] = []
+    for op, av in data:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            options.append(frozenset(["".join(run)]))
+            run = []
+        if op is sre_constants.SUBPATTERN:
+            _group, add_flags, del_flags, sub = av
+            if add_flags or del_flags:
+                # scoped flags can change how literals inside are matched
+                continue
+            found = _required_literals(sub)
+        elif op is sre_constants.BRANCH:
+            branches = [_required_literals(b) for b in av[1]]
+            if any(b is None for b in branches):
+                continue
+            found = frozenset().union(*branches)
+        elif op in _REPEATS:
+            low, _high, item = av
+            if low < 1:
+                continue
+            found = _required_literals(item)
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            found = _required_literals(av)
+        elif op is sre_constants.ASSERT:
+            found = _required_literals(av[1])
+        else:
+            continue
+        if found:
+            options.append(found)
+    if run:
+        options.append(frozenset(["".join(run)]))
+    return _pick_best(options)
+
+
+def pattern_requirement(pattern: str) -> Optional[Requirement]:
+    """
+    Find the literal substrings required for `pattern` to match anything.
+
+    This uses the standard library parser so anything it can't understand,
+    or anything the `regex` module would parse differently, is left unfiltered.
+    """
+    if _FUZZY.search(pattern):
+        return None
+    try:
+        with warnings.catch_warnings():
+            # "Possible nested set" and friends are POSIX classes in the regex module
+            warnings.simplefilter("error")
+            parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None
+    state = getattr(parsed, "state", None) or getattr(parsed, "pattern", None)
+    ignorecase = bool(getattr(state, "flags", 0) & sre_constants.SRE_FLAG_IGNORECASE)
+    literals = _required_literals(parsed)
+    if not literals:
+        return None
+    if ignorecase:
+        if not all(lit.isascii() for lit in literals):
+            return None
+        literals = frozenset(lit.lower() for lit in literals)
+    return literals, ignorecase
+
+
+class _LiteralMatcher:
+    """
+    Single pass matcher for a set of literals.
+
+    The lookahead lets matches overlap and the longest literal at each
+    position wins, so any shorter literal that is a prefix of a hit is
+    added back afterwards.
+    """
+
+    def __init__(self, literals: Set[str]):
+        self._pattern: Optional[Pattern] = None
+        self._prefixes: Dict[str, FrozenSet[str]] = {}
+        if not literals:
+            return
+        ordered = sorted(literals, key=len, reverse=True)
+        self._pattern = re.compile("(?=({}))".format("|".join(re.escape(i) for i in ordered)))
+        for lit in literals:
+            self._prefixes[lit] = frozenset(
+                lit[:i] for i in range(1, len(lit) + 1) if lit[:i] in literals
+            )
+
+    def scan(self, content: str) -> Set[str]:
+        found: Set[str] = set()
+        if self._pattern is None:
+            return found
+        for hit in set(self._pattern.findall(content)):
+            found.update(self._prefixes[hit])
+        return found
+
+
+class TriggerPrefilter:
+    """
+    Compiled literal prefilter for all of a guilds triggers.
+
+    One scan over the content tells us which triggers could possibly
+    match so only those need their full regex run.
+    """
+
+    def __init__(self, triggers: Mapping[str, Trigger]):
+        self._patterns: Dict[str, Optional[Pattern]] = {}
+        self._requirements: Dict[str, Optional[Requirement]] = {}
+        case_literals: Set[str] = set()
+        nocase_literals: Set[str] = set()
+        for name, trigger in triggers.items():
+            self._patterns[name] = trigger.regex
+            requirement = None
+            if trigger.regex is not None:
+                requirement = pattern_requirement(trigger.regex.pattern)
+            self._requirements[name] = requirement
+            if requirement is None:
+                continue
+            literals, ignorecase = requirement
+            if ignorecase:
+                nocase_literals.update(literals)
+            else:
+                case_literals.update(literals)
+        self._case = _LiteralMatcher(case_literals)
+        self._nocase = _LiteralMatcher(nocase_literals)
+        log.trace(
+            "Built prefilter for %s triggers, %s unfiltered",
+            len(self._requirements),
+            sum(1 for r in self._requirements.values() if r is None),
+        )
+
+    def is_stale(self, triggers: Mapping[str, Trigger]) -> bool:
+        """Check whether any trigger was added, removed, or had its regex changed"""
+        if len(triggers) != len(self._patterns):
+            return True
+        for name, trigger in triggers.items():
+            if name not in self._patterns or self._patterns[name] is not trigger.regex:
+                return True
+        return False
+
+    def scan(self, content: str) -> Tuple[Set[str], Optional[Set[str]]]:
+        """
+        Returns the case sensitive and case insensitive literals found in content.
+
+        Case insensitive literals are only checked against ascii content
+        since unicode case folding doesn't line up with the regex engines.
+        """
+        nocase = self._nocase.scan(content.lower()) if content.isascii() else None
+        return self._case.scan(content), nocase
+
+    def might_match(
+        self,
+        trigger: Trigger,
+        content: str,
+        cache: Dict[str, Tuple[Set[str], Optional[Set[str]]]],
+    ) -> bool:
+        """
+        Returns False only if the trigger cannot possibly match the content.
+
+        `cache` should live for a single message so that multiple triggers
+        reading the same content only scan it once.
+        """
+        requirement = self._requirements.get(trigger.name)
+        if requirement is None:
+            return True
+        if content not in cache:
+            cache[content] = self.scan(content)
+        case_found, nocase_found = cache[content]
+        literals, ignorecase = requirement
+        if ignorecase:
+            if nocase_found is None:
+                return True
+            return not literals.isdisjoint(nocase_found)
+        return not literals.isdisjoint(case_found)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import time
+from typing import List, Optional, Pattern
+
+try:
+    import regex as re
+except ImportError:
+    import re
+
+# Red doesn't tell cogs when prefixes change so cached matchers are rebuilt this often
+PREFIX_CACHE_TTL = 300
+
+
+class PrefixMatcher:
+    """
+    A guilds command prefixes compiled into a single pattern.
+
+    Prefixes are tried longest first which is the same order Red uses
+    so `!!ping` finds the `!!` prefix before `!` when both are set.
+    """
+
+    def __init__(self, prefixes: List[str], ttl: float = PREFIX_CACHE_TTL):
+        self.prefixes = prefixes
+        self.expires = time.monotonic() + ttl
+        ordered = sorted(prefixes, key=len, reverse=True)
+        self._pattern: Optional[Pattern] = None
+        if ordered:
+            self._pattern = re.compile("(?:" + "|".join(re.escape(p) for p in ordered) + r")(\S+)")
+
+    def is_stale(self) -> bool:
+        return self.expires < time.monotonic()
+
+    def command_name(self, content: str) -> Optional[str]:
+        """The word following a prefix at the start of `content` if there is one"""
+        if self._pattern is None:
+            return None
+        match = self._pattern.match(content)
+        return match.group(1) if match else None
@@ -0,0 +1,151 @@
+"""
+Rendering and caching for resize triggers.
+
+A rendered image only depends on the source image and the requested size
+so each size is rendered once, kept in memory, and written to disk so it
+survives the cog being reloaded. The source file's modification time is
+part of every key so replacing an image invalidates everything rendered from it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Tuple
+
+from red_commons.logging import getLogger
+
+try:
+    from PIL import Image, ImageSequence
+
+    ALLOW_RESIZE = True
+except ImportError:
+    ALLOW_RESIZE = False
+
+log = getLogger("red.trusty-cogs.ReTrigger")
+
+RESIZE_STEP = 16
+# sizes rendered in the background when a resize trigger is created
+PREWARM_SIZES = range(1, 9)
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+
+
+def render_resize(path: Path, size: int) -> bytes:
+    """Thumbnail an image or every frame of a gif to `RESIZE_STEP * size` pixels"""
+    size = max(size, 1)
+    length, width = (RESIZE_STEP * size, RESIZE_STEP * size)
+    byte_array = BytesIO()
+    with Image.open(path) as im:
+        if path.suffix.lower() == ".gif":
+            img_list = [frame.copy() for frame in ImageSequence.Iterator(im)]
+            for frame in img_list:
+                frame.thumbnail((length, width), Image.Resampling.LANCZOS)
+            img_list[0].save(
+                byte_array,
+                format="GIF",
+                save_all=True,
+                append_images=img_list,
+                duration=0,
+                loop=0,
+            )
+        else:
+            im.thumbnail((length, width), Image.Resampling.LANCZOS)
+            im.save(byte_array, format="PNG")
+    return byte_array.getvalue()
+
+
+class ResizeCache:
+    """
+    In memory LRU in front of an on disk cache of rendered resize images.
+
+    Everything here is blocking and meant to be run in an executor.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = MEMORY_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = 0
+        # (source path, source mtime, size) -> rendered bytes
+        self._memory: OrderedDict[Tuple[str, int, int], bytes] = OrderedDict()
+        # (source path, source mtime) -> largest size which still changes the image
+        self._max_sizes: Dict[Tuple[str, int], int] = {}
+
+    @staticmethod
+    def _digest(path: Path) -> str:
+        return hashlib.sha1(str(path).encode("utf-8")).hexdigest()[:16]
+
+    def _disk_path(self, path: Path, version: int, size: int) -> Path:
+        ext = ".gif" if path.suffix.lower() == ".gif" else ".png"
+        return self.directory / f"{self._digest(path)}-{version}-{size}{ext}"
+
+    def _max_size(self, path: Path, version: int) -> int:
+        key = (str(path), version)
+        if key not in self._max_sizes:
+            with Image.open(path) as im:
+                # thumbnail never enlarges so anything past the original size is identical
+                self._max_sizes[key] = max(math.ceil(max(im.size) / RESIZE_STEP), 1)
+        return self._max_sizes[key]
+
+    def get(self, path: Path, size: int) -> bytes:
+        """Returns the rendered image, rendering and caching it if needed"""
+        version = path.stat().st_mtime_ns
+        size = min(max(size, 1), self._max_size(path, version))
+        key = (str(path), version, size)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        disk_path = self._disk_path(path, version, size)
+        try:
+            data = disk_path.read_bytes()
+        except FileNotFoundError:
+            data = render_resize(path, size)
+            self._write(path, disk_path, data)
+        self._remember(key, data)
+        return data
+
+    def _remember(self, key: Tuple[str, int, int], data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _key, old = self._memory.popitem(last=False)
+                self._size -= len(old)
+
+    def _write(self, path: Path, disk_path: Path, data: bytes) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # clear out anything rendered from an older version of this image
+            prefix = f"{self._digest(path)}-"
+            current = disk_path.name.split("-")[1]
+            for old in self.directory.glob(f"{prefix}*"):
+                if old.name.split("-")[1] != current:
+                    old.unlink(missing_ok=True)
+            tmp = disk_path.with_suffix(disk_path.suffix + ".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, disk_path)
+        except OSError:
+            log.exception("Error saving resized image for %s", path)
+
+    def invalidate(self, path: Path) -> None:
+        """Forget everything rendered from `path`"""
+        with self._lock:
+            for key in [k for k in self._memory if k[0] == str(path)]:
+                self._size -= len(self._memory.pop(key))
+            for key in [k for k in self._max_sizes if k[0] == str(path)]:
+                del self._max_sizes[key]
+        for old in self.directory.glob(f"{self._digest(path)}-*"):
+            try:
+                old.unlink()
+            except OSError:
+                pass
@@ -1,20 +1,26 @@
 import asyncio
 from abc import ABC
-from multiprocessing.pool import Pool
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Set, Union
 
+import aiohttp
 import discord
 from discord.ext import tasks
 from red_commons.logging import getLogger
 from redbot.core import Config, checks, commands, modlog
 from redbot.core.commands import TimedeltaConverter
+from redbot.core.data_manager import cog_data_path
 from redbot.core.i18n import Translator, cog_i18n
 
 # from redbot.core.utils import menus
-from redbot.core.utils.chat_formatting import humanize_list, pagify
+from redbot.core.utils.chat_formatting import box, humanize_list, pagify
 
+from .bwlist import BWListIndex
+from .complexity import RegexCost
 from .converters import (
+    HOT_FIELDS,
     ChannelUserRole,
     MentionStyle,
     MultiFlags,
@@ -25,6 +31,7 @@ from .converters import (
     ValidEmoji,
     ValidRegex,
 )
+from .edits import EditCache
 from .menus import (
     BaseMenu,
     ConfirmView,
@@ -32,7 +39,14 @@ from .menus import (
     ReTriggerMenu,
     ReTriggerPages,
 )
+from .ocr import OCR_WORKERS, OCRCache
+from .pool import DEFAULT_GUILD_LIMIT, DEFAULT_MAX_TASKS, RegexPool
+from .prefilter import TriggerPrefilter
+from .prefixes import PrefixMatcher
+from .resize import ResizeCache
 from .slash import ReTriggerSlash
+from .stats import ReTriggerStats
+from .transfer import ImportTooLarge, dump_triggers, read_export
 from .triggerhandler import ALLOW_OCR, ALLOW_RESIZE, TriggerHandler
 
 log = getLogger("red.trusty-cogs.ReTrigger")
@@ -95,7 +109,7 @@ class ReTrigger(
     """
 
     __author__ = ["TrustyJAID"]
-    __version__ = "2.29.1"
+    __version__ = "2.42.0"
 
     def __init__(self, bot):
         super().__init__()
@@ -111,10 +125,30 @@ class ReTrigger(
             remove_role_logs=False,
             filter_logs=False,
             bypass=False,
+            trigger_counters={},
         )
-        self.config.register_global(trigger_timeout=1, enable_slash=False)
-        self.re_pool = Pool()
+        self.config.register_global(
+            trigger_timeout=1,
+            enable_slash=False,
+            save_interval=120,
+            pool_workers=0,
+            pool_guild_limit=DEFAULT_GUILD_LIMIT,
+            pool_max_tasks=DEFAULT_MAX_TASKS,
+        )
+        self.re_pool = RegexPool()
         self.triggers: Dict[int, Dict[str, Trigger]] = {}
+        self.prefilters: Dict[int, TriggerPrefilter] = {}
+        self.bw_indexes: Dict[int, BWListIndex] = {}
+        self.prefix_matchers: Dict[int, PrefixMatcher] = {}
+        self.edit_cache = EditCache()
+        self.session = aiohttp.ClientSession()
+        self.ocr_cache = OCRCache()
+        self.ocr_executor = ThreadPoolExecutor(
+            max_workers=OCR_WORKERS, thread_name_prefix="retrigger-ocr"
+        )
+        self.resize_cache = ResizeCache(cog_data_path(self) / "resize_cache")
+        self.prewarm_tasks: Set[asyncio.Task] = set()
+        self.stats = ReTriggerStats()
         self.trigger_timeout = 1
         self.save_loop.start()
         self.ALLOW_OCR = ALLOW_OCR
@@ -144,23 +178,48 @@ class ReTrigger(
             except Exception:
                 log.exception("Error removing retrigger from dev environment.")
         log.debug("Closing process pools.")
-        self.re_pool.close()
         loop = asyncio.get_running_loop()
-        loop.run_in_executor(None, self.re_pool.join)
+        loop.run_in_executor(None, self.re_pool.close)
         self.save_loop.cancel()
+        for task in self.prewarm_tasks:
+            task.cancel()
+        self.ocr_executor.shutdown(wait=False)
+        await self.session.close()
 
     async def save_all_triggers(self):
+        """
+        Save only the triggers which changed outside of a command.
+
+        Counts and cooldowns are written to `trigger_counters` in one go per guild
+        and anything else is written as individual fields of the trigger.
+        """
         for guild_id, triggers in self.triggers.items():
-            guild = self.bot.get_guild(guild_id)
-            if not guild:
+            counters = {}
+            fields = {}
+            for trigger in triggers.values():
+                if not trigger.is_dirty:
+                    continue
+                dirty = trigger.pop_dirty()
+                if not dirty.isdisjoint(HOT_FIELDS):
+                    counters[trigger.name] = trigger.counters_json()
+                if dirty - HOT_FIELDS:
+                    data = await trigger.to_json()
+                    fields[trigger.name] = {k: data[k] for k in dirty - HOT_FIELDS if k in data}
+            if not counters and not fields:
                 continue
-            async with self.config.guild(guild).trigger_list() as trigger_list:
-                for trigger in triggers.values():
-                    try:
-                        trigger_list[trigger.name] = await trigger.to_json()
-                    except KeyError:
-                        continue
-                    await asyncio.sleep(0.1)
+            guild_config = self.config.guild_from_id(guild_id)
+            if counters:
+                async with guild_config.trigger_counters() as trigger_counters:
+                    trigger_counters.update(counters)
+            for name, values in fields.items():
+                if name not in triggers:
+                    # removed while we were saving
+                    continue
+                for key, value in values.items():
+                    await guild_config.trigger_list.set_raw(name, key, value=value)
+            log.trace(
+                "Saved %s counters and %s triggers in %s", len(counters), len(fields), guild_id
+            )
 
     @tasks.loop(seconds=120)
     async def save_loop(self):
@@ -181,11 +240,20 @@ class ReTrigger(
             except Exception:
                 log.error("Error adding retrigger to dev environment.")
         self.trigger_timeout = await self.config.trigger_timeout()
+        self.save_loop.change_interval(seconds=await self.config.save_interval())
+        self.re_pool.configure(
+            processes=await self.config.pool_workers(),
+            guild_limit=await self.config.pool_guild_limit(),
+            max_tasks=await self.config.pool_max_tasks(),
+        )
         data = await self.config.all_guilds()
         for guild, settings in data.items():
             self.triggers[guild] = {}
+            counters = settings.get("trigger_counters", {})
             for trigger in settings["trigger_list"].values():
                 new_trigger = await Trigger.from_json(trigger)
+                if new_trigger.name in counters:
+                    new_trigger.load_counters(counters[new_trigger.name])
                 try:
                     new_trigger.compile()
                 except Exception:
@@ -573,7 +641,7 @@ class ReTrigger(
             for trigger in triggers:
                 for obj in channel_user_role:
                     if obj.id not in trigger.whitelist:
-                        trigger.whitelist.append(obj.id)
+                        trigger.whitelist |= {obj.id}
                         trigger._last_modified_by = ctx.author.id
                         trigger._last_modified_at = ctx.message.id
                         trigger._last_modified = _("Allowlist adjusted")
@@ -617,7 +685,7 @@ class ReTrigger(
             for trigger in triggers:
                 for obj in channel_user_role:
                     if obj.id in trigger.whitelist:
-                        trigger.whitelist.remove(obj.id)
+                        trigger.whitelist -= {obj.id}
                         trigger._last_modified_by = ctx.author.id
                         trigger._last_modified_at = ctx.message.id
                         trigger._last_modified = _("Allowlist adjusted")
@@ -657,7 +725,7 @@ class ReTrigger(
                         trigger._last_modified_by = ctx.author.id
                         trigger._last_modified_at = ctx.message.id
                         trigger._last_modified = _("Blocklist adjusted")
-                        trigger.blacklist.append(obj.id)
+                        trigger.blacklist |= {obj.id}
                         trigger_list[trigger.name] = await trigger.to_json()
         # await self.remove_trigger_from_cache(ctx.guild.id, trigger)
         # self.triggers[ctx.guild.id].append(trigger)
@@ -699,7 +767,7 @@ class ReTrigger(
                         trigger._last_modified_by = ctx.author.id
                         trigger._last_modified_at = ctx.message.id
                         trigger._last_modified = _("Blocklist adjusted")
-                        trigger.blacklist.remove(obj.id)
+                        trigger.blacklist -= {obj.id}
                         trigger_list[trigger.name] = await trigger.to_json()
             # await self.remove_trigger_from_cache(ctx.guild.id, trigger)
             # self.triggers[ctx.guild.id].append(trigger)
@@ -1474,6 +1542,64 @@ class ReTrigger(
             self.trigger_timeout = timeout
             await ctx.send(_("Regex search timeout set to {timeout}").format(timeout=timeout))
 
+    @retrigger.command(hidden=True)
+    @checks.is_owner()
+    @wrapped_additional_help()
+    async def pool(
+        self,
+        ctx: commands.Context,
+        workers: Optional[commands.Range[int, 0, 64]] = None,
+        guild_limit: Optional[commands.Range[int, 1, 64]] = None,
+        max_tasks: Optional[commands.Range[int, 0, 100000]] = None,
+    ) -> None:
+        """
+        Show or change the regex process pool settings
+
+        `[workers]` the number of worker processes, 0 uses one per CPU.
+        `[guild_limit]` how many searches a single server can have running at once.
+        `[max_tasks]` how many searches a worker runs before being replaced, 0 never replaces.
+
+        Changes apply immediately, searches already running finish in the old pool.
+        """
+        if workers is not None:
+            await self.config.pool_workers.set(workers)
+        if guild_limit is not None:
+            await self.config.pool_guild_limit.set(guild_limit)
+        if max_tasks is not None:
+            await self.config.pool_max_tasks.set(max_tasks)
+        if any(i is not None for i in (workers, guild_limit, max_tasks)):
+            self.re_pool.configure(
+                processes=await self.config.pool_workers(),
+                guild_limit=await self.config.pool_guild_limit(),
+                max_tasks=await self.config.pool_max_tasks(),
+            )
+        msg = _(
+            "Workers: {processes}\n"
+            "Searches per server: {guild_limit}\n"
+            "Searches per worker: {max_tasks}\n"
+            "Running: {in_flight}\n"
+            "Queued: {queue_depth}\n"
+            "Waiting for a server slot: {waiting}\n"
+            "Restarts after a stuck search: {respawns}\n"
+        ).format(**self.re_pool.to_dict())
+        await ctx.send(box(msg, lang="yaml"))
+
+    @retrigger.command(hidden=True)
+    @checks.is_owner()
+    @wrapped_additional_help()
+    async def saveinterval(self, ctx: commands.Context, seconds: commands.Range[int, 10, 3600]):
+        """
+        Set how often changed trigger counts and cooldowns are saved
+
+        `<seconds>` is the number of seconds between saves, between 10 and 3600.
+        Only triggers that have changed since the last save are written.
+        """
+        await self.config.save_interval.set(seconds)
+        self.save_loop.change_interval(seconds=seconds)
+        await ctx.send(
+            _("Trigger changes will be saved every {seconds} seconds.").format(seconds=seconds)
+        )
+
     @retrigger.command(hidden=True)
     @checks.is_owner()
     @wrapped_additional_help()
@@ -1508,6 +1634,88 @@ class ReTrigger(
             await self.config.guild(ctx.guild).bypass.set(bypass)
             await ctx.send(_("Safe Regex search re-enabled."))
 
+    @retrigger.command(name="stats")
+    @checks.mod_or_permissions(manage_messages=True)
+    @wrapped_additional_help()
+    async def trigger_stats(self, ctx: commands.Context, trigger: Optional[str] = None) -> None:
+        """
+        Show performance stats for the triggers in this server.
+
+        `[trigger]` if supplied shows detailed stats for the named trigger.
+
+        Regex times are the 50th, 95th, and 99th percentile of the most
+        recent searches in milliseconds. Stats are only kept in memory
+        and are reset when the cog is reloaded.
+        """
+        guild = ctx.guild
+        if trigger is not None:
+            if trigger not in self.triggers.get(guild.id, {}):
+                return await self._no_trigger(ctx, trigger)
+            data = self.stats.get(guild.id, trigger).to_dict()
+            data["cost"] = str(self.triggers[guild.id][trigger].cost)
+            msg = _(
+                "Regex cost: {cost}\n"
+                "Evaluations: {evaluations}\n"
+                "Matches: {matches} ({match_rate:.2%})\n"
+                "Regex time p50/p95/p99: {regex_p50:.3f}/{regex_p95:.3f}/{regex_p99:.3f}ms\n"
+                "Queue wait p50/p95: {queue_wait_p50:.3f}/{queue_wait_p95:.3f}ms\n"
+                "Response time p95: {perform_p95:.3f}ms\n"
+                "Timeouts: {timeouts}\n"
+                "Errors: {errors}\n"
+                "Skipped by prefilter: {prefiltered}\n"
+                "Skipped by cooldown: {cooldown_skips}\n"
+                "Skipped by allowlist/blocklist: {bw_list_skips}\n"
+                "Skipped as unchanged by an edit: {edit_skips}\n"
+            ).format(
+                **{
+                    k: v * 1000 if k.endswith(("p50", "p95", "p99")) else v
+                    for k, v in data.items()
+                }
+            )
+            await ctx.send(box(f"{trigger}\n{msg}", lang="yaml"))
+            return
+        slowest = self.stats.slowest(guild.id)
+        if not slowest:
+            await ctx.send(_("No triggers have been evaluated in this server yet."))
+            return
+        header = "{:<20} {:>7} {:>7} {:>8} {:>8} {:>8} {:>8} {:>4} {:>6} {:>6}".format(
+            _("Name"), _("Evals"), _("Matches"), "p50", "p95", "p99", _("Wait"), "T/O", "CD", "A/B"
+        )
+        lines = [header]
+        for name, trigger_stats in slowest:
+            p50, p95, p99 = trigger_stats.regex_time.percentiles(50, 95, 99)
+            (wait,) = trigger_stats.queue_wait.percentiles(95)
+            lines.append(
+                "{:<20} {:>7} {:>7} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.3f} {:>4} {:>6} {:>6}".format(
+                    name[:20],
+                    trigger_stats.evaluations,
+                    trigger_stats.matches,
+                    p50 * 1000,
+                    p95 * 1000,
+                    p99 * 1000,
+                    wait * 1000,
+                    trigger_stats.timeouts,
+                    trigger_stats.cooldown_skips,
+                    trigger_stats.bw_list_skips,
+                )
+            )
+        check_times = self.stats.check_times(guild.id)
+        if check_times is not None:
+            p50, p95, p99 = check_times.percentiles(50, 95, 99)
+            lines.append(
+                _("\nPer message p50/p95/p99: {p50:.3f}/{p95:.3f}/{p99:.3f}ms").format(
+                    p50=p50 * 1000, p95=p95 * 1000, p99=p99 * 1000
+                )
+            )
+        pool = self.re_pool.to_dict()
+        lines.append(
+            _(
+                "Process pool: {in_flight} searches running ({guild} in this server), "
+                "{waiting} waiting, {respawns} restarts"
+            ).format(guild=self.re_pool.guild_in_flight(guild.id), **pool)
+        )
+        await ctx.send_interactive(pagify("\n".join(lines), shorten_by=10), box_lang="")
+
     @retrigger.command(usage="[trigger]")
     @commands.bot_has_permissions(read_message_history=True, add_reactions=True)
     @wrapped_additional_help()
@@ -1577,6 +1785,214 @@ class ReTrigger(
         msg = _("Trigger `{trigger}` removed.").format(trigger=trigger.name)
         await ctx.send(msg)
 
+    @retrigger.command(name="export")
+    @checks.mod_or_permissions(manage_messages=True)
+    @commands.bot_has_permissions(attach_files=True)
+    @wrapped_additional_help()
+    async def export_triggers(self, ctx: commands.Context) -> None:
+        """
+        Export all of this server's triggers to a file
+
+        The file has one trigger per line and can be loaded into another
+        server with `[p]retrigger import`. Images used by triggers are not included.
+        """
+        triggers = self.triggers.get(ctx.guild.id, {})
+        if not triggers:
+            await ctx.send(_("There are no triggers setup on this server."))
+            return
+        data = [await trigger.to_json() for trigger in triggers.values()]
+        loop = asyncio.get_running_loop()
+        filename = f"retrigger-{ctx.guild.id}.jsonl"
+        export = await loop.run_in_executor(None, dump_triggers, data)
+        if len(export) > ctx.guild.filesize_limit:
+            filename += ".gz"
+            export = await loop.run_in_executor(None, dump_triggers, data, True)
+        if len(export) > ctx.guild.filesize_limit:
+            await ctx.send(_("These triggers are too large to upload to this server."))
+            return
+        msg = _("Exported {number} triggers.").format(number=len(data))
+        await ctx.send(msg, file=discord.File(BytesIO(export), filename=filename))
+
+    @staticmethod
+    def _is_local_image(images: Path, filename: str) -> bool:
+        """
+        Whether an imported image name is a file saved for this guild.
+        Anything else could point the trigger at any file on the host.
+        """
+        if Path(filename).name != filename:
+            return False
+        path = images / filename
+        try:
+            return path.resolve().parent == images.resolve() and path.is_file()
+        except (OSError, RuntimeError):
+            return False
+
+    def _imported_role_error(self, ctx: commands.Context, trigger: Trigger) -> Optional[str]:
+        """
+        The same role checks as `addrole` and `removerole` for an imported trigger
+        so nobody can import a trigger handing out roles they couldn't assign.
+        """
+        role_ids = set(trigger.add_roles) | set(trigger.remove_roles)
+        if not role_ids:
+            return None
+        if not ctx.me.guild_permissions.manage_roles:
+            return _("changes roles but I don't have permission to manage roles.")
+        if not (ctx.author.id == ctx.guild.owner_id or ctx.author.guild_permissions.manage_roles):
+            return _("changes roles but you don't have permission to manage roles.")
+        for role_id in role_ids:
+            role = ctx.guild.get_role(role_id)
+            if role is None:
+                return _("uses a role which doesn't exist here.")
+            if role >= ctx.me.top_role:
+                return _("uses {role} which is higher than my highest role.").format(
+                    role=role.name
+                )
+            if ctx.author.id == ctx.guild.owner_id:
+                continue
+            if role >= ctx.author.top_role:
+                return _("uses {role} which is higher than you are able to assign.").format(
+                    role=role.name
+                )
+        return None
+
+    @retrigger.command(name="import")
+    @checks.admin_or_permissions(administrator=True)
+    @wrapped_additional_help()
+    async def import_triggers(self, ctx: commands.Context, overwrite: bool = False) -> None:
+        """
+        Import triggers from a file made by `[p]retrigger export`
+
+        Attach the file or reply to a message with it attached.
+        `[overwrite]` replace existing triggers with the same name, defaults to False.
+
+        Every trigger is validated before anything is saved, patterns which could
+        never finish searching are skipped like they would be when adding a trigger.
+        Triggers which add or remove roles are skipped unless you could have made
+        them with `[p]retrigger addrole` or `[p]retrigger removerole`.
+        Existing triggers are only replaced if you could edit them.
+        Imported triggers are owned by whoever imports them.
+        """
+        attachments = list(ctx.message.attachments)
+        if not attachments and ctx.message.reference:
+            reference = ctx.message.reference.resolved
+            if isinstance(reference, discord.Message):
+                attachments = list(reference.attachments)
+        if not attachments:
+            await ctx.send(_("Attach a trigger export or reply to a message with one attached."))
+            return
+        attachment = attachments[0]
+        guild = ctx.guild
+        existing = self.triggers.get(guild.id, {})
+        images = cog_data_path(self) / str(guild.id)
+        new_triggers: Dict[str, Trigger] = {}
+        errors: List[str] = []
+        skipped = 0
+        async with ctx.typing():
+            try:
+                for line, data in read_export(await attachment.read(), attachment.filename):
+                    if line % 100 == 0:
+                        # let other events through while parsing a large import
+                        await asyncio.sleep(0)
+                    if isinstance(data, ValueError):
+                        errors.append(_("Line {line}: {error}").format(line=line, error=data))
+                        continue
+                    try:
+                        trigger = await Trigger.from_json(data)
+                    except Exception as e:
+                        errors.append(_("Line {line}: {error}").format(line=line, error=e))
+                        continue
+                    if trigger.name in existing and not overwrite:
+                        skipped += 1
+                        continue
+                    if trigger.name in existing and not await self.can_edit(
+                        ctx.author, existing[trigger.name]
+                    ):
+                        errors.append(
+                            _("Line {line}: you can't replace the existing `{name}`.").format(
+                                line=line, name=trigger.name
+                            )
+                        )
+                        continue
+                    if trigger.name in new_triggers:
+                        errors.append(
+                            _("Line {line}: `{name}` is duplicated.").format(
+                                line=line, name=trigger.name
+                            )
+                        )
+                        continue
+                    if trigger.regex is None:
+                        errors.append(
+                            _("Line {line}: `{name}` has an invalid regex pattern.").format(
+                                line=line, name=trigger.name
+                            )
+                        )
+                        continue
+                    files = trigger.image if isinstance(trigger.image, list) else [trigger.image]
+                    unsafe = [f for f in files if f and not self._is_local_image(images, str(f))]
+                    if unsafe:
+                        errors.append(
+                            _("Line {line}: `{name}` uses images which don't exist here.").format(
+                                line=line, name=trigger.name
+                            )
+                        )
+                        continue
+                    if role_error := self._imported_role_error(ctx, trigger):
+                        errors.append(
+                            _("Line {line}: `{name}` {error}").format(
+                                line=line, name=trigger.name, error=role_error
+                            )
+                        )
+                        continue
+                    trigger.author = ctx.author.id
+                    new_triggers[trigger.name] = trigger
+            except (ImportTooLarge, OSError, EOFError, UnicodeDecodeError):
+                await ctx.send(_("That file is too large or isn't a trigger export."))
+                return
+            patterns = [t.regex.pattern for t in new_triggers.values()]
+            for analysis, trigger in zip(
+                await self.measure_patterns(patterns), list(new_triggers.values())
+            ):
+                if analysis.worst_time is None:
+                    errors.append(
+                        _("`{name}` could not be checked, try importing it again.").format(
+                            name=trigger.name
+                        )
+                    )
+                    del new_triggers[trigger.name]
+                    continue
+                if analysis.cost is RegexCost.catastrophic:
+                    errors.append(
+                        _("`{name}` could take longer than {timeout} seconds to search.").format(
+                            name=trigger.name, timeout=self.trigger_timeout
+                        )
+                    )
+                    del new_triggers[trigger.name]
+                    continue
+                trigger.cost = analysis.cost
+            if new_triggers:
+                new_data = {name: await t.to_json() for name, t in new_triggers.items()}
+                # one write for every trigger so a failed import leaves nothing behind
+                async with self.config.guild(guild).trigger_list() as trigger_list:
+                    trigger_list.update(new_data)
+                async with self.config.guild(guild).trigger_counters() as trigger_counters:
+                    for name in new_triggers:
+                        trigger_counters.pop(name, None)
+                self.triggers.setdefault(guild.id, {})
+                for name, trigger in new_triggers.items():
+                    self.stats.remove(guild.id, name)
+                    self.triggers[guild.id][name] = trigger
+        msg = _("Imported {imported} triggers.").format(imported=len(new_triggers))
+        if skipped:
+            msg += "\n" + _(
+                "Skipped {skipped} triggers which already exist, "
+                "use `{prefix}retrigger import True` to replace them."
+            ).format(skipped=skipped, prefix=ctx.clean_prefix)
+        if errors:
+            msg += "\n" + _("{number} triggers could not be imported:").format(number=len(errors))
+            msg += "\n" + "\n".join(errors)
+        for page in pagify(msg):
+            await ctx.send(page)
+
     @retrigger.command()
     @wrapped_additional_help()
     async def explain(self, ctx: commands.Context, page_num: Optional[int] = 1) -> None:
@@ -1976,6 +2392,10 @@ class ReTrigger(
         self.triggers[ctx.guild.id][new_trigger.name] = new_trigger
         async with self.config.guild(guild).trigger_list() as trigger_list:
             trigger_list[name] = await new_trigger.to_json()
+        task = asyncio.create_task(self.prewarm_resize(guild.id, filename))
+        # keep a reference so it isn't garbage collected and can be cancelled on unload
+        self.prewarm_tasks.add(task)
+        task.add_done_callback(self.prewarm_tasks.discard)
         await self._trigger_set(ctx, name)
 
     @retrigger.command()
@@ -5,18 +5,12 @@ from typing import List, Literal, Optional
 
 import discord
 from discord import app_commands
+from discord.ext.commands.errors import BadArgument
 from red_commons.logging import getLogger
 from redbot.core.i18n import Translator
 
 from .abc import ReTriggerMixin
-from .converters import MentionStyle
-
-try:
-    import regex as re
-except ImportError:
-    import re
-
-from .converters import Trigger
+from .converters import MentionStyle, Trigger, validate_regex
 
 _ = Translator("ReTrigger", __file__)
 log = getLogger("red.trusty-cogs.ReTrigger")
@@ -41,14 +35,18 @@ class SnowflakeTransformer(app_commands.Transformer):
 
 class RegexTransformer(app_commands.Transformer):
     async def transform(self, interaction: discord.Interaction, value: str) -> Optional[str]:
+        cog = interaction.client.get_cog("ReTrigger")
+        if not interaction.response.is_done():
+            # measuring the pattern can take longer than discord waits for a response
+            await interaction.response.defer()
         try:
-            re.compile(value)
-        except Exception as e:
-            log.error("Retrigger conversion error")
-            err_msg = _("`{arg}` is not a valid regex pattern. {e}").format(arg=value, e=e)
-            await interaction.response.send_message(err_msg)
+            result, warning = await validate_regex(value, getattr(cog, "trigger_timeout", 1))
+        except BadArgument as e:
+            await interaction.followup.send(str(e))
             return
-        return value
+        if warning:
+            await interaction.followup.send(warning)
+        return result
 
 
 class TriggerTransformer(app_commands.Transformer):
@@ -583,6 +581,8 @@ class ReTriggerSlash(ReTriggerMixin):
         text: str,
     ):
         """Add a dm response trigger"""
+        if regex is None:
+            return
         ctx = await interaction.client.get_context(interaction)
         await self.dm(ctx, name, regex, text=text)
 
@@ -596,6 +596,8 @@ class ReTriggerSlash(ReTriggerMixin):
         text: str,
     ):
         """Add a trigger to dm yourself"""
+        if regex is None:
+            return
         ctx = await interaction.client.get_context(interaction)
         await self.dmme(ctx, name, regex, text=text)
 
@@ -610,6 +612,8 @@ class ReTriggerSlash(ReTriggerMixin):
         text: str,
     ):
         """Add a trigger to rename users"""
+        if regex is None:
+            return
         ctx = await interaction.client.get_context(interaction)
         await self.rename(ctx, name, regex, text=text)
 
@@ -623,6 +627,8 @@ class ReTriggerSlash(ReTriggerMixin):
         regex: app_commands.Transform[str, RegexTransformer],
     ):
         """Add a trigger to ban users"""
+        if regex is None:
+            return
         ctx = await interaction.client.get_context(interaction)
         await self.ban(ctx, name, regex)
 
@@ -636,6 +642,8 @@ class ReTriggerSlash(ReTriggerMixin):
         regex: app_commands.Transform[str, RegexTransformer],
     ):
         """Add a trigger to kick users"""
+        if regex is None:
+            return
         ctx = await interaction.client.get_context(interaction)
         await self.kick(ctx, name, regex)
 
@@ -649,6 +657,8 @@ class ReTriggerSlash(ReTriggerMixin):
         command: str,
     ):
         """Add a command trigger"""
+        if regex is None:
+            return
         ctx = await interaction.client.get_context(interaction)
         await self.command(ctx, name, regex, command)
 
@@ -663,6 +673,8 @@ class ReTriggerSlash(ReTriggerMixin):
         check_filenames: Optional[bool] = False,
     ):
         """Add a trigger to filter messages"""
+        if regex is None:
+            return
         ctx = await interaction.client.get_context(interaction)
         await self.filter(ctx, name, check_filenames, regex=regex)
 
@@ -677,6 +689,8 @@ class ReTriggerSlash(ReTriggerMixin):
         role: discord.Role,
     ):
         """Add a trigger to add a role"""
+        if regex is None:
+            return
         ctx = await interaction.client.get_context(interaction)
         await self.addrole(ctx, name, regex, [role])
 
@@ -691,6 +705,8 @@ class ReTriggerSlash(ReTriggerMixin):
         role: discord.Role,
     ):
         """Add a trigger to remove a role"""
+        if regex is None:
+            return
         ctx = await interaction.client.get_context(interaction)
         await self.removerole(ctx, name, regex, [role])
 
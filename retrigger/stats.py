@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SAMPLE_SIZE = 128
+
+
+class Samples:
+    """
+    Fixed size ring buffer of the most recent timings in seconds.
+
+    The buffer is only allocated once the first sample is added
+    so triggers that never run cost almost nothing.
+    """
+
+    __slots__ = ("_data", "_index", "total", "sum")
+
+    def __init__(self):
+        self._data: Optional[array] = None
+        self._index: int = 0
+        self.total: int = 0
+        self.sum: float = 0.0
+
+    def add(self, value: float) -> None:
+        if self._data is None:
+            self._data = array("f", [0.0]) * SAMPLE_SIZE
+        self._data[self._index] = value
+        self._index = (self._index + 1) % SAMPLE_SIZE
+        self.total += 1
+        self.sum += value
+
+    def __len__(self) -> int:
+        return min(self.total, SAMPLE_SIZE)
+
+    def percentiles(self, *points: float) -> Tuple[float, ...]:
+        if self._data is None:
+            return tuple(0.0 for _ in points)
+        ordered = sorted(self._data[: len(self)])
+        last = len(ordered) - 1
+        return tuple(ordered[min(int(round(p / 100 * last)), last)] for p in points)
+
+
+class TriggerStats:
+    """Counters and timings for a single trigger"""
+
+    __slots__ = (
+        "evaluations",
+        "matches",
+        "timeouts",
+        "errors",
+        "prefiltered",
+        "cooldown_skips",
+        "bw_list_skips",
+        "edit_skips",
+        "regex_time",
+        "queue_wait",
+        "perform_time",
+    )
+
+    def __init__(self):
+        self.evaluations: int = 0
+        self.matches: int = 0
+        self.timeouts: int = 0
+        self.errors: int = 0
+        self.prefiltered: int = 0
+        self.cooldown_skips: int = 0
+        self.bw_list_skips: int = 0
+        self.edit_skips: int = 0
+        self.regex_time = Samples()
+        self.queue_wait = Samples()
+        self.perform_time = Samples()
+
+    def record_search(self, elapsed: float, queue_wait: Optional[float], matched: bool) -> None:
+        self.evaluations += 1
+        self.regex_time.add(elapsed)
+        if queue_wait is not None:
+            self.queue_wait.add(queue_wait)
+        if matched:
+            self.matches += 1
+
+    @property
+    def match_rate(self) -> float:
+        if not self.evaluations:
+            return 0.0
+        return self.matches / self.evaluations
+
+    def to_dict(self) -> dict:
+        p50, p95, p99 = self.regex_time.percentiles(50, 95, 99)
+        wait_p50, wait_p95 = self.queue_wait.percentiles(50, 95)
+        (perform_p95,) = self.perform_time.percentiles(95)
+        return {
+            "evaluations": self.evaluations,
+            "matches": self.matches,
+            "match_rate": self.match_rate,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "prefiltered": self.prefiltered,
+            "cooldown_skips": self.cooldown_skips,
+            "bw_list_skips": self.bw_list_skips,
+            "edit_skips": self.edit_skips,
+            "regex_p50": p50,
+            "regex_p95": p95,
+            "regex_p99": p99,
+            "regex_total": self.regex_time.sum,
+            "queue_wait_p50": wait_p50,
+            "queue_wait_p95": wait_p95,
+            "perform_p95": perform_p95,
+        }
+
+
+class ReTriggerStats:
+    """
+    In memory instrumentation for every trigger the bot has evaluated.
+
+    Nothing here is persisted, stats start fresh every time the cog is loaded.
+    """
+
+    def __init__(self):
+        self._triggers: Dict[int, Dict[str, TriggerStats]] = {}
+        self._checks: Dict[int, Samples] = {}
+
+    def get(self, guild_id: int, name: str) -> TriggerStats:
+        guild = self._triggers.setdefault(guild_id, {})
+        try:
+            return guild[name]
+        except KeyError:
+            stats = guild[name] = TriggerStats()
+            return stats
+
+    def record_check(self, guild_id: int, elapsed: float) -> None:
+        """Record how long `check_triggers` took for a full message in a guild"""
+        if guild_id not in self._checks:
+            self._checks[guild_id] = Samples()
+        self._checks[guild_id].add(elapsed)
+
+    def check_times(self, guild_id: int) -> Optional[Samples]:
+        return self._checks.get(guild_id)
+
+    def remove(self, guild_id: int, name: str) -> None:
+        self._triggers.get(guild_id, {}).pop(name, None)
+
+    def clear(self, guild_id: Optional[int] = None) -> None:
+        if guild_id is None:
+            self._triggers.clear()
+            self._checks.clear()
+        else:
+            self._triggers.pop(guild_id, None)
+            self._checks.pop(guild_id, None)
+
+    def guild_stats(self, guild_id: int) -> Iterator[Tuple[str, TriggerStats]]:
+        yield from self._triggers.get(guild_id, {}).items()
+
+    def slowest(
+        self, guild_id: int, limit: Optional[int] = None
+    ) -> List[Tuple[str, TriggerStats]]:
+        """Triggers in a guild sorted by their 95th percentile regex time"""
+        ordered = sorted(
+            self.guild_stats(guild_id),
+            key=lambda i: i[1].regex_time.percentiles(95)[0],
+            reverse=True,
+        )
+        return ordered[:limit] if limit else ordered
+
+    def to_dict(self) -> Dict[int, Dict[str, dict]]:
+        return {
+            guild_id: {name: stats.to_dict() for name, stats in triggers.items()}
+            for guild_id, triggers in self._triggers.items()
+        }
@@ -0,0 +1,73 @@
+"""
+Reading and writing trigger exports.
+
+Exports are JSONL, one trigger's saved data per line, so they can be
+streamed line by line, diffed, and fed straight into the offline benchmark.
+Large exports are gzipped to fit in a discord upload.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+from io import BytesIO
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+# Uncompressed size limit for imports, roughly 10,000 reasonably sized triggers
+MAX_IMPORT_BYTES = 16 * 1024 * 1024
+REQUIRED_KEYS = ("name", "regex", "author")
+
+
+class ImportTooLarge(Exception):
+    pass
+
+
+def dump_triggers(triggers: Iterable[dict], compress: bool = False) -> bytes:
+    """Write each trigger on its own line in compact JSON"""
+    buffer = BytesIO()
+    stream = gzip.GzipFile(fileobj=buffer, mode="wb") if compress else buffer
+    for data in triggers:
+        stream.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        stream.write(b"\n")
+    if compress:
+        stream.close()
+    return buffer.getvalue()
+
+
+def read_export(
+    data: bytes, filename: str, max_bytes: Optional[int] = MAX_IMPORT_BYTES
+) -> Iterator[Tuple[int, Union[dict, ValueError]]]:
+    """
+    Yields `(line number, trigger data)` for each line of an export.
+
+    Lines which can't be parsed yield a `ValueError` instead so one bad
+    line can be reported without abandoning the rest of the file.
+    """
+    raw = BytesIO(data)
+    stream = gzip.GzipFile(fileobj=raw, mode="rb") if filename.endswith(".gz") else raw
+    read = 0
+    number = 0
+    while True:
+        # bounded so a huge compressed line can't be inflated all at once
+        line = stream.readline(-1 if max_bytes is None else max_bytes - read + 1)
+        if not line:
+            break
+        number += 1
+        read += len(line)
+        if max_bytes is not None and read > max_bytes:
+            raise ImportTooLarge()
+        if not line.strip():
+            continue
+        try:
+            trigger = json.loads(line)
+        except ValueError as e:
+            yield number, e
+            continue
+        if not isinstance(trigger, dict):
+            yield number, ValueError("Expected a JSON object")
+            continue
+        missing = [key for key in REQUIRED_KEYS if key not in trigger]
+        if missing:
+            yield number, ValueError(f"Missing {', '.join(missing)}")
+            continue
+        yield number, trigger
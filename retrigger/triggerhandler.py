@@ -4,10 +4,12 @@ import multiprocessing as mp
 import os
 import random
 import string
+import time
 from copy import copy
 from datetime import datetime, timezone
 from io import BytesIO
-from typing import Any, Dict, List, Literal, Optional, Tuple, Union, cast
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, Set, Tuple, Union, cast
 
 import aiohttp
 import discord
@@ -18,24 +20,18 @@ from redbot.core.i18n import Translator
 from redbot.core.utils.chat_formatting import escape, humanize_list
 
 from .abc import ReTriggerMixin
+from .bwlist import BWListIndex
+from .complexity import RegexAnalysis, RegexCost, adversarial_inputs, classify, measure
+from .context import MessageContext
 from .converters import Trigger, TriggerResponse
+from .edits import EditRecord
 from .message import ReTriggerMessage
-
-try:
-    import pytesseract
-
-    ALLOW_OCR = True
-except (ImportError, ValueError):
-    ALLOW_OCR = False
-
-try:
-    from PIL import Image, ImageSequence
-
-    ALLOW_RESIZE = True
-except ImportError:
-    ALLOW_RESIZE = False
-    ALLOW_OCR = False
-
+from .ocr import ALLOW_OCR, MAX_OCR_PIXELS, OCR_TIMEOUT, content_hash, ocr_image
+from .pool import PoolBusy
+from .prefilter import TriggerPrefilter
+from .prefixes import PrefixMatcher
+from .resize import ALLOW_RESIZE, PREWARM_SIZES
+from .worker import SearchStatus, batch_findall
 
 try:
     import regex as re
@@ -46,6 +42,11 @@ except ImportError:
 log = getLogger("red.trusty-cogs.ReTrigger")
 _ = Translator("ReTrigger", __file__)
 
+# core commands which change prefixes and so invalidate the prefix cache
+PREFIX_COMMANDS = frozenset({"set prefix", "set serverprefix"})
+# imported patterns measured at once, each in its own throwaway process
+MEASURE_WORKERS = 2
+
 RE_CTX: re.Pattern = re.compile(r"{([^}]+)\}")
 RE_POS: re.Pattern = re.compile(r"{((\d+)[^.}]*(\.[^:}]+)?[^}]*)\}")
 LINK_REGEX: re.Pattern = re.compile(
@@ -68,6 +69,24 @@ class TriggerHandler(ReTriggerMixin):
             # it will get removed on the next reload of the cog
             log.info("Trigger can't be removed :blobthinking:")
 
+    def get_prefilter(self, guild_id: int) -> TriggerPrefilter:
+        """Returns the guilds prefilter rebuilding it if the triggers have changed"""
+        prefilter = self.prefilters.get(guild_id)
+        triggers = self.triggers[guild_id]
+        if prefilter is None or prefilter.is_stale(triggers):
+            prefilter = TriggerPrefilter(triggers)
+            self.prefilters[guild_id] = prefilter
+        return prefilter
+
+    def get_bw_index(self, guild_id: int) -> BWListIndex:
+        """Returns the guilds allowlist/blocklist index rebuilding it if triggers changed"""
+        index = self.bw_indexes.get(guild_id)
+        triggers = self.triggers[guild_id]
+        if index is None or index.is_stale(triggers):
+            index = BWListIndex(triggers)
+            self.bw_indexes[guild_id] = index
+        return index
+
     async def can_edit(self, author: discord.Member, trigger: Trigger) -> bool:
         """Chekcs to see if the member is allowed to edit the trigger"""
         if trigger.author == author.id:
@@ -209,48 +228,46 @@ class TriggerHandler(ReTriggerMixin):
                 responses.append(message.content)
 
     def resize_image(self, size: int, image: str) -> discord.File:
-        length, width = (16, 16)  # Start with the smallest size we want to upload
-        with Image.open(image) as im:
-            if size <= 0:
-                size = 1
-            im.thumbnail((length * size, width * size), Image.Resampling.LANCZOS)
-            byte_array = BytesIO()
-            im.save(byte_array, format="PNG")
-            byte_array.seek(0)
-            return discord.File(byte_array, filename="resize.png")
+        path = Path(image)
+        return discord.File(BytesIO(self.resize_cache.get(path, size)), filename="resize.png")
 
     def resize_gif(self, size: int, image: str) -> discord.File:
-        img_list = []
-        with Image.open(image) as im:
-            if size <= 0:
-                size = 1
-            length, width = (16 * size, 16 * size)
-            start_list = [frame.copy() for frame in ImageSequence.Iterator(im)]
-            for frame in start_list:
-                frame.thumbnail((length, width), Image.Resampling.LANCZOS)
-                img_list.append(frame)
-        byte_array = BytesIO()
-        img_list[0].save(
-            byte_array, format="GIF", save_all=True, append_images=img_list, duration=0, loop=0
-        )
-        byte_array.seek(0)
-        return discord.File(byte_array, filename="resize.gif")
+        path = Path(image)
+        return discord.File(BytesIO(self.resize_cache.get(path, size)), filename="resize.gif")
+
+    async def prewarm_resize(self, guild_id: int, image: str) -> None:
+        """Render the most common sizes of a new resize trigger ahead of time"""
+        path = cog_data_path(self) / str(guild_id) / image
+        loop = asyncio.get_running_loop()
+        for size in PREWARM_SIZES:
+            try:
+                await loop.run_in_executor(None, self.resize_cache.get, path, size)
+            except Exception:
+                log.exception("Error pre-rendering resize image %s", path)
+                return
+
+    async def get_prefix_matcher(self, guild: discord.Guild) -> PrefixMatcher:
+        """Returns the guilds cached prefix matcher rebuilding it once it expires"""
+        matcher = self.prefix_matchers.get(guild.id)
+        if matcher is None or matcher.is_stale():
+            matcher = PrefixMatcher(await self.bot.get_valid_prefixes(guild))
+            self.prefix_matchers[guild.id] = matcher
+        return matcher
 
     async def check_is_command(self, message: discord.Message) -> bool:
         """Checks if the message is a bot command"""
-        prefix_list = await self.bot.get_valid_prefixes(message.guild)
-        msg = message.content
-        is_command = False
-        for prefix in prefix_list:
-            if msg.startswith(prefix):
-                # Don't run a trigger if it's the name of a command
-                command_text = msg.replace(prefix, "").split(" ")[0]
-                if not command_text:
-                    continue
-                command = self.bot.get_command(command_text)
-                if command:
-                    is_command = True
-        return is_command
+        matcher = await self.get_prefix_matcher(message.guild)
+        command_text = matcher.command_name(message.content)
+        if not command_text:
+            return False
+        # Don't run a trigger if it's the name of a command
+        return self.bot.get_command(command_text) is not None
+
+    @commands.Cog.listener()
+    async def on_command_completion(self, ctx: commands.Context) -> None:
+        if ctx.command.qualified_name in PREFIX_COMMANDS:
+            # a global prefix change affects every guild
+            self.prefix_matchers.clear()
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
@@ -334,6 +351,9 @@ class TriggerHandler(ReTriggerMixin):
 
     async def check_triggers_thread(self, thread: discord.Thread, *, edit: bool = False):
         guild = thread.guild
+        prefilter = self.get_prefilter(guild.id)
+        prefilter_cache: Dict[str, Tuple[Set[str], Optional[Set[str]]]] = {}
+        excluded = self.get_bw_index(guild.id).excluded(thread.owner, thread)
         for trigger in self.triggers[guild.id].values():
             if not trigger.enabled:
                 continue
@@ -343,12 +363,13 @@ class TriggerHandler(ReTriggerMixin):
                 continue
             if edit and not trigger.check_edits:
                 continue
-            allowed_trigger = await trigger.check_bw_list(author=thread.owner, channel=thread)
+            allowed_trigger = trigger.name not in excluded
             is_auto_mod = any(r.is_automod for r in trigger.response_type)
             is_mod = False
             if thread.owner is not None:
                 is_mod = await self.is_mod_or_admin(thread.owner)
             if not allowed_trigger:
+                self.stats.get(guild.id, trigger.name).bw_list_skips += 1
                 log.debug(
                     "ReTrigger: %r is immune from allowlist/blocklist %r", thread.owner, trigger
                 )
@@ -358,13 +379,17 @@ class TriggerHandler(ReTriggerMixin):
                     "ReTrigger: %r is immune from automated actions %r", thread.owner, trigger
                 )
                 continue
+            if not prefilter.might_match(trigger, thread.name, prefilter_cache):
+                self.stats.get(guild.id, trigger.name).prefiltered += 1
+                continue
 
             search = await self.safe_regex_search(guild, trigger, thread.name)
             if not search[0]:
-                trigger.enabled = False
+                trigger.disable()
                 return
             elif search[0] and search[1] != []:
                 trigger.count += 1
+                trigger.mark_dirty("count")
                 log.debug(
                     "ReTrigger: thread from %r triggered for deletion with %r",
                     thread.owner,
@@ -399,40 +424,51 @@ class TriggerHandler(ReTriggerMixin):
         guild: discord.Guild = cast(discord.Guild, message.guild)
         if guild.id not in self.triggers:
             return
+        check_start = time.perf_counter()
         channel: discord.TextChannel = cast(discord.TextChannel, message.channel)
         author: Optional[discord.Member] = guild.get_member(message.author.id)
         if not author:
             return
         blocked = not await self.bot.allowed_by_whitelist_blacklist(author)
         channel_perms = channel.permissions_for(author)
-        is_command = await self.check_is_command(message)
+        context = MessageContext(self, message, allow_ocr=ALLOW_OCR)
+        record: Optional[EditRecord] = None
+        if edit or any(t.check_edits for t in self.triggers[guild.id].values()):
+            previous = self.edit_cache.get(message.id)
+            hashes = context.input_hashes()
+            if edit and previous is not None and not previous.changed(hashes):
+                log.debug("ReTrigger: Ignoring edit that didn't change message %s", message.id)
+                return
+            record = self.edit_cache.update(message.id, hashes)
         is_mod = await self.is_mod_or_admin(author)
+        prefilter = self.get_prefilter(guild.id)
+        prefilter_cache: Dict[str, Tuple[Set[str], Optional[Set[str]]]] = {}
+        excluded = self.get_bw_index(guild.id).excluded(author, channel)
+        candidates: List[Tuple[Trigger, str]] = []
         for trigger in self.triggers[guild.id].values():
             if not trigger.enabled:
                 continue
             if edit and not trigger.check_edits:
                 continue
+            if edit and record is not None and record.result(trigger) is not None:
+                # nothing this trigger reads changed so the result is the same as before
+                self.stats.get(guild.id, trigger.name).edit_skips += 1
+                continue
             if trigger.chance:
                 if random.randint(0, trigger.chance) != 0:
                     continue
             if trigger.nsfw and not channel.is_nsfw():
                 continue
 
-            allowed_trigger = await trigger.check_bw_list(author=author, channel=channel)
+            allowed_trigger = trigger.name not in excluded
             is_auto_mod = any(r.is_automod for r in trigger.response_type)
             if not allowed_trigger:
+                self.stats.get(guild.id, trigger.name).bw_list_skips += 1
                 log.debug("ReTrigger: %r is immune from allowlist/blocklist %r", author, trigger)
                 continue
             if allowed_trigger and (is_auto_mod and is_mod):
                 log.debug("ReTrigger: %r is immune from automated actions %r", author, trigger)
                 continue
-            # log.debug(f"Checking trigger {trigger.name}")
-            if is_command and not trigger.ignore_commands:
-                log.debug(
-                    "ReTrigger: %r is ignored because they used a command %r", author, trigger
-                )
-                continue
-
             if any(r.is_automod for r in trigger.response_type):
                 if await self.bot.is_automod_immune(message):
                     log.debug("ReTrigger: %r is immune from automated actions %r", author, trigger)
@@ -477,27 +513,6 @@ class TriggerHandler(ReTriggerMixin):
                     )
                     continue
 
-            content = ""
-            content += message.content
-            if trigger.read_filenames and message.attachments:
-                content += " " + " ".join(f.filename for f in message.attachments)
-
-            if trigger.ocr_search and ALLOW_OCR:
-                try:
-                    content += await self.get_image_text(message)
-                except Exception:
-                    log.exception(
-                        "Error extracting text from image on trigger: %s, in channel: %s, message: %s",
-                        trigger,
-                        channel.id,
-                        message.id,
-                    )
-                    pass
-            if trigger.read_embeds and len(message.embeds) > 0:
-                content += "\n".join(
-                    self.convert_embed_to_string(embed, index)
-                    for index, embed in enumerate(message.embeds)
-                )
             if trigger.regex is None:
                 log.debug(
                     "ReTrigger: Trigger %r must have invalid regex.",
@@ -505,17 +520,44 @@ class TriggerHandler(ReTriggerMixin):
                 )
                 trigger.disable()
                 continue
+            content = await context.content_for(trigger)
+            if not prefilter.might_match(trigger, content, prefilter_cache):
+                self.stats.get(guild.id, trigger.name).prefiltered += 1
+                if record is not None:
+                    record.set_result(trigger, False)
+                continue
+            # only checked for triggers that could match since it needs the prefixes
+            if not trigger.ignore_commands and await context.is_command():
+                log.debug(
+                    "ReTrigger: %r is ignored because they used a command %r", author, trigger
+                )
+                if record is not None:
+                    record.set_result(trigger, False)
+                continue
             # log.debug("content = %s message.content = %s", content, message.content)
-            search = await self.safe_regex_search(guild, trigger, content)
+            candidates.append((trigger, content))
+
+        results = await self.safe_regex_search_batch(guild, candidates)
+        self.stats.record_check(guild.id, time.perf_counter() - check_start)
+        for (trigger, content), search in zip(candidates, results):
+            if search is None:
+                search = await self.safe_regex_search(guild, trigger, content)
             if not search[0]:
-                trigger.enabled = False
+                trigger.disable()
                 return
-            elif search[0] and search[1] != []:
+            if record is not None:
+                record.set_result(trigger, search[1] != [])
+            if search[0] and search[1] != []:
+                stats = self.stats.get(guild.id, trigger.name)
                 if await trigger.check_cooldown(message):
+                    stats.cooldown_skips += 1
                     continue
                 trigger.count += 1
+                trigger.mark_dirty("count")
                 log.debug("ReTrigger: message from %r triggered %r", author, trigger)
+                perform_start = time.perf_counter()
                 await self.perform_trigger(message, trigger, search[1])
+                stats.perform_time.add(time.perf_counter() - perform_start)
                 return
 
     @staticmethod
@@ -557,32 +599,29 @@ class TriggerHandler(ReTriggerMixin):
         for attachment in message.attachments:
             if attachment.content_type and "image" not in attachment.content_type:
                 continue
-            temp = BytesIO()
-            await attachment.save(temp)
-            task = functools.partial(pytesseract.image_to_string, Image.open(temp))
-            loop = asyncio.get_running_loop()
-            new_task = loop.run_in_executor(None, task)
-            try:
-                content += await asyncio.wait_for(new_task, timeout=5)
-            except asyncio.TimeoutError:
-                pass
+            content += await self.get_cached_image_text(await attachment.read())
         good_image_url = IMAGE_REGEX.findall(message.content)
         for link in good_image_url:
-            temp = BytesIO()
-            async with aiohttp.ClientSession() as session:
-                async with session.get(link) as resp:
-                    data = await resp.read()
-                    temp.write(data)
-                    temp.seek(0)
-            task = functools.partial(pytesseract.image_to_string, Image.open(temp))
-            loop = asyncio.get_running_loop()
-            new_task = loop.run_in_executor(None, task)
-            try:
-                content += await asyncio.wait_for(new_task, timeout=5)
-            except asyncio.TimeoutError:
-                pass
+            async with self.session.get(link) as resp:
+                data = await resp.read()
+            content += await self.get_cached_image_text(data)
         return content
 
+    async def get_cached_image_text(self, data: bytes) -> str:
+        """OCR image bytes in the OCR executor unless we've already seen the same image"""
+        key = content_hash(data)
+        text = self.ocr_cache.get(key)
+        if text is not None:
+            return text
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(self.ocr_executor, ocr_image, data, MAX_OCR_PIXELS)
+        try:
+            text = await asyncio.wait_for(task, timeout=OCR_TIMEOUT)
+        except asyncio.TimeoutError:
+            return ""
+        self.ocr_cache.set(key, text)
+        return text
+
     async def safe_regex_search(
         self, guild: discord.Guild, trigger: Trigger, content: str
     ) -> Tuple[bool, list]:
@@ -590,53 +629,60 @@ class TriggerHandler(ReTriggerMixin):
         Mostly safe regex search to prevent reDOS from user defined regex patterns
 
         This works by running the regex pattern inside a process pool defined at the
-        cog level and then checking that process in the default executor to keep
-        things asynchronous. If the process takes too long to complete we log a
-        warning and remove the trigger from trying to run again.
+        cog level and then waiting on its result without blocking the event loop.
+        If the worker reports the search took too long we log a warning and
+        remove the trigger from trying to run again.
         """
+        stats = self.stats.get(guild.id, trigger.name)
         if await self.config.guild(guild).bypass():
             # log.debug(f"Bypassing safe regex in guild {guild.name} ({guild.id})")
-            return (True, trigger.regex.findall(content))
+            start = time.perf_counter()
+            search = trigger.regex.findall(content)
+            stats.record_search(time.perf_counter() - start, None, bool(search))
+            return (True, search)
         try:
-            process = self.re_pool.apply_async(trigger.regex.findall, (content,))
-            task = functools.partial(process.get, timeout=self.trigger_timeout)
-            loop = asyncio.get_running_loop()
-            new_task = loop.run_in_executor(None, task)
-            search = await asyncio.wait_for(new_task, timeout=self.trigger_timeout + 5)
-        except mp.TimeoutError:
-            error_msg = (
-                "ReTrigger: regex process took too long. Removing from memory "
-                "%s (%s) Author %s "
-                "Offending regex `%s` Name: %s"
-            )
-            log.warning(
-                error_msg,
-                guild.name,
+            new_task = self.re_pool.apply(
                 guild.id,
-                trigger.author,
-                trigger.regex.pattern,
-                trigger.name,
+                batch_findall,
+                (
+                    guild.id,
+                    [content],
+                    [(trigger.name, trigger.regex.pattern, 0)],
+                    self.trigger_timeout,
+                    self.trigger_timeout,
+                    time.time(),
+                ),
+                # headroom so the worker can report its own timeout first
+                timeout=self.trigger_timeout * 2 + 1,
+            )
+            queue_wait, results = await asyncio.wait_for(
+                new_task, timeout=self.trigger_timeout * 4 + 5
             )
+            status, search, elapsed = results[0]
+        except PoolBusy:
+            # this guild already has too many searches running, skip rather than disable
+            log.debug("ReTrigger: skipping %r in %s, process pool is busy.", trigger, guild.id)
+            return (True, [])
+        except mp.TimeoutError:
+            # the pool only raises this for a job which was still running after
+            # the timeout, a worker without the regex module can't stop it itself
+            stats.timeouts += 1
+            self._log_regex_timeout(guild, trigger)
             return (False, [])
             # we certainly don't want to be performing multiple triggers if this happens
         except asyncio.TimeoutError:
-            error_msg = (
-                "ReTrigger: regex asyncio timed out."
-                "%s (%s) Author %s "
-                "Offending regex `%s` Name: %s"
-            )
+            # nothing says the pattern was at fault so skip rather than disable
             log.warning(
-                error_msg,
+                "ReTrigger: regex search for %r in %s (%s) took too long to return.",
+                trigger,
                 guild.name,
                 guild.id,
-                trigger.author,
-                trigger.regex.pattern,
-                trigger.name,
             )
-            return (False, [])
+            return (True, [])
         except ValueError:
             return (False, [])
         except Exception:
+            stats.errors += 1
             log.error(
                 "ReTrigger encountered an error %s %s in %s %s",
                 trigger.name,
@@ -646,8 +692,152 @@ class TriggerHandler(ReTriggerMixin):
                 exc_info=True,
             )
             return (True, [])
-        else:
-            return (True, search)
+        if status is SearchStatus.timeout:
+            stats.timeouts += 1
+            self._log_regex_timeout(guild, trigger)
+            return (False, [])
+        if status is not SearchStatus.ok:
+            stats.errors += 1
+            log.error(
+                "ReTrigger encountered an error %s %s in %s %s",
+                trigger.name,
+                trigger.regex,
+                guild.name,
+                guild.id,
+            )
+            return (True, [])
+        stats.record_search(elapsed, queue_wait, bool(search))
+        return (True, search)
+
+    def _log_regex_timeout(self, guild: discord.Guild, trigger: Trigger) -> None:
+        error_msg = (
+            "ReTrigger: regex process took too long. Removing from memory "
+            "%s (%s) Author %s "
+            "Offending regex `%s` Name: %s"
+        )
+        log.warning(
+            error_msg,
+            guild.name,
+            guild.id,
+            trigger.author,
+            trigger.regex.pattern,
+            trigger.name,
+        )
+
+    async def safe_regex_search_batch(
+        self, guild: discord.Guild, searches: List[Tuple[Trigger, str]]
+    ) -> List[Optional[Tuple[bool, list]]]:
+        """
+        Search multiple triggers in a single process pool task.
+
+        This sends every pattern and the distinct contents to one worker
+        instead of paying the pickling and executor thread cost per trigger.
+        Results line up with `searches` and follow the same format as
+        `safe_regex_search`. `None` means the search didn't complete inside
+        the batch and should be retried with `safe_regex_search` which will
+        deal with any problematic pattern on its own.
+        """
+        if not searches:
+            return []
+        if await self.config.guild(guild).bypass():
+            # bypassed searches happen in process so are evaluated lazily
+            return [None for _ in searches]
+        # cheapest patterns first so an expensive one using up the budget
+        # only delays itself and anything more expensive
+        order = sorted(range(len(searches)), key=lambda i: searches[i][0].cost)
+        ordered = [searches[i] for i in order]
+        contents: List[str] = []
+        content_index: Dict[str, int] = {}
+        payload: List[Tuple[str, str, int]] = []
+        for trigger, content in ordered:
+            if content not in content_index:
+                content_index[content] = len(contents)
+                contents.append(content)
+            payload.append((trigger.name, trigger.regex.pattern, content_index[content]))
+        try:
+            new_task = self.re_pool.apply(
+                guild.id,
+                batch_findall,
+                (
+                    guild.id,
+                    contents,
+                    payload,
+                    self.trigger_timeout,
+                    self.trigger_timeout,
+                    time.time(),
+                ),
+                timeout=self.trigger_timeout * 2 + 1,
+            )
+            queue_wait, results = await asyncio.wait_for(
+                new_task, timeout=self.trigger_timeout * 4 + 5
+            )
+        except (mp.TimeoutError, asyncio.TimeoutError, PoolBusy):
+            log.debug(
+                "ReTrigger: batched regex search timed out in %s (%s), checking individually.",
+                guild.name,
+                guild.id,
+            )
+            return [None for _ in searches]
+        except Exception:
+            log.error(
+                "ReTrigger encountered an error with a batched search in %s %s",
+                guild.name,
+                guild.id,
+                exc_info=True,
+            )
+            return [None for _ in searches]
+        ret: List[Optional[Tuple[bool, list]]] = [None for _ in searches]
+        for index, (status, found, elapsed) in zip(order, results):
+            trigger = searches[index][0]
+            stats = self.stats.get(guild.id, trigger.name)
+            if status is SearchStatus.ok:
+                stats.record_search(elapsed, queue_wait, bool(found))
+                ret[index] = (True, found)
+            elif status is SearchStatus.timeout:
+                stats.timeouts += 1
+                self._log_regex_timeout(guild, trigger)
+                ret[index] = (False, [])
+            elif status is SearchStatus.error:
+                stats.errors += 1
+                log.error(
+                    "ReTrigger encountered an error %s %s in %s %s",
+                    trigger.name,
+                    trigger.regex,
+                    guild.name,
+                    guild.id,
+                )
+                ret[index] = (True, [])
+        return ret
+
+    async def measure_patterns(self, patterns: List[str]) -> List[RegexAnalysis]:
+        """
+        Classify the cost of many patterns at once for bulk imports.
+
+        Each pattern is timed against its adversarial inputs in its own throwaway
+        process, `MEASURE_WORKERS` at a time, so a pattern which never finishes
+        is killed without touching the pool searching guilds messages.
+        A pattern which couldn't be measured is treated as catastrophic.
+        """
+        timeout = self.trigger_timeout
+        loop = asyncio.get_running_loop()
+        ret: List[Optional[RegexAnalysis]] = [None for _ in patterns]
+        jobs = iter(enumerate(patterns))
+
+        async def run_jobs() -> None:
+            for index, pattern in jobs:
+                try:
+                    inputs = await loop.run_in_executor(None, adversarial_inputs, pattern)
+                    worst, timed_out = await loop.run_in_executor(
+                        None, measure, pattern, inputs, timeout
+                    )
+                except Exception:
+                    log.exception("Error measuring regex pattern %s", pattern)
+                    ret[index] = RegexAnalysis(pattern, RegexCost.catastrophic)
+                    continue
+                ret[index] = classify(pattern, worst, timed_out, timeout)
+
+        await asyncio.gather(*(run_jobs() for _ in range(MEASURE_WORKERS)))
+        return cast(List[RegexAnalysis], ret)
 
     async def perform_trigger(
         self, message: discord.Message, trigger: Trigger, find: List[str]
@@ -700,6 +890,7 @@ class TriggerHandler(ReTriggerMixin):
         ):
             await channel.typing()
             path = str(cog_data_path(self)) + f"/{guild.id}/{trigger.image}"
+            # rendered sizes are cached so repeats are only a lookup
             if path.lower().endswith(".gif"):
                 task = functools.partial(self.resize_gif, size=len(find[0]) - 3, image=path)
             else:
@@ -916,7 +1107,7 @@ class TriggerHandler(ReTriggerMixin):
             try:
                 await trigger_author.send(response, allowed_mentions=trigger.allowed_mentions())
             except discord.errors.Forbidden:
-                trigger.enabled = False
+                trigger.disable()
                 log.debug("Retrigger encountered an error in %r with trigger %r", guild, trigger)
             except Exception:
                 log.exception(
@@ -1242,6 +1433,7 @@ class TriggerHandler(ReTriggerMixin):
                             for i in image:
                                 path = str(cog_data_path(self)) + f"/{guild_id}/{i}"
                                 try:
+                                    self.resize_cache.invalidate(Path(path))
                                     os.remove(path)
                                 except Exception:
                                     log.error(
@@ -1250,6 +1442,7 @@ class TriggerHandler(ReTriggerMixin):
                         else:
                             path = str(cog_data_path(self)) + f"/{guild_id}/{image}"
                             try:
+                                self.resize_cache.invalidate(Path(path))
                                 os.remove(path)
                             except Exception:
                                 log.error(
@@ -1257,5 +1450,9 @@ class TriggerHandler(ReTriggerMixin):
                                 )
                     del trigger_list[triggers]
                     del self.triggers[guild_id][trigger_name]
+                    self.stats.remove(guild_id, trigger_name)
+                    await self.config.guild_from_id(int(guild_id)).trigger_counters.clear_raw(
+                        trigger_name
+                    )
                     return True
         return False
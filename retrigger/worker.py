@@ -0,0 +1,120 @@
+"""
+Functions which are run inside the ReTrigger process pool.
+
+Everything in here must be importable and picklable without the bot running.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from enum import IntEnum
+from typing import List, Pattern, Tuple
+
+try:
+    import regex as re
+
+    HAS_TIMEOUT = True
+except ImportError:
+    import re
+
+    HAS_TIMEOUT = False
+
+PATTERN_CACHE_SIZE = 2048
+
+
+class SearchStatus(IntEnum):
+    ok = 0
+    skipped = 1
+    timeout = 2
+    error = 3
+
+
+# (guild_id, trigger name, pattern) -> compiled pattern
+# The pattern string acts as the triggers version so edits miss the cache.
+_pattern_cache: OrderedDict[Tuple[int, str, str], Pattern] = OrderedDict()
+
+
+def _get_pattern(guild_id: int, name: str, pattern: str) -> Pattern:
+    key = (guild_id, name, pattern)
+    try:
+        compiled = _pattern_cache[key]
+        _pattern_cache.move_to_end(key)
+    except KeyError:
+        compiled = re.compile(pattern)
+        _pattern_cache[key] = compiled
+        if len(_pattern_cache) > PATTERN_CACHE_SIZE:
+            _pattern_cache.popitem(last=False)
+    return compiled
+
+
+def batch_findall(
+    guild_id: int,
+    contents: List[str],
+    searches: List[Tuple[str, str, int]],
+    timeout: float,
+    budget: float,
+    submitted: float,
+) -> Tuple[float, List[Tuple[SearchStatus, list, float]]]:
+    """
+    Run `findall` for every search against its content in one task.
+
+    - `contents` the distinct content strings for this message.
+    - `searches` a list of `(trigger name, pattern, index into contents)`.
+    - `timeout` the number of seconds a single pattern is allowed to take.
+    - `budget` the number of seconds after which no new searches are started.
+    - `submitted` the `time.time()` the task was handed to the pool.
+
+    When the regex module is available each pattern is stopped after `timeout`.
+    Once the budget is spent the remaining searches are returned as skipped
+    so the caller can evaluate them individually.
+
+    Returns the time spent waiting in the pool queue and for each search
+    its status, the matches found, and the seconds spent searching.
+    """
+    queue_wait = max(time.time() - submitted, 0.0)
+    results: List[Tuple[SearchStatus, list, float]] = []
+    deadline = time.perf_counter() + budget
+    for name, pattern, index in searches:
+        start = time.perf_counter()
+        if start > deadline:
+            results.append((SearchStatus.skipped, [], 0.0))
+            continue
+        try:
+            compiled = _get_pattern(guild_id, name, pattern)
+            if HAS_TIMEOUT:
+                found = compiled.findall(contents[index], timeout=timeout)
+            else:
+                found = compiled.findall(contents[index])
+        except TimeoutError:
+            results.append((SearchStatus.timeout, [], time.perf_counter() - start))
+            continue
+        except Exception:
+            results.append((SearchStatus.error, [], time.perf_counter() - start))
+            continue
+        results.append((SearchStatus.ok, found, time.perf_counter() - start))
+    return queue_wait, results
+
+
+def measure_pattern(pattern: str, inputs: List[str], timeout: float) -> Tuple[float, bool]:
+    """
+    Returns the slowest `findall` time across `inputs` and whether any timed out.
+
+    Used to check new patterns, this is run in a separate process from the pool
+    since without the regex module a bad pattern can't be interrupted.
+    """
+    compiled = re.compile(pattern)
+    worst = 0.0
+    for content in inputs:
+        start = time.perf_counter()
+        try:
+            if HAS_TIMEOUT:
+                compiled.findall(content, timeout=timeout)
+            else:
+                compiled.findall(content)
+        except TimeoutError:
+            return timeout, True
+        worst = max(worst, time.perf_counter() - start)
+        if worst >= timeout:
+            return worst, True
+    return worst, False
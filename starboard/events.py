@@ -1,6 +1,6 @@
 import asyncio
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Literal, Union, cast
+from typing import Dict, List, Literal, Optional, Set, Union, cast
 
 import discord
 from discord.utils import snowflake_time
@@ -16,6 +16,11 @@ from .starboard_entry import FakePayload, StarboardEntry, StarboardMessage
 _ = Translator("Starboard", __file__)
 log = getLogger("red.trusty-cogs.Starboard")
 
+# Changed messages are written this many seconds after the first change
+SAVE_INTERVAL = 30
+# or straight away once a guild has this many unsaved changes
+SAVE_THRESHOLD = 500
+
 
 @cog_i18n(_)
 class StarboardEvents:
@@ -23,6 +28,10 @@ class StarboardEvents:
     config: Config
     starboards: Dict[int, Dict[str, StarboardEntry]]
     ready: asyncio.Event
+    save_lock: asyncio.Lock
+    save_task: Optional[asyncio.Task]
+    threshold_saves: Dict[int, asyncio.Task]
+    unsaved_guilds: Set[int]
 
     async def _build_embed(
         self, guild: discord.Guild, message: discord.Message, starboard: StarboardEntry
@@ -149,9 +158,86 @@ class StarboardEvents:
         return embeds
 
     async def _save_starboards(self, guild: discord.Guild) -> None:
-        async with self.config.guild(guild).starboards() as starboards:
-            for name, starboard in self.starboards[guild.id].items():
-                starboards[name] = await starboard.to_json()
+        """Save the guild's starboard settings and any changed messages now"""
+        group = self.config.guild(guild).starboards
+        async with self.save_lock:
+            for name, starboard in self.starboards.get(guild.id, {}).items():
+                for key, value in starboard.settings_json().items():
+                    await group.set_raw(name, key, value=value)
+        await self._save_changes(guild.id)
+
+    def _queue_save(self, guild: discord.Guild) -> None:
+        """
+        Save the guild's changed messages soon.
+
+        Reactions only change a few messages at a time so they're written in
+        batches every `SAVE_INTERVAL` seconds instead of after every reaction.
+        """
+        self.unsaved_guilds.add(guild.id)
+        starboards = self.starboards.get(guild.id, {}).values()
+        if sum(s.pending_changes for s in starboards) >= SAVE_THRESHOLD:
+            task = self.threshold_saves.get(guild.id)
+            if task is None or task.done():
+                self.threshold_saves[guild.id] = asyncio.create_task(self._save_changes(guild.id))
+        elif self.save_task is None or self.save_task.done():
+            self.save_task = asyncio.create_task(self._save_later())
+
+    async def _save_later(self) -> None:
+        # keep going while anything is left over, including saves which failed
+        while self.unsaved_guilds:
+            await asyncio.sleep(SAVE_INTERVAL)
+            await self._save_all_changes()
+
+    async def _save_all_changes(self) -> None:
+        for guild_id in list(self.unsaved_guilds):
+            await self._save_changes(guild_id)
+
+    async def _save_changes(self, guild_id: int) -> None:
+        """
+        Write only the messages which changed since they were last saved.
+
+        Every starboard in the guild is updated in one config write since
+        the JSON driver rewrites the whole file on each write.
+        """
+        self.unsaved_guilds.discard(guild_id)
+        group = self.config.guild_from_id(guild_id).starboards
+        async with self.save_lock:
+            changes = [
+                (name, starboard, *starboard.pop_changes())
+                for name, starboard in self.starboards.get(guild_id, {}).items()
+                if starboard.pending_changes
+            ]
+            if not changes:
+                return
+            try:
+                async with group() as saved:
+                    for name, starboard, messages, index in changes:
+                        board = saved.setdefault(name, {})
+                        saved_messages = board.setdefault("messages", {})
+                        for key, data in messages.items():
+                            if data is None:
+                                saved_messages.pop(key, None)
+                            else:
+                                saved_messages[key] = data
+                        saved_index = board.setdefault("starboarded_messages", {})
+                        for key, original in index.items():
+                            if original is None:
+                                saved_index.pop(key, None)
+                            else:
+                                saved_index[key] = original
+                        board["starred_messages"] = starboard.starred_messages
+                        board["stars_added"] = starboard.stars_added
+            except Exception:
+                log.exception("Error saving starboards in %s", guild_id)
+                # try again with the next save, rewriting what did save is harmless
+                for name, starboard, messages, index in changes:
+                    for key in messages:
+                        starboard.mark_message(key)
+                    for key in index:
+                        starboard.mark_index(key)
+                self.unsaved_guilds.add(guild_id)
+        if guild_id in self.unsaved_guilds and (self.save_task is None or self.save_task.done()):
+            self.save_task = asyncio.create_task(self._save_later())
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
@@ -277,7 +363,8 @@ class StarboardEvents:
                     if count < starboard.threshold:
                         if key not in starboard.messages:
                             self.starboards[guild.id][starboard.name].messages[key] = star_message
-                        await self._save_starboards(guild)
+                        starboard.mark_message(key)
+                        self._queue_save(guild)
                         continue
                     if not starboard.selfstar and msg.author.id == payload.user_id:
                         log.debug("Is a selfstar so let's return")
@@ -299,7 +386,9 @@ class StarboardEvents:
                     index_key = f"{star_channel.id}-{post_msg.id}"
                     self.starboards[guild.id][starboard.name].messages[key] = star_message
                     self.starboards[guild.id][starboard.name].starboarded_messages[index_key] = key
-                    await self._save_starboards(guild)
+                    starboard.mark_message(key)
+                    starboard.mark_index(index_key)
+                    self._queue_save(guild)
 
     async def red_delete_data_for_user(
         self,
@@ -312,9 +401,11 @@ class StarboardEvents:
         """
         for guild_id, starboards in self.starboards.items():
             for starboard, entry in starboards.items():
-                for message_ids, message in entry.messages.items():
+                for message_ids, message in list(entry.messages.items()):
                     if message.author == user_id:
                         index_key = f"{message.new_channel}-{message.new_message}"
+                        entry.mark_message(message_ids)
+                        entry.mark_index(index_key)
                         try:
                             del self.starboards[guild_id][starboard].messages[message_ids]
                             del self.starboards[guild_id][starboard].starboarded_messages[
@@ -322,9 +413,7 @@ class StarboardEvents:
                             ]
                         except Exception:
                             pass
-            async with self.config.guild_from_id(guild_id).starboards() as starboards:
-                for name, starboard in self.starboards[guild_id].items():
-                    starboards[name] = await starboard.to_json()
+            await self._save_changes(guild_id)
 
     async def cleanup_old_messages(self) -> None:
         """This will periodically iterate through old messages
@@ -366,9 +455,11 @@ class StarboardEvents:
                             for m in to_rem:
                                 log.verbose("Removing %s", m)
                                 del starboard.messages[m]
+                                starboard.mark_message(m)
                                 total_pruned += 1
                             for m in to_rem_index:
                                 del starboard.starboarded_messages[m]
+                                starboard.mark_index(m)
                             if len(to_rem) > 0:
                                 log.info(
                                     "Starboard pruned %s messages that are "
@@ -381,7 +472,7 @@ class StarboardEvents:
                                 )
                         except Exception:
                             log.exception("Error trying to clenaup old starboard messages.")
-                await self._save_starboards(guild)
+                await self._save_changes(guild.id)
             if total_pruned:
                 log.info(
                     "Starboard has pruned %s messages and ignored %s guilds.",
@@ -449,26 +540,32 @@ class StarboardEvents:
                 starboard_msg.reactions.append(user_id)
                 log.verbose("Adding user (%s) in _loop_messages", user_id)
                 starboard.stars_added += 1
+                starboard.mark_message(key)
+                self._queue_save(guild)
         else:
             if (user_id := getattr(payload, "user_id", 0)) in starboard_msg.reactions:
                 starboard_msg.reactions.remove(user_id)
                 log.verbose("Removing user (%s) in _loop_messages", user_id)
                 starboard.stars_added -= 1
+                starboard.mark_message(key)
+                self._queue_save(guild)
 
         if not starboard_msg.new_message or not starboard_msg.new_channel:
             return starboard_msg
         count = len(starboard_msg.reactions)
         log.debug("Existing count=%s starboard.threshold=%s", count, starboard.threshold)
         if count < starboard.threshold:
+            index_key = f"{starboard_msg.new_channel}-{starboard_msg.new_message}"
             try:
-                index_key = f"{starboard_msg.new_channel}-{starboard_msg.new_message}"
                 del starboard.starboarded_messages[index_key]
                 log.debug("Removed old message from index")
             except KeyError:
                 pass
             await starboard_msg.delete(star_channel)
             starboard.starred_messages -= 1
-            await self._save_starboards(guild)
+            starboard.mark_message(key)
+            starboard.mark_index(index_key)
+            self._queue_save(guild)
             return True
         log.debug("Editing starboard")
         count_message = f"{starboard.emoji} **#{count}**"
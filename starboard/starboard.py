@@ -1,6 +1,6 @@
 import asyncio
 from datetime import timedelta
-from typing import Dict, Optional, Union
+from typing import Dict, Optional, Set, Union
 
 import discord
 from red_commons.logging import getLogger
@@ -27,7 +27,7 @@ class Starboard(StarboardEvents, commands.Cog):
     Create a starboard to *pin* those special comments indefinitely
     """
 
-    __version__ = "2.6.0"
+    __version__ = "2.7.0"
     __author__ = "TrustyJAID"
 
     def __init__(self, bot):
@@ -38,6 +38,10 @@ class Starboard(StarboardEvents, commands.Cog):
         self.starboards: Dict[int, Dict[str, StarboardEntry]] = {}
         self.ready = asyncio.Event()
         self.cleanup_loop: Optional[asyncio.Task] = None
+        self.save_lock = asyncio.Lock()
+        self.save_task: Optional[asyncio.Task] = None
+        self.threshold_saves: Dict[int, asyncio.Task] = {}
+        self.unsaved_guilds: Set[int] = set()
 
     async def cog_load(self) -> None:
         log.debug("Started building starboards cache from config.")
@@ -49,7 +53,13 @@ class Starboard(StarboardEvents, commands.Cog):
                     starboard = await StarboardEntry.from_json(data, guild_id)
                 except Exception:
                     log.exception("error converting starboard")
+                    continue
                 self.starboards[guild_id][name] = starboard
+                if isinstance(data.get("messages"), list):
+                    # changes are saved per message which needs messages stored by key
+                    await self.config.guild_from_id(int(guild_id)).starboards.set_raw(
+                        name, value=await starboard.to_json()
+                    )
 
         self.cleanup_loop = asyncio.create_task(self.cleanup_old_messages())
         self.ready.set()
@@ -59,6 +69,11 @@ class Starboard(StarboardEvents, commands.Cog):
         self.ready.clear()
         if self.cleanup_loop:
             self.cleanup_loop.cancel()
+        if self.save_task:
+            self.save_task.cancel()
+        # guilds these are saving are no longer in unsaved_guilds
+        await asyncio.gather(*self.threshold_saves.values(), return_exceptions=True)
+        await self._save_all_changes()
 
     async def cog_check(self, ctx: commands.Context) -> bool:
         return self.ready.is_set()
@@ -281,10 +296,10 @@ class Starboard(StarboardEvents, commands.Cog):
                 return
             starboard = list(self.starboards[guild.id].values())[0]
 
-        async with self.config.guild(guild).starboards() as starboards:
+        async with self.save_lock:
             try:
                 del self.starboards[ctx.guild.id][starboard.name]
-                del starboards[starboard.name]
+                await self.config.guild(guild).starboards.clear_raw(starboard.name)
             except Exception:
                 log.exception("Error removing starboard")
                 await ctx.send("Deleting the starboard failed.")
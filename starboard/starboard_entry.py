@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import asyncio
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 import discord
 from red_commons.logging import getLogger
@@ -46,6 +46,9 @@ class StarboardEntry:
         self.stars_added: int = kwargs.get("stars_added", 0)
         self.lock: asyncio.Lock = asyncio.Lock()
         self.inherit: bool = kwargs.get("inherit", False)
+        # keys in messages and starboarded_messages changed since the last save
+        self._changed_messages: Set[str] = set()
+        self._changed_index: Set[str] = set()
 
     def __repr__(self) -> str:
         return (
@@ -157,7 +160,50 @@ class StarboardEntry:
                         return False
         return True
 
-    async def to_json(self) -> dict:
+    def mark_message(self, key: str) -> None:
+        """
+        Mark a message as changed so it's written on the next save.
+
+        Parameters
+        ----------
+            key: str
+                The `channel_id-message_id` key of the message in `messages`.
+                Keys no longer in `messages` are removed from config.
+        """
+        self._changed_messages.add(key)
+
+    def mark_index(self, key: str) -> None:
+        """
+        Mark a starboarded message as changed so it's written on the next save.
+
+        Parameters
+        ----------
+            key: str
+                The `channel_id-message_id` key of the message in `starboarded_messages`.
+                Keys no longer in `starboarded_messages` are removed from config.
+        """
+        self._changed_index.add(key)
+
+    @property
+    def pending_changes(self) -> int:
+        return len(self._changed_messages) + len(self._changed_index)
+
+    def pop_changes(self) -> Tuple[Dict[str, Optional[dict]], Dict[str, Optional[str]]]:
+        """
+        Returns the data for every message and starboarded message changed
+        since the last call, `None` for the ones which were removed.
+        """
+        messages = {}
+        for key in self._changed_messages:
+            message = self.messages.get(key)
+            messages[key] = message.to_json() if message is not None else None
+        index = {key: self.starboarded_messages.get(key) for key in self._changed_index}
+        self._changed_messages.clear()
+        self._changed_index.clear()
+        return messages, index
+
+    def settings_json(self) -> dict:
+        """Everything except the stored messages"""
         return {
             "name": self.name,
             "guild": self.guild,
@@ -168,10 +214,6 @@ class StarboardEntry:
             "selfstar": self.selfstar,
             "blacklist": self.blacklist,
             "whitelist": self.whitelist,
-            "messages": {
-                k: m.to_json() async for k, m in AsyncIter(self.messages.items(), steps=500)
-            },
-            "starboarded_messages": self.starboarded_messages,
             "threshold": self.threshold,
             "autostar": self.autostar,
             "starred_messages": self.starred_messages,
@@ -179,6 +221,15 @@ class StarboardEntry:
             "inherit": self.inherit,
         }
 
+    async def to_json(self) -> dict:
+        return {
+            **self.settings_json(),
+            "messages": {
+                k: m.to_json() async for k, m in AsyncIter(self.messages.items(), steps=500)
+            },
+            "starboarded_messages": self.starboarded_messages,
+        }
+
     @classmethod
     async def from_json(cls, data: dict, guild_id: Optional[int]):
         messages = data.get("messages", {})